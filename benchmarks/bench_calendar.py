@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# Permette di lanciare lo script da qualsiasi cartella
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calendar_features import build_calendar, CONGESTION_WINDOWS
+from team_registry import TeamRegistry
+
+# ==============================================================================
+# BENCHMARK: feature di calendario, pandas groupby/apply vs un solo ordinamento
+# ==============================================================================
+# Calendario sintetico di molti campionati e stagioni (20 squadre, 38 giornate,
+# alcune giornate infrasettimanali e partite spostate). Confrontiamo:
+#   vecchio -> Season_Year con .apply riga per riga, giornata con cumcount,
+#              riposo con groupby().diff(), partite ravvicinate con
+#              groupby().rolling('<N>D', closed='left')
+#   nuovo   -> calendar_features.build_calendar
+# e controlliamo che i valori siano identici.
+
+
+def make_schedule(n_leagues, n_seasons, seed=42):
+    rng = np.random.default_rng(seed)
+    parts = []
+    for league in range(n_leagues):
+        teams = np.array([f'L{league} Club {t:02d}' for t in range(20)])
+        for season in range(n_seasons):
+            start = np.datetime64(f'{1990 + season}-08-20')
+            # Weekend ogni 7 giorni, ogni tanto un turno infrasettimanale (+3 giorni)
+            offsets = np.cumsum(np.where(rng.random(38) < 0.15, 3, 7))
+            for week, off in enumerate(offsets):
+                order = rng.permutation(20)
+                # Qualche partita spostata di un giorno
+                days = start + off + (rng.random(10) < 0.1)
+                parts.append(pd.DataFrame({
+                    'league': f'L{league}', 'season': 1990 + season, 'week': week + 1,
+                    'date': days, 'home_team': teams[order[0::2]], 'away_team': teams[order[1::2]],
+                }))
+    schedule = pd.concat(parts, ignore_index=True)
+    schedule['game'] = (schedule['date'].dt.strftime('%Y-%m-%d') + ' '
+                        + schedule['home_team'] + '-' + schedule['away_team'])
+    return schedule
+
+
+def old_calendar(schedule):
+    """Le stesse feature con gli strumenti di prima (apply, groupby, rolling)."""
+    home = schedule[['game', 'date', 'home_team']].rename(columns={'home_team': 'team'})
+    away = schedule[['game', 'date', 'away_team']].rename(columns={'away_team': 'team'})
+    long = pd.concat([home, away], ignore_index=True)
+    long['date'] = pd.to_datetime(long['date'])
+    long = long.sort_values(['team', 'date'], kind='stable')
+    long['Season_Year'] = long['date'].apply(lambda x: x.year if x.month > 7 else x.year - 1)
+    long['matchweek'] = long.groupby(['Season_Year', 'team']).cumcount() + 1
+    long['Rest_Days'] = long.groupby('team')['date'].diff().dt.days
+    long['one'] = 1.0
+    for w in CONGESTION_WINDOWS:
+        counts = long.groupby('team').rolling(f'{w}D', on='date', closed='left')['one'].count()
+        long[f'Games_{w}d'] = counts.fillna(0).to_numpy().astype(int)
+    long['Is_Midweek'] = long['date'].dt.dayofweek.isin([1, 2, 3]).astype(int)
+    return long
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Feature di calendario: groupby/apply vs vettoriale')
+    parser.add_argument('--leagues', type=int, default=20)
+    parser.add_argument('--seasons', type=int, default=30)
+    args = parser.parse_args()
+
+    schedule = make_schedule(args.leagues, args.seasons)
+    print(f"Calendario: {len(schedule)} partite, {args.leagues} campionati x {args.seasons} stagioni")
+
+    t0 = time.perf_counter()
+    old = old_calendar(schedule)
+    t_old = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    new = build_calendar((schedule, None), TeamRegistry())
+    t_new = time.perf_counter() - t0
+
+    print(f"\n{'metodo':<8} {'tempo s':>8} {'righe':>9}")
+    print(f"{'vecchio':<8} {t_old:>8.2f} {len(old):>9}")
+    print(f"{'nuovo':<8} {t_new:>8.2f} {len(new):>9}")
+    print(f"Speedup: {t_old / t_new:.0f}x")
+
+    cols = ['Season_Year', 'matchweek', 'Rest_Days', 'Is_Midweek'] + [f'Games_{w}d' for w in CONGESTION_WINDOWS]
+    a = old.set_index(['game', 'team'])[cols].sort_index()
+    b = new.assign(team=new['team'].astype(str), game=new['game'].astype(str)).set_index(['game', 'team'])[cols].sort_index()
+    same = all(np.array_equal(a[c].to_numpy(np.float64), b[c].to_numpy(np.float64), equal_nan=True) for c in cols)
+    print(f"Stessi valori del metodo pandas: {same}")
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from thefuzz import process
+
+# Permette di lanciare lo script da qualsiasi cartella
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fuzzy_matcher import NameMatcher
+
+# ==============================================================================
+# BENCHMARK: process.extractOne (nome per nome) vs NameMatcher (a blocchi)
+# ==============================================================================
+# Nomi sintetici: i nomi "FBref" sono in parte copie rumorose dei nomi Kaggle
+# (accenti anche su più lettere, lettere mancanti, nome/cognome invertiti,
+# iniziale puntata, solo iniziale + cognome di un altro giocatore: tanti pari
+# merito) e in parte giocatori che su Kaggle non esistono.
+# Il vecchio metodo è troppo lento per 50k nomi: lo misuriamo su un campione
+# ed estrapoliamo, e sullo stesso campione controlliamo che le mappe coincidano
+# (con exhaustive=True, come in name_cache.py): se no lo script esce con errore.
+
+ACCENTS = {'a': 'á', 'e': 'é', 'i': 'í', 'o': 'ó', 'u': 'ü', 'c': 'č', 's': 'š', 'n': 'ñ'}
+SYLLABLES = ['ma', 'ro', 'si', 'li', 'ne', 'ga', 'ta', 'ri', 'lo', 'de', 'vi', 'ch', 'ez', 'ko', 'va',
+             'ski', 'son', 'mu', 'ba', 'tu', 'el', 'an', 'ol', 'er', 'in', 'us', 'ov', 'ic', 'ra', 'fe']
+
+
+def make_names(n_kaggle, n_fbref, seed=42):
+    rng = np.random.default_rng(seed)
+
+    def word(k):
+        return ''.join(rng.choice(SYLLABLES, k)).capitalize()
+
+    firsts = [word(rng.integers(2, 4)) for _ in range(max(500, n_kaggle // 10))]
+    lasts = [word(rng.integers(2, 5)) for _ in range(max(2000, n_kaggle // 2))]
+
+    def name():
+        n = f"{rng.choice(firsts)} {rng.choice(lasts)}"
+        if rng.random() < 0.15:
+            n += ' ' + rng.choice(lasts)
+        return n
+
+    kaggle = list(dict.fromkeys(name() for _ in range(int(n_kaggle * 1.1))))[:n_kaggle]
+
+    fbref = []
+    for _ in range(n_fbref):
+        if rng.random() < 0.6:
+            base = kaggle[rng.integers(len(kaggle))]
+            t = rng.random()
+            if t < 0.15:
+                base = base.replace('a', 'á', 1)
+            elif t < 0.3:
+                # Tutte le lettere accentabili: force_ascii le cancellerebbe
+                base = ''.join(ACCENTS.get(c, c) for c in base)
+            elif t < 0.5:
+                i = rng.integers(1, len(base))
+                base = base[:i] + base[i + 1:]
+            elif t < 0.65:
+                parts = base.split()
+                base = ' '.join(parts[1:] + parts[:1])
+            elif t < 0.8:
+                parts = base.split()
+                base = parts[0][0] + '. ' + ' '.join(parts[1:])
+            fbref.append(base)
+        elif rng.random() < 0.1:
+            # Iniziale + cognome corto: molti candidati con lo stesso punteggio
+            fbref.append(f"{word(1)[0]}. {rng.choice(lasts)}")
+        else:
+            fbref.append(name())
+    return kaggle, fbref
+
+
+def old_match(names, kaggle_names, min_score):
+    out = []
+    for n in names:
+        match, score = process.extractOne(n, kaggle_names)
+        out.append(match if score >= min_score else None)
+    return out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark fuzzy matcher a blocchi')
+    parser.add_argument('--kaggle', type=int, default=30000)
+    parser.add_argument('--fbref', type=int, default=50000)
+    parser.add_argument('--sample', type=int, default=300, help='Nomi su cui misurare extractOne')
+    parser.add_argument('--min-score', type=int, default=85)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"--- BENCHMARK FUZZY MATCHER ({args.fbref} x {args.kaggle} nomi) ---")
+    kaggle, fbref = make_names(args.kaggle, args.fbref)
+
+    t0 = time.perf_counter()
+    matcher = NameMatcher(kaggle)
+    t_index = time.perf_counter() - t0
+    print(f"Indice costruito in {t_index:.2f}s")
+
+    t0 = time.perf_counter()
+    new = matcher.match(fbref, min_score=args.min_score, exhaustive=True, n_workers=args.workers)
+    t_new = time.perf_counter() - t0
+    print(f"NameMatcher: {t_new:.2f}s ({len(fbref) / t_new:.0f} nomi/s)")
+
+    sample = fbref[:args.sample]
+    t0 = time.perf_counter()
+    old = old_match(sample, kaggle, args.min_score)
+    t_old_sample = time.perf_counter() - t0
+    t_old = t_old_sample / len(sample) * len(fbref)
+    print(f"extractOne:  {t_old_sample:.2f}s su {len(sample)} nomi -> stimati {t_old:.0f}s su {len(fbref)}")
+
+    same = sum(o == n[0] for o, n in zip(old, new[:len(sample)]))
+    print(f"Mappa identica su {same}/{len(sample)} nomi del campione")
+    print(f"🚀 Speedup (indice incluso): {t_old / (t_index + t_new):.0f}x")
+    if same != len(sample):
+        diff = [(q, o, n[0]) for q, o, n in zip(sample, old, new) if o != n[0]]
+        sys.exit(f"❌ Mappa diversa da extractOne: {diff[:5]}")
@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from bs4 import BeautifulSoup
+
+# Permette di lanciare lo script da qualsiasi cartella
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lineup_source import load_lineup_index
+
+# ==============================================================================
+# BENCHMARK: probabili formazioni, pagina per partita (vecchio) vs indice in cache
+# ==============================================================================
+# Un server HTTP locale finge di essere il sito (una pagina per campionato, con
+# ETag e un ritardo di rete simulato) così non si tocca fantacalcio.it.
+# Metà dei div match-preview ha i nomi squadra in .team-name, metà no (ricerca
+# nel testo, come faceva il vecchio codice). Misuriamo:
+#   vecchio      -> requests.get + BeautifulSoup per ogni partita
+#   nuovo freddo -> tutte le pagine insieme (asyncio), analizzate una volta
+#   nuovo caldo  -> entro il TTL: nessuna richiesta
+#   TTL scaduto  -> richieste condizionali, il server risponde 304
+# e controlliamo che le formazioni trovate siano le stesse del vecchio metodo.
+
+REQUESTS = {'total': 0, '304': 0}
+
+
+def make_page(league, n_matches):
+    parts = ['<html><body>']
+    for m in range(n_matches):
+        home, away = f'Home {league}{m}', f'Away {league}{m}'
+        teams = (f'<span class="team-name">{home}</span><span class="team-name">{away}</span>'
+                 if m % 2 == 0 else f'<h3>{home} - {away}</h3>')
+        players = ''.join(f'<a class="player-name" href="#">Player {league}{m}-{p}</a>' for p in range(22))
+        parts.append(f'<div class="match-preview">{teams}<div>{players}</div></div>')
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def make_server(pages, delay):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(delay)
+            REQUESTS['total'] += 1
+            body = pages[self.path]
+            etag = f'"{hash(body)}"'
+            if self.headers.get('If-None-Match') == etag:
+                REQUESTS['304'] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def old_get_probable_lineups(url, home_team, away_team):
+    """Il vecchio metodo di auto_predict_live.py (senza try/except)."""
+    found_players = {home_team: [], away_team: []}
+    response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=5)
+    soup = BeautifulSoup(response.text, 'html.parser')
+    for div in soup.find_all('div', class_='match-preview'):
+        text = div.get_text().lower()
+        if home_team.lower() in text and away_team.lower() in text:
+            names = [p.get_text().strip() for p in div.find_all('a', class_='player-name')]
+            if len(names) >= 22:
+                found_players[home_team] = names[:11]
+                found_players[away_team] = names[11:22]
+            break
+    return found_players
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Formazioni: scraping per partita vs indice in cache')
+    parser.add_argument('--leagues', type=int, default=4)
+    parser.add_argument('--matches', type=int, default=10, help='Partite per pagina')
+    parser.add_argument('--fixtures', type=int, default=8, help='Partite cercate per campionato')
+    parser.add_argument('--delay', type=float, default=0.1, help='Ritardo di rete simulato (s)')
+    args = parser.parse_args()
+
+    leagues = [chr(ord('A') + i) for i in range(args.leagues)]
+    pages = {f'/{lg}': make_page(lg, args.matches) for lg in leagues}
+    server = make_server(pages, args.delay)
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    sources = {lg: base + f'/{lg}' for lg in leagues}
+    fixtures = [(lg, f'Home {lg}{m}', f'Away {lg}{m}') for lg in leagues for m in range(min(args.fixtures, args.matches))]
+    cache_dir = tempfile.mkdtemp()
+
+    try:
+        t0 = time.perf_counter()
+        old = [old_get_probable_lineups(sources[lg], h, a) for lg, h, a in fixtures]
+        t_old, req_old = time.perf_counter() - t0, REQUESTS['total']
+
+        timings = {}
+        for label, ttl in [('nuovo freddo', 900), ('nuovo caldo', 900), ('TTL scaduto', 0)]:
+            before, before_304 = REQUESTS['total'], REQUESTS['304']
+            t0 = time.perf_counter()
+            index = load_lineup_index(sources, ttl=ttl, cache_dir=cache_dir)
+            new = [index.get(h, a) for _, h, a in fixtures]
+            timings[label] = (time.perf_counter() - t0, REQUESTS['total'] - before, REQUESTS['304'] - before_304)
+
+        same = all(lu is not None and o[h] == lu['home'] and o[a] == lu['away']
+                   for o, lu, (_, h, a) in zip(old, new, fixtures))
+
+        print(f"\n{len(fixtures)} partite, {len(leagues)} pagine, ritardo {args.delay * 1000:.0f} ms\n")
+        print(f"{'metodo':<14} {'tempo s':>8} {'richieste':>10} {'304':>5}")
+        print(f"{'vecchio':<14} {t_old:>8.3f} {req_old:>10} {0:>5}")
+        for label, (t, n, n304) in timings.items():
+            print(f"{label:<14} {t:>8.3f} {n:>10} {n304:>5}")
+        print(f"\nStesse formazioni del vecchio metodo: {same}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,109 @@
+import os
+import sys
+import io
+import time
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+
+# Permette di lanciare lo script da qualsiasi cartella
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import apply_schema
+from add_final_features import add_final_features
+from final_dataset_polish import polish_dataset
+from fake_odds import add_fake_odds
+from prepare_final_dataset import prepare_final_dataset
+from match_table import build_match_table
+from team_registry import TeamRegistry
+
+# ==============================================================================
+# BENCHMARK: catena con merge su se stessa vs tabella per partita (match_table.py)
+# ==============================================================================
+# Dataset per squadra sintetico (come l'uscita di feature.py: due righe per
+# partita) con un po' di sporcizia reale: ~1% di partite con una sola squadra
+# e ~1% di avversari scritti in modo diverso. Confrontiamo:
+#   vecchio -> add_final_features -> final_dataset_polish -> is_home == 1
+#              (con la conversione allo schema tra una fase e l'altra, come su disco)
+#   nuovo   -> build_match_table
+# su tempo e picco di memoria (tracemalloc), e controlliamo che il dataset di
+# training finale (prepare_final_dataset) sia identico.
+
+
+def make_data(n_leagues, n_seasons, seed=42):
+    rng = np.random.default_rng(seed)
+    rows, schedule, stats = [], [], []
+    for league in range(n_leagues):
+        teams = [f'L{league} Club {t:02d}' for t in range(20)]
+        for season in range(n_seasons):
+            start = pd.Timestamp(f'{2000 + season}-08-20')
+            for week in range(38):
+                day = start + pd.Timedelta(days=7 * week)
+                order = rng.permutation(20)
+                for k in range(10):
+                    home, away = teams[order[2 * k]], teams[order[2 * k + 1]]
+                    game = f'{day.date()} {home}-{away}'
+                    schedule.append({'game': game, 'date': day, 'home_team': home, 'away_team': away})
+                    res = rng.choice(['W', 'D', 'L'])
+                    flip = {'W': 'L', 'D': 'D', 'L': 'W'}[res]
+                    sides = [(home, away, res), (away, home, flip)]
+                    if rng.random() < 0.01:
+                        sides = sides[:1]          # partita con una sola squadra
+                    for team, opp, r in sides:
+                        if rng.random() < 0.01:
+                            opp = opp + ' FC'      # avversario scritto diversamente
+                        rows.append({'date': day, 'game': game, 'team': team, 'opponent': opp, 'result': r,
+                                     'xG': rng.gamma(2, 0.7), 'Starting_XI_Value': rng.uniform(5e7, 6e8),
+                                     'Lineup_Strength_Ratio': rng.uniform(0.6, 1.3)})
+                        stats.append({'game': game, 'team': team, 'xGA': rng.gamma(2, 0.7)})
+    return apply_schema(pd.DataFrame(rows)), (pd.DataFrame(schedule), pd.DataFrame(stats))
+
+
+def old_chain(df, schedule_stats):
+    ready = apply_schema(add_final_features(df))
+    ultimate = apply_schema(polish_dataset(ready, schedule_stats))
+    return ultimate[ultimate['is_home'] == 1]
+
+
+def new_chain(df, schedule_stats):
+    return apply_schema(build_match_table(df, schedule_stats, registry=TeamRegistry()))
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        out = fn(*args)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, elapsed, peak / 1e6
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Merge su se stessa vs tabella per partita')
+    parser.add_argument('--leagues', type=int, default=10)
+    parser.add_argument('--seasons', type=int, default=10)
+    args = parser.parse_args()
+
+    df, schedule_stats = make_data(args.leagues, args.seasons)
+    print(f"Dataset per squadra: {len(df)} righe, {df['game'].nunique()} partite")
+
+    old, t_old, m_old = measure(old_chain, df, schedule_stats)
+    new, t_new, m_new = measure(new_chain, df, schedule_stats)
+
+    print(f"\n{'metodo':<8} {'tempo s':>8} {'picco MB':>9} {'righe':>7}")
+    print(f"{'vecchio':<8} {t_old:>8.2f} {m_old:>9.1f} {len(old):>7}")
+    print(f"{'nuovo':<8} {t_new:>8.2f} {m_new:>9.1f} {len(new):>7}")
+    print(f"Speedup: {t_old / t_new:.1f}x, memoria: {m_old / m_new:.1f}x in meno")
+
+    with redirect_stdout(io.StringIO()):
+        final_old = prepare_final_dataset(add_fake_odds(old)).reset_index(drop=True)
+        final_new = prepare_final_dataset(add_fake_odds(new)).reset_index(drop=True)
+    try:
+        # Le categorie dei nomi squadra dipendono da quali righe sono passate: confrontiamo i valori
+        pd.testing.assert_frame_equal(final_old, final_new, check_categorical=False)
+        print("Dataset di training identico: True")
+    except AssertionError as e:
+        print(f"Dataset di training identico: False\n{e}")
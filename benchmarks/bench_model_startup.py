@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+
+# ==============================================================================
+# BENCHMARK: avvio a freddo pickle (joblib + XGBClassifier) vs nativo (UBJSON)
+# vs alberi compilati in numpy (tree_model.py)
+# ==============================================================================
+# Ogni misura è un processo Python nuovo (come un lancio di predict_tonight.py):
+#   import delle librerie -> caricamento del modello -> prima previsione.
+# Il processo figlio riporta i tempi delle tre fasi e il picco di memoria
+# (ru_maxrss); fuori misuriamo anche il tempo totale del processo.
+# xgboost si importa nella fase "import" per pickle e nativo, così "load"
+# confronta solo unpickling dell'XGBClassifier e lettura del booster UBJSON;
+# la modalità "trees" non importa affatto xgboost.
+# Le due modalità si alternano (in ordine invertito ad ogni giro).
+# Va lanciato dalla cartella principale (train/modello_serie_a.*).
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import time, json, resource, sys, warnings
+t0 = time.perf_counter()
+warnings.filterwarnings('ignore')
+sys.path.insert(0, {root!r})
+import numpy as np
+if {mode!r} == 'trees':
+    from tree_model import TreeEnsemble
+else:
+    import xgboost  # stesso costo per pickle e nativo (importa anche sklearn se installato)
+    if {mode!r} == 'pickle':
+        import joblib
+    else:
+        from model_artifact import NativeModel
+t1 = time.perf_counter()
+if {mode!r} == 'pickle':
+    model = joblib.load({path!r})
+elif {mode!r} == 'trees':
+    model = TreeEnsemble.load({path!r})
+else:
+    model = NativeModel.load({path!r})
+t2 = time.perf_counter()
+X = np.ones((1, len(model.feature_names_in_)))
+probs = model.predict_proba(X)
+t3 = time.perf_counter()
+print(json.dumps({{'import': t1 - t0, 'load': t2 - t1, 'predict': t3 - t2,
+                  'maxrss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  'probs': probs[0].tolist()}}))
+'''
+
+
+def run_child(mode, path):
+    code = CHILD.format(root=ROOT, mode=mode, path=path)
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    res = json.loads(out.stdout.strip().splitlines()[-1])
+    res['total'] = time.perf_counter() - t0
+    return res
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Avvio a freddo: modello pickle vs nativo')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pickle', default='train/modello_serie_a.pkl')
+    parser.add_argument('--native', default='train/modello_serie_a.ubj')
+    parser.add_argument('--trees', default='train/modello_serie_a.trees.npz')
+    args = parser.parse_args()
+
+    modes = {'pickle': os.path.abspath(args.pickle), 'native': os.path.abspath(args.native),
+             'trees': os.path.abspath(args.trees)}
+    results = {m: [] for m in modes}
+    for i in range(args.repeat):
+        # Ordine invertito ad ogni giro: nessuna modalità parte sempre per prima
+        for mode in (list(modes) if i % 2 == 0 else list(modes)[::-1]):
+            results[mode].append(run_child(mode, modes[mode]))
+
+    print(f"Mediana su {args.repeat} processi (secondi, memoria in MB)\n")
+    print(f"{'modo':<8} {'import':>8} {'load':>8} {'predict':>8} {'totale':>8} {'picco MB':>9}")
+    for mode, runs in results.items():
+        med = {k: float(np.median([r[k] for r in runs])) for k in ['import', 'load', 'predict', 'total', 'maxrss_mb']}
+        print(f"{mode:<8} {med['import']:>8.3f} {med['load']:>8.3f} {med['predict']:>8.3f} "
+              f"{med['total']:>8.3f} {med['maxrss_mb']:>9.1f}")
+
+    print()
+    ref = np.array(results['pickle'][0]['probs'])
+    for mode in ['native', 'trees']:
+        diff = np.abs(np.array(results[mode][0]['probs']) - ref).max()
+        print(f"Differenza massima tra le probabilità ({mode} vs pickle): {diff:.2e}")
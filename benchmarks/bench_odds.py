@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# Permette di lanciare lo script da qualsiasi cartella
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from odds import attach_odds, clean_name
+from team_registry import TeamRegistry
+
+# ==============================================================================
+# BENCHMARK: quote con iterrows + apply (vecchio) vs join vettoriale (odds.py)
+# ==============================================================================
+# File quote sintetico multi-lega (una riga per partita, 6 bookmaker) e
+# dataset per squadra (due righe per partita, orari diversi dalle quote per
+# verificare la normalizzazione delle date, ~5% di partite senza quote).
+# Controlliamo anche che Odds_1/X/2 coincidano con il vecchio metodo.
+
+BOOKMAKERS = ['B365', 'BW', 'PS', 'WH', 'Avg', 'Max']
+
+
+def make_data(n_leagues, n_seasons, seed=42):
+    rng = np.random.default_rng(seed)
+    odds_rows, team_rows = [], []
+    for league in range(n_leagues):
+        teams = [f'Team {league}-{t}' for t in range(20)]
+        for season in range(n_seasons):
+            start = pd.Timestamp(f'{2000 + season}-08-20')
+            for week in range(38):
+                day = start + pd.Timedelta(days=7 * week)
+                order = rng.permutation(20)
+                for k in range(10):
+                    home, away = teams[order[2 * k]], teams[order[2 * k + 1]]
+                    p = rng.dirichlet([4, 3, 3])
+                    row = {'league': f'L{league}', 'date': f'{day.date()} 20:45',
+                           'home_team': home, 'away_team': away}
+                    for b in BOOKMAKERS:
+                        quotes = 1.0 / (p * rng.uniform(1.02, 1.08))
+                        row[b + 'H'], row[b + 'D'], row[b + 'A'] = np.round(quotes, 2)
+                    if rng.random() > 0.05:
+                        odds_rows.append(row)
+                    team_rows.append({'date': day, 'team': home, 'opponent': away})
+                    team_rows.append({'date': day, 'team': away, 'opponent': home})
+    return pd.DataFrame(team_rows), pd.DataFrame(odds_rows)
+
+
+def old_merge(df, odds, cols=('B365H', 'B365D', 'B365A')):
+    """Il vecchio percorso di debug_odds_merge.py: dizionario da iterrows + apply riga per riga."""
+    df = df.copy()
+    odds = odds.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    odds['date'] = pd.to_datetime(odds['date'])
+    df['date_norm'] = df['date'].dt.normalize()
+    odds['date_norm'] = odds['date'].dt.normalize()
+    df['team_key'] = df['team'].apply(clean_name)
+    odds['home_key'] = odds['home_team'].apply(clean_name)
+    odds['away_key'] = odds['away_team'].apply(clean_name)
+
+    odds_lookup = {}
+    for _, row in odds.iterrows():
+        q1, qX, q2 = row[cols[0]], row[cols[1]], row[cols[2]]
+        odds_lookup[(row['date_norm'], row['home_key'])] = {'Odds_1': q1, 'Odds_X': qX, 'Odds_2': q2}
+        odds_lookup[(row['date_norm'], row['away_key'])] = {'Odds_1': q2, 'Odds_X': qX, 'Odds_2': q1}
+
+    def get_odds(row):
+        key = (row['date_norm'], row['team_key'])
+        if key in odds_lookup:
+            return pd.Series(odds_lookup[key])
+        return pd.Series([None, None, None], index=['Odds_1', 'Odds_X', 'Odds_2'])
+
+    df_final = pd.concat([df, df.apply(get_odds, axis=1)], axis=1)
+    return df_final.drop(columns=['date_norm', 'team_key'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark join quote vettoriale')
+    parser.add_argument('--leagues', type=int, default=5)
+    parser.add_argument('--seasons', type=int, default=10)
+    args = parser.parse_args()
+
+    print("--- BENCHMARK QUOTE (apply vs vettoriale) ---")
+    df, odds = make_data(args.leagues, args.seasons)
+    print(f"Dataset: {len(df)} righe | Quote: {len(odds)} partite x {len(BOOKMAKERS)} bookmaker")
+
+    t0 = time.perf_counter()
+    old = old_merge(df, odds)
+    t_old = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    new = attach_odds(df, odds, registry=TeamRegistry())
+    t_new = time.perf_counter() - t0
+
+    same = all(np.allclose(old[c].astype(float).to_numpy(), new[c].to_numpy(), equal_nan=True)
+               for c in ['Odds_1', 'Odds_X', 'Odds_2'])
+
+    print(f"iterrows + apply : {t_old:.2f}s")
+    print(f"vettoriale       : {t_new:.2f}s  ({len(new.columns) - len(df.columns)} colonne quote)")
+    print(f"Speedup          : {t_old / t_new:.1f}x")
+    print(f"Odds_1/X/2 identiche al vecchio metodo: {'✅' if same else '❌'}")
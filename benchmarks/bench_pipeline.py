@@ -0,0 +1,265 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import resource
+import tempfile
+import itertools
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Permette di lanciare lo script da qualsiasi cartella
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'train'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic_data import generate
+
+# ==============================================================================
+# BENCHMARK: TEMPO E MEMORIA DI OGNI FASE DELLA PIPELINE (dati sintetici)
+# ==============================================================================
+# 1. genera i CSV sintetici (synthetic_data.py) in una cartella di lavoro
+#    temporanea, con una copia del modello in train/;
+# 2. esegue UNA fase alla volta (le stesse di pipeline.py, da feature.py a
+#    prepare_final_dataset.py e team_state), senza cache e senza parallelismo,
+#    così ogni tempo è solo della sua fase;
+# 3. misura i percorsi di previsione: caricamento modello, stato squadre,
+#    forma (da zero e aggiornamento) e score_fixtures su tutte le partite
+#    possibili dell'ultima stagione;
+# 4. aggiunge il risultato a benchmarks/results/pipeline.jsonl (una riga JSON
+#    per esecuzione: commit, scala, tempi e memoria per fase) e lo confronta
+#    con l'ultima esecuzione alla stessa scala di un altro commit.
+#
+# Memoria: picco di tracemalloc nella fase (allocazioni Python e numpy; i buffer
+# Arrow delle stringhe pandas non ci sono) e ru_maxrss del processo a fine fase.
+# Tutto gira offline. Uso:
+#   python benchmarks/bench_pipeline.py --leagues 5 --seasons 5
+#   python benchmarks/bench_pipeline.py --compare 4bf02e6
+#   python benchmarks/bench_pipeline.py --streaming   (formazioni a blocchi, feature.py)
+#   python benchmarks/bench_pipeline.py --leagues 8 --procs 4   (partizioni in 4 processi)
+
+RESULTS_PATH = os.path.join(ROOT, 'benchmarks', 'results', 'pipeline.jsonl')
+MODEL_FILES = ['modello_serie_a.ubj', 'modello_serie_a.manifest.json',
+               'modello_serie_a.trees.npz', 'modello_serie_a.pkl']
+
+
+def git_info():
+    """Commit corrente (corto) e se ci sono modifiche non salvate; None fuori da git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD', '--', '*.py'], cwd=ROOT).returncode != 0
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+
+def measure(fn, *args, memory=True, verbose=False):
+    """Esegue fn(*args): risultato, secondi, picco tracemalloc (MB) e ru_maxrss (MB)."""
+    if memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    if verbose:
+        out = fn(*args)
+    else:
+        with redirect_stdout(io.StringIO()):
+            out = fn(*args)
+    elapsed = time.perf_counter() - t0
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return out, elapsed, peak, rss
+
+
+def n_rows(value):
+    """Righe del risultato di una fase (somma delle tabelle se è una tupla)."""
+    if isinstance(value, tuple):
+        return sum(n_rows(v) or 0 for v in value)
+    return len(value) if hasattr(value, '__len__') else None
+
+
+def run_stages(memory=True, verbose=False):
+    """Tutte le fasi di pipeline.py in ordine, una alla volta (cartella di lavoro = cwd)."""
+    from pipeline import build_stages
+    from storage import save_artifact
+
+    def run(stage, args):
+        value = stage.call(*args)
+        if stage.artifact:
+            value = save_artifact(value, stage.artifact, export_csv=stage.export_csv)
+        return value
+
+    results, timings = {}, []
+    for stage in build_stages():
+        args = [results[d] for d in stage.deps]
+        value, elapsed, peak, rss = measure(run, stage, args, memory=memory, verbose=verbose)
+        results[stage.name] = value
+        timings.append({'name': stage.name, 'seconds': elapsed, 'peak_mb': peak,
+                        'rss_mb': rss, 'rows': n_rows(value)})
+        print(f"   {stage.name:<24} {elapsed:>8.2f}s")
+    return timings
+
+
+def run_predict_paths(memory=True, verbose=False):
+    """Percorsi di previsione: modello, stato squadre, forma e score_fixtures in blocco."""
+    import pandas as pd
+    from model_artifact import load_model
+    from team_state import load_team_state
+    from form_engine import update_form_state, STATE_PATH as FORM_STATE_PATH
+    from raw_store import load_raw
+    from score_fixtures import score_fixtures
+
+    stats = load_raw('match_stats')
+    # Tutte le coppie casa/ospite delle squadre dell'ultima stagione
+    last = stats[stats['season'].astype(str) == stats['season'].astype(str).max()]
+    teams = sorted(last['team'].unique())
+    fixtures = pd.DataFrame(list(itertools.permutations(teams, 2)), columns=['Home_Team', 'Away_Team'])
+
+    timings, state = [], {}
+
+    def step(name, fn, *args):
+        value, elapsed, peak, rss = measure(fn, *args, memory=memory, verbose=verbose)
+        timings.append({'name': name, 'seconds': elapsed, 'peak_mb': peak, 'rss_mb': rss, 'rows': None})
+        print(f"   {name:<24} {elapsed:>8.2f}s")
+        return value
+
+    if os.path.exists(FORM_STATE_PATH):
+        os.remove(FORM_STATE_PATH)
+    state['model'] = step('predict:load_model', load_model)
+    state['team_state'] = step('predict:team_state', load_team_state)
+    step('predict:form_cold', update_form_state, stats)
+    # Seconda chiamata: stato già su disco, nessuna partita nuova
+    state['form'] = step('predict:form_warm', update_form_state, stats)[0]
+    out = step('predict:score_fixtures', lambda: score_fixtures(fixtures, state['model'], state['team_state'],
+                                                                state['form'])[0])
+    timings[-1]['rows'] = len(out)
+    return timings
+
+
+def load_results(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_result(record, path=RESULTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def find_reference(history, record, ref=None):
+    """Esecuzione di confronto alla stessa scala: il commit ref, altrimenti l'ultima di un altro commit."""
+    # Stessa scala, stesso modo di misura (tracemalloc rallenta le fasi) e stessa modalità
+    same = [r for r in history if r['scale'] == record['scale'] and r.get('memory') == record['memory']
+            and r.get('streaming', False) == record['streaming'] and r.get('procs') == record['procs']]
+    if ref:
+        same = [r for r in same if (r.get('commit') or '').startswith(ref) or r.get('label') == ref]
+    else:
+        same = [r for r in same if r.get('commit') != record['commit'] or r.get('dirty') != record['dirty']]
+    return same[-1] if same else None
+
+
+def print_comparison(record, reference, threshold):
+    ref_by_name = {s['name']: s for s in reference['stages']} if reference else {}
+    if reference:
+        print(f"\nConfronto con {reference.get('commit')}{'+' if reference.get('dirty') else ''} "
+              f"({reference['timestamp'][:16]})")
+    print(f"\n{'fase':<24} {'tempo s':>8} {'picco MB':>9} {'rss MB':>8} {'righe':>9} {'rif. s':>8} {'delta':>8}")
+    for s in record['stages']:
+        peak = f"{s['peak_mb']:.1f}" if s['peak_mb'] is not None else '-'
+        rows = s['rows'] if s['rows'] is not None else '-'
+        line = f"{s['name']:<24} {s['seconds']:>8.2f} {peak:>9} {s['rss_mb']:>8.0f} {rows:>9}"
+        ref = ref_by_name.get(s['name'])
+        if ref:
+            delta = s['seconds'] / ref['seconds'] - 1 if ref['seconds'] > 0 else 0.0
+            # Sotto i 50 ms il rumore conta più della differenza
+            flag = ' ⚠️' if delta > threshold and s['seconds'] - ref['seconds'] > 0.05 else ''
+            line += f" {ref['seconds']:>8.2f} {delta:>+8.0%}{flag}"
+        print(line)
+    total = record['total_seconds']
+    print(f"\nTotale: {total:.2f}s" + (f" (riferimento {reference['total_seconds']:.2f}s)" if reference else ''))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tempo e memoria per fase della pipeline su dati sintetici')
+    parser.add_argument('--leagues', type=int, default=3)
+    parser.add_argument('--seasons', type=int, default=3)
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--squad-size', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workdir', default=None, help='Cartella di lavoro (default: temporanea, poi cancellata)')
+    parser.add_argument('--results', default=RESULTS_PATH, help='File JSON lines dei risultati')
+    parser.add_argument('--label', default=None, help='Etichetta libera salvata col risultato')
+    parser.add_argument('--compare', default=None, help='Commit (o etichetta) di riferimento')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Rallentamento segnalato (0.2 = +20%%)')
+    parser.add_argument('--no-memory', action='store_true', help='Senza tracemalloc (tempi più puliti)')
+    parser.add_argument('--no-save', action='store_true', help='Non salva il risultato')
+    parser.add_argument('--verbose', action='store_true', help='Mostra le stampe delle fasi')
+    parser.add_argument('--streaming', action='store_true', help='Formazioni lette a blocchi in feature.py')
+    parser.add_argument('--procs', type=int, default=None,
+                        help='Processi per le partizioni lega/stagione (partitions.py, default: tutti i core)')
+    args = parser.parse_args()
+    if args.streaming:
+        os.environ['SERIE_A_STREAMING'] = '1'
+    if args.procs is not None:
+        os.environ['SERIE_A_PROCS'] = str(args.procs)
+
+    results_path = os.path.abspath(args.results)
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='serie_a_bench_')
+    if workdir == ROOT:
+        sys.exit("❌ Non lavoro dentro il repository (sovrascriverebbe data/): scegli un'altra --workdir")
+
+    scale = {'leagues': args.leagues, 'seasons': args.seasons, 'teams': args.teams,
+             'squad_size': args.squad_size, 'seed': args.seed}
+    print(f"Dati sintetici: {args.leagues} campionati x {args.seasons} stagioni x {args.teams} squadre "
+          f"(rosa {args.squad_size}) in {workdir}")
+    t0 = time.perf_counter()
+    counts = generate(workdir, args.leagues, args.seasons, args.teams, args.squad_size, seed=args.seed)
+    print(f"   generati in {time.perf_counter() - t0:.1f}s: " + ', '.join(f"{k} {v}" for k, v in counts.items()))
+
+    os.makedirs(os.path.join(workdir, 'train'), exist_ok=True)
+    for name in MODEL_FILES:
+        src = os.path.join(ROOT, 'train', name)
+        if os.path.exists(src):
+            shutil.copy(src, os.path.join(workdir, 'train', name))
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        print("\nFasi della pipeline:")
+        stages = run_stages(memory=not args.no_memory, verbose=args.verbose)
+        print("Percorsi di previsione:")
+        stages += run_predict_paths(memory=not args.no_memory, verbose=args.verbose)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    commit, dirty = git_info()
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit, 'dirty': dirty, 'label': args.label,
+        'host': socket.gethostname(), 'python': platform.python_version(), 'cpus': os.cpu_count(),
+        'memory': not args.no_memory, 'streaming': args.streaming,
+        'procs': args.procs, 'scale': scale, 'rows': counts, 'stages': stages,
+        'total_seconds': sum(s['seconds'] for s in stages),
+    }
+    reference = find_reference(load_results(results_path), record, args.compare)
+    if args.compare and reference is None:
+        print(f"\n⚠️ Nessun risultato per '{args.compare}' a questa scala in {results_path}")
+    print_comparison(record, reference, args.threshold)
+
+    if not args.no_save:
+        append_result(record, results_path)
+        print(f"📁 Risultato aggiunto a {results_path}")
@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Permette di lanciare lo script da qualsiasi cartella
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'train'))
+from prediction_server import PredictionService, make_server
+
+# ==============================================================================
+# BENCHMARK: prova di carico del server di previsione
+# ==============================================================================
+# Avvia il server (TCP su localhost o socket Unix) nello stesso processo e lo
+# bombarda con N richieste da un pool di thread client, una connessione
+# keep-alive per thread. Partite casuali tra le squadre dello stato, con una
+# quota di richieste ripetute (per vedere la cache). Riporta throughput,
+# latenze lato client e le statistiche del server (/stats: batch medio, cache).
+# Va lanciato dalla cartella principale (percorsi data/ e train/ relativi).
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.unix_path)
+
+
+def connect(args):
+    if args.unix:
+        return UnixHTTPConnection(args.unix)
+    return http.client.HTTPConnection('127.0.0.1', args.port)
+
+
+def call(conn, method, path, payload=None):
+    # bytes: http.client manda header e corpo in un solo pacchetto
+    body = json.dumps(payload).encode('utf-8') if payload is not None else None
+    conn.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+    resp = conn.getresponse()
+    return resp.status, json.loads(resp.read())
+
+
+def make_fixtures(teams, n, repeat, seed=42):
+    rng = np.random.default_rng(seed)
+    pairs = [tuple(rng.choice(teams, 2, replace=False)) for _ in range(n)]
+    # Una parte delle richieste ripete partite già chieste (es. più client sulla stessa partita)
+    for i in np.flatnonzero(rng.random(n) < repeat):
+        pairs[i] = pairs[rng.integers(0, max(i, 1))]
+    return [{'home_team': h, 'away_team': a} for h, a in pairs]
+
+
+def run_load(args, fixtures, concurrency):
+    local = threading.local()
+    latencies = [None] * len(fixtures)
+
+    def worker(i):
+        if not hasattr(local, 'conn'):
+            local.conn = connect(args)
+        t0 = time.perf_counter()
+        status, _ = call(local.conn, 'POST', '/predict', fixtures[i])
+        latencies[i] = time.perf_counter() - t0
+        assert status == 200, status
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(len(fixtures))))
+    return time.perf_counter() - t0, np.array(latencies) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prova di carico del server di previsione')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeat', type=float, default=0.3, help='Quota di richieste ripetute')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--unix', default=None, help='Usa un socket Unix invece della porta TCP')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    service = PredictionService()
+    server = make_server(service, args.port, args.unix)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Server avviato in {time.perf_counter() - t0:.2f}s ({args.unix or f'porta {args.port}'})")
+
+    teams = sorted(service.predictor.team_state)
+    print(f"{args.requests} richieste per livello, {len(teams)} squadre, {args.repeat:.0%} ripetute\n")
+    print(f"{'client':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'batch':>6} {'hit':>6}")
+
+    for level, concurrency in enumerate(args.concurrency):
+        # Cache e contatori azzerati ad ogni livello, partite diverse ad ogni livello
+        service.clear_cache()
+        service.hits = 0
+        service.batcher.batch_sizes.clear()
+        fixtures = make_fixtures(teams, args.requests, args.repeat, seed=level)
+
+        elapsed, lat = run_load(args, fixtures, concurrency)
+        stats = call(connect(args), 'GET', '/stats')[1]
+        print(f"{concurrency:>7} {len(fixtures) / elapsed:>9.0f} {np.percentile(lat, 50):>8.2f} "
+              f"{np.percentile(lat, 95):>8.2f} {np.percentile(lat, 99):>8.2f} "
+              f"{stats['mean_batch_size']:>6.1f} {stats['cache_hits'] / len(fixtures):>6.0%}")
+
+    server.shutdown()
+    server.server_close()
+    service.predictor.models.stop()
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+# ==============================================================================
+# BENCHMARK: dataset intermedi in CSV vs Parquet tipizzato
+# ==============================================================================
+# Esegue la catena completa (feature.py -> prepare_final_dataset.py) due volte
+# in cartelle temporanee, una con SERIE_A_FORMAT=csv e una con parquet, e
+# confronta il tempo totale, il tempo per script e lo spazio su disco dei
+# dataset intermedi.
+#
+# Uso: python benchmarks/bench_storage.py --data data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_FILES = ['fbref_lineups.csv', 'fbref_match_stats.csv', 'fbref_schedule.csv',
+             'players.csv', 'player_valuations.csv', 'odds_history.csv']
+STAGES = ['feature.py', 'add_final_features.py', 'final_dataset_polish.py',
+          'debug_odds_merge.py', 'prepare_final_dataset.py']
+ARTIFACTS = ['dataset_completo_xgboost_3', 'dataset_xgboost_ready_3', 'dataset_ultimate_3',
+             'dataset_con_quote_FIXED_3', 'dataset_train_final_3']
+
+
+def run_chain(data_dir, fmt):
+    work = tempfile.mkdtemp(prefix=f'bench_{fmt}_')
+    os.makedirs(os.path.join(work, 'data'))
+    for f in RAW_FILES:
+        shutil.copy(os.path.join(data_dir, f), os.path.join(work, 'data', f))
+
+    env = dict(os.environ, SERIE_A_FORMAT=fmt, PYTHONPATH=ROOT)
+    timings = {}
+    for stage in STAGES:
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, stage)], cwd=work, env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+        timings[stage] = time.perf_counter() - t0
+
+    size = 0
+    for name in ARTIFACTS:
+        path = os.path.join(work, 'data', f'{name}.{fmt}')
+        if os.path.exists(path):
+            size += os.path.getsize(path)
+    return work, timings, size
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark CSV vs Parquet per i dataset intermedi')
+    parser.add_argument('--data', default='data', help='Cartella con i CSV grezzi')
+    parser.add_argument('--keep', action='store_true', help='Non cancellare le cartelle temporanee')
+    args = parser.parse_args()
+
+    print("--- BENCHMARK STORAGE (CSV vs PARQUET) ---")
+    results = {}
+    for fmt in ['csv', 'parquet']:
+        # Prima esecuzione a vuoto per costruire cache nomi e indice valori,
+        # così misuriamo solo la differenza dovuta al formato dei file
+        work, _, _ = run_chain(args.data, fmt)
+        shutil.rmtree(work)
+        work, timings, size = run_chain(args.data, fmt)
+        results[fmt] = (timings, size)
+        if not args.keep:
+            shutil.rmtree(work)
+
+    print(f"{'Script':<28}{'CSV (s)':>10}{'Parquet (s)':>14}")
+    for stage in STAGES:
+        print(f"{stage:<28}{results['csv'][0][stage]:>10.2f}{results['parquet'][0][stage]:>14.2f}")
+    total_csv = sum(results['csv'][0].values())
+    total_pq = sum(results['parquet'][0].values())
+    print(f"{'TOTALE':<28}{total_csv:>10.2f}{total_pq:>14.2f}")
+    print(f"💾 Dataset intermedi su disco: CSV {results['csv'][1] / 1e6:.2f} MB | "
+          f"Parquet {results['parquet'][1] / 1e6:.2f} MB")
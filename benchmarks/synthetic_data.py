@@ -0,0 +1,307 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# DATI SINTETICI: GLI STESSI CSV DI data/ A QUALSIASI SCALA (senza internet)
+# ==============================================================================
+# Scrive in <out>/data/ i file che la pipeline si aspetta, con le stesse colonne
+# dei download veri (soccerdata FBref, Kaggle Transfermarkt, MatchHistory):
+#   fbref_schedule.csv     -> calendario all'italiana (andata e ritorno), alcune
+#                             giornate infrasettimanali, partite sparse sul weekend
+#   fbref_match_stats.csv  -> due righe per partita (casa e ospite) con xG/xGA
+#   fbref_lineups.csv      -> 11 titolari + 3-5 entrati per squadra e partita,
+#                             nomi con qualche accento in più rispetto a Kaggle
+#   players.csv            -> rose Kaggle (nomi senza accenti) + giocatori extra
+#   player_valuations.csv  -> una valutazione ogni ~6 mesi per giocatore
+#   odds_history.csv       -> quote 1X2 di più bookmaker + Avg/Max, squadre a
+#                             volte scritte in modo diverso (minuscolo, spazi)
+# Gol, xG e quote vengono dalla forza (casuale) delle squadre, quindi il modello
+# ha qualcosa da imparare. Stesso seed -> stessi file.
+#
+# Uso: python benchmarks/synthetic_data.py --out /tmp/serie_a_synth --leagues 5 --seasons 5
+#      cd /tmp/serie_a_synth && python /percorso/repo/pipeline.py
+
+LEAGUE_NAMES = ['ITA-Serie A', 'ESP-La Liga', 'ENG-Premier League', 'GER-Bundesliga', 'FRA-Ligue 1']
+CITIES = ['Varona', 'Pisola', 'Castello', 'Monteverde', 'Rivalta', 'Sanbruno', 'Aquileia', 'Borgoforte',
+          'Lucerna', 'Marbella', 'Toledo', 'Oviedo', 'Granada', 'Burgos', 'Almeria', 'Cadice', 'Leon',
+          'Norwich', 'Reading', 'Luton', 'Derby', 'Hull', 'Preston', 'Bristol', 'Wigan', 'Bochum',
+          'Kassel', 'Aachen', 'Bremen', 'Essen', 'Rostock', 'Jena', 'Nancy', 'Metz', 'Brest', 'Reims',
+          'Lorient', 'Angers', 'Troyes', 'Dijon', 'Vicenza', 'Ascoli', 'Ternana', 'Perugia', 'Modena',
+          'Cesena', 'Brescia', 'Palermo', 'Bari', 'Pescara']
+CLUB_PREFIXES = ['', 'Real ', 'Atletico ', 'Sporting ', 'Dinamo ', 'Olympique ', 'Union ', 'Racing ']
+FIRST_NAMES = ['Marco', 'Luca', 'Paolo', 'Juan', 'Pedro', 'Diego', 'Andrea', 'Carlos', 'Jose', 'Mario',
+               'Sergio', 'Ivan', 'Thomas', 'Lukas', 'Jonas', 'Kevin', 'Pierre', 'Hugo', 'Theo', 'Lucas',
+               'James', 'Jack', 'Harry', 'Daniel', 'Antonio', 'Federico', 'Nicolo', 'Alvaro', 'Rafael',
+               'Joao', 'Bruno', 'Mateo', 'Emil', 'Victor', 'Adrian', 'Samuel', 'Oscar', 'Tiago', 'Leon', 'Jan']
+LAST_NAMES = ['Rossi', 'Bianchi', 'Verdi', 'Garcia', 'Lopez', 'Martinez', 'Russo', 'Ferrari', 'Esposito',
+              'Romano', 'Gomez', 'Diaz', 'Ruiz', 'Moreno', 'Conti', 'Gallo', 'Muller', 'Schmidt', 'Wagner',
+              'Becker', 'Hoffmann', 'Martin', 'Bernard', 'Dubois', 'Moreau', 'Laurent', 'Simon', 'Smith',
+              'Jones', 'Taylor', 'Brown', 'Wilson', 'Evans', 'Costa', 'Silva', 'Santos', 'Pereira', 'Alves',
+              'Fernandez', 'Sanchez', 'Navarro', 'Torres', 'Ramos', 'Castro', 'Ortega', 'Marino', 'Greco',
+              'Bruno', 'Ricci', 'Colombo', 'Fontana', 'Rinaldi', 'Caruso', 'Leone', 'Longo', 'Gentile',
+              'Vitale', 'Serra', 'Coppola', 'Sala']
+# Lettere a cui FBref aggiunge un accento (Kaggle li toglie)
+ACCENTS = str.maketrans({'o': 'ó', 'a': 'á', 'e': 'é', 'i': 'í', 'u': 'ü'})
+BOOKMAKERS = ['B365', 'BW', 'PS', 'WH']
+# Ruoli in rosa (in proporzione): portieri, difensori, centrocampisti, attaccanti
+POSITIONS = np.array(['GK'] * 3 + ['DF'] * 8 + ['MF'] * 8 + ['FW'] * 6)
+MAX_GOALS = 10
+
+
+def round_robin(n_teams):
+    """Calendario all'italiana (metodo del cerchio): giornate di coppie (casa, ospite), andata e ritorno."""
+    teams = list(range(n_teams))
+    rounds = []
+    for r in range(n_teams - 1):
+        pairs = [(teams[i], teams[n_teams - 1 - i]) for i in range(n_teams // 2)]
+        if r % 2:
+            # La squadra fissa alterna casa e trasferta
+            pairs[0] = pairs[0][::-1]
+        rounds.append(pairs)
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+    return np.array(rounds + [[(a, h) for h, a in rnd] for rnd in rounds])
+
+
+def season_code(year):
+    """Codice stagione di soccerdata: 2020 -> '2021' (stagione 2020-21)."""
+    return f"{year % 100:02d}{(year + 1) % 100:02d}"
+
+
+def outcome_probs(lam_home, lam_away):
+    """Probabilità 1/X/2 con gol di Poisson indipendenti (vettoriale)."""
+    goals = np.arange(MAX_GOALS + 1)
+    fact = np.cumprod(np.r_[1, goals[1:]]).astype(float)
+    ph = np.exp(-lam_home)[:, None] * lam_home[:, None] ** goals / fact
+    pa = np.exp(-lam_away)[:, None] * lam_away[:, None] ** goals / fact
+    joint = ph[:, :, None] * pa[:, None, :]
+    p_home = np.tril(np.ones((len(goals), len(goals))), -1)
+    p1 = (joint * p_home).sum(axis=(1, 2))
+    px = np.einsum('nii->n', joint)
+    p = np.stack([p1, px, 1 - p1 - px], axis=1)
+    return p / p.sum(axis=1, keepdims=True)
+
+
+def make_names(rng, n, used):
+    """n nomi di giocatore diversi tra loro (e da quelli in used)."""
+    names = []
+    while len(names) < n:
+        first = rng.choice(FIRST_NAMES, n)
+        last = rng.choice(LAST_NAMES, n)
+        # Doppio cognome per una parte dei giocatori: più combinazioni possibili
+        second = np.where(rng.random(n) < 0.4, rng.choice(LAST_NAMES, n), '')
+        for f, l, s in zip(first, last, second):
+            name = f"{f} {l} {s}".strip()
+            if name not in used:
+                used.add(name)
+                names.append(name)
+                if len(names) == n:
+                    break
+    return names
+
+
+def make_clubs(rng, n_leagues, n_teams):
+    """Nomi squadra diversi in tutti i campionati (prefisso + città, con numero se finiscono)."""
+    combos = [p + c for c in CITIES for p in CLUB_PREFIXES]
+    picks = rng.permutation(len(combos))
+    names = [combos[i] if k < len(combos) else f"{combos[i]} {k // len(combos) + 1}"
+             for k, i in enumerate(np.resize(picks, n_leagues * n_teams))]
+    return np.array(names, dtype=object).reshape(n_leagues, n_teams)
+
+
+def league_names(n_leagues):
+    return [LEAGUE_NAMES[k] if k < len(LEAGUE_NAMES) else f"L{k:02d}-League {k}" for k in range(n_leagues)]
+
+
+def generate(out_dir, n_leagues=3, n_seasons=3, n_teams=20, squad_size=25, last_year=2024, seed=42):
+    """
+    Scrive i CSV sintetici in <out_dir>/data/ e ritorna il numero di righe per file.
+    last_year = anno di inizio dell'ultima stagione (2024 -> 2024-25).
+    """
+    if n_teams % 2 or n_teams < 4:
+        raise ValueError("Servono almeno 4 squadre e in numero pari")
+    if squad_size < 16:
+        raise ValueError("La rosa deve avere almeno 16 giocatori (11 titolari + 5 cambi)")
+
+    rng = np.random.default_rng(seed)
+    data_dir = os.path.join(out_dir, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+
+    leagues = league_names(n_leagues)
+    clubs = make_clubs(rng, n_leagues, n_teams)
+    years = list(range(last_year - n_seasons + 1, last_year + 1))
+    rounds = round_robin(n_teams)
+    n_rounds, per_round = rounds.shape[:2]
+
+    # --- Rose: squad_size giocatori per squadra, nomi unici in tutto il dataset ---
+    used = set()
+    n_players = n_leagues * n_teams * squad_size
+    kaggle_names = np.array(make_names(rng, n_players, used), dtype=object).reshape(n_leagues, n_teams, squad_size)
+    # ~10% dei nomi FBref ha un accento che Kaggle non ha (li risolve il fuzzy matching)
+    fbref_names = kaggle_names.copy()
+    accented = rng.random(fbref_names.shape) < 0.1
+    fbref_names[accented] = [n.translate(ACCENTS) for n in fbref_names[accented]]
+    positions = np.resize(POSITIONS, squad_size)
+    # Qualità del giocatore: i primi della rosa giocano di più e valgono di più
+    quality = np.sort(rng.normal(0, 1, (n_leagues, n_teams, squad_size)), axis=2)[:, :, ::-1]
+
+    schedule, stats, lineups, odds = [], [], [], []
+    for li, league in enumerate(leagues):
+        strength = rng.normal(0, 0.35, n_teams)
+        for year in years:
+            season = season_code(year)
+            # Forza che cambia un po' di stagione in stagione
+            strength = 0.8 * strength + rng.normal(0, 0.15, n_teams)
+            perm = rng.permutation(n_teams)
+            home, away = perm[rounds[:, :, 0]].ravel(), perm[rounds[:, :, 1]].ravel()
+            n_games = len(home)
+
+            # Date: primo sabato dopo il 20 agosto, una giornata a settimana (15% infrasettimanali,
+            # +3 giorni), partite della giornata tra sabato, domenica e lunedì
+            start = np.datetime64(f'{year}-08-20')
+            start = start + (5 - (start.astype(np.int64) + 3) % 7) % 7
+            gaps = np.where(rng.random(n_rounds) < 0.15, 3, 7)
+            gaps[0] = 0
+            round_day = start + np.cumsum(gaps)
+            spread = rng.choice([0, 1, 2], n_games, p=[0.45, 0.45, 0.10])
+            dates = np.repeat(round_day, per_round) + np.where(np.repeat(gaps, per_round) == 3, 0, spread)
+            date_str = np.datetime_as_string(dates, unit='D').astype(object)
+
+            # Gol e xG dalla differenza di forza (+ vantaggio casalingo)
+            diff = strength[home] - strength[away]
+            lam_h, lam_a = 1.45 * np.exp(diff), 1.15 * np.exp(-diff)
+            hg, ag = rng.poisson(lam_h), rng.poisson(lam_a)
+            hx = np.round(rng.gamma(4, lam_h / 4), 1)
+            ax = np.round(rng.gamma(4, lam_a / 4), 1)
+
+            home_names, away_names = clubs[li, home], clubs[li, away]
+            games = date_str + ' ' + home_names + '-' + away_names
+            schedule.append(pd.DataFrame({
+                'league': league, 'season': season, 'game': games,
+                'week': np.repeat(np.arange(1, n_rounds + 1), per_round), 'date': date_str,
+                'home_team': home_names, 'home_xg': hx,
+                'score': [f"{h}–{a}" for h, a in zip(hg, ag)], 'away_xg': ax,
+                'away_team': away_names,
+                'game_id': [f"{league[:3]}{season}{i:04d}" for i in range(n_games)],
+            }))
+
+            res_h = np.where(hg > ag, 'W', np.where(hg == ag, 'D', 'L'))
+            res_a = np.where(hg < ag, 'W', np.where(hg == ag, 'D', 'L'))
+            # Casa e ospite alternate, come nell'export di soccerdata
+            stats.append(pd.DataFrame({
+                'league': league, 'season': season,
+                'team': np.stack([home_names, away_names], 1).ravel(),
+                'game': np.repeat(games, 2), 'date': np.repeat(date_str, 2),
+                'venue': np.tile(['Home', 'Away'], n_games),
+                'result': np.stack([res_h, res_a], 1).ravel(),
+                'GF': np.stack([hg, ag], 1).ravel(), 'GA': np.stack([ag, hg], 1).ravel(),
+                'opponent': np.stack([away_names, home_names], 1).ravel(),
+                'xG': np.stack([hx, ax], 1).ravel(), 'xGA': np.stack([ax, hx], 1).ravel(),
+            }))
+
+            # --- Formazioni: per ogni squadra e partita 16 giocatori estratti secondo la
+            # qualità (Gumbel top-k), i primi 11 titolari, poi 3-5 entrati ---
+            team_idx = np.stack([home, away], 1).ravel()
+            game_idx = np.repeat(np.arange(n_games), 2)
+            keys = quality[li, team_idx] + rng.gumbel(0, 0.8, (len(team_idx), squad_size))
+            picked = np.argsort(-keys, axis=1)[:, :16]
+            n_subs = rng.integers(3, 6, len(team_idx))
+            slot = np.arange(16)
+            plays = slot[None, :] < (11 + n_subs)[:, None]
+            # ~0.5% delle squadre/partite senza formazione (pagina FBref mancante)
+            plays &= (rng.random(len(team_idx)) >= 0.005)[:, None]
+            rows, cols = np.nonzero(plays)
+            player = picked[rows, cols]
+            starter = cols < 11
+            subbed = starter & (rng.random(len(rows)) < 0.25)
+            minutes = np.where(starter, np.where(subbed, rng.integers(55, 90, len(rows)), 90),
+                               rng.integers(1, 36, len(rows)))
+            lineups.append(pd.DataFrame({
+                'league': league, 'season': season, 'game': games[game_idx[rows]],
+                'team': clubs[li, team_idx[rows]], 'player': fbref_names[li, team_idx[rows], player],
+                'position': positions[player], 'minutes_played': minutes, 'is_starter': starter,
+            }))
+
+            # --- Quote: probabilità vere + margine e rumore per bookmaker ---
+            probs = outcome_probs(lam_h, lam_a)
+            book = {}
+            for bk in BOOKMAKERS:
+                margin = rng.uniform(1.03, 1.08)
+                noisy = probs * np.exp(rng.normal(0, 0.04, probs.shape))
+                noisy = noisy / noisy.sum(axis=1, keepdims=True) * margin
+                book[bk] = np.round(1 / noisy, 2)
+            allq = np.stack(list(book.values()))
+            book['Avg'], book['Max'] = np.round(allq.mean(axis=0), 2), allq.max(axis=0)
+            # MatchHistory scrive le squadre a modo suo: a volte minuscolo o con spazi doppi
+            messy = rng.random(n_games)
+            odds_home = np.where(messy < 0.05, [n.lower() for n in home_names],
+                                 np.where(messy < 0.08, [n.replace(' ', '  ') for n in home_names], home_names))
+            kickoff = rng.choice(['15:00', '18:00', '20:45'], n_games)
+            frame = pd.DataFrame({
+                'league': league, 'season': season, 'game': games,
+                'date': date_str + ' ' + kickoff.astype(object),
+                'home_team': odds_home, 'away_team': away_names, 'FTHG': hg, 'FTAG': ag,
+            })
+            for bk, q in book.items():
+                frame[bk + 'H'], frame[bk + 'D'], frame[bk + 'A'] = q[:, 0], q[:, 1], q[:, 2]
+            odds.append(frame)
+
+    # --- Kaggle: le rose + 20% di giocatori che in FBref non compaiono ---
+    n_extra = n_players // 5
+    names = np.concatenate([kaggle_names.ravel(), np.array(make_names(rng, n_extra, used), dtype=object)])
+    last_season = np.concatenate([np.full(n_players, last_year),
+                                  rng.integers(last_year - n_seasons - 5, last_year + 1, n_extra)])
+    players = pd.DataFrame({'player_id': np.arange(len(names)), 'name': names, 'last_season': last_season})
+
+    # Una valutazione ogni ~180 giorni dall'estate prima della prima stagione, qualcuna saltata
+    first_day = np.datetime64(f'{years[0]}-05-01')
+    n_vals = (n_seasons * 365) // 180 + 2
+    base = np.exp(np.concatenate([quality.ravel(), rng.normal(-1, 1, n_extra)]) * 0.9 + 16)
+    walk = np.exp(np.cumsum(rng.normal(0, 0.15, (len(names), n_vals)), axis=1))
+    values = np.round(base[:, None] * walk / 100_000) * 100_000
+    day = first_day + np.arange(n_vals) * 180 + rng.integers(0, 30, (len(names), n_vals))
+    keep = rng.random(values.shape) < 0.9
+    keep[:, 0] = True
+    pid = np.repeat(players['player_id'].to_numpy()[:, None], n_vals, axis=1)
+    valuations = pd.DataFrame({
+        'player_id': pid[keep], 'date': np.datetime_as_string(day[keep], unit='D'),
+        'market_value_in_eur': np.maximum(values[keep], 50_000).astype(np.int64),
+    })
+
+    tables = {
+        'fbref_schedule.csv': pd.concat(schedule, ignore_index=True),
+        'fbref_match_stats.csv': pd.concat(stats, ignore_index=True),
+        'fbref_lineups.csv': pd.concat(lineups, ignore_index=True),
+        'players.csv': players,
+        'player_valuations.csv': valuations,
+        'odds_history.csv': pd.concat(odds, ignore_index=True),
+    }
+    counts = {}
+    for name, df in tables.items():
+        df.to_csv(os.path.join(data_dir, name), index=False)
+        counts[name] = len(df)
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dati sintetici per la pipeline (senza internet)')
+    parser.add_argument('--out', required=True, help='Cartella di lavoro (i CSV vanno in <out>/data/)')
+    parser.add_argument('--leagues', type=int, default=3)
+    parser.add_argument('--seasons', type=int, default=3)
+    parser.add_argument('--teams', type=int, default=20, help='Squadre per campionato (numero pari)')
+    parser.add_argument('--squad-size', type=int, default=25)
+    parser.add_argument('--last-year', type=int, default=2024, help="Anno di inizio dell'ultima stagione")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.abspath(args.out) == os.path.dirname(os.path.dirname(os.path.abspath(__file__))):
+        sys.exit("❌ Non scrivo sopra data/ del repository: scegli un'altra cartella con --out")
+
+    t0 = time.perf_counter()
+    counts = generate(args.out, args.leagues, args.seasons, args.teams, args.squad_size, args.last_year, args.seed)
+    print(f"✅ Dati sintetici in {os.path.join(args.out, 'data')} ({time.perf_counter() - t0:.1f}s)")
+    for name, n in counts.items():
+        print(f"   {name:<24} {n:>10} righe")
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from storage import save_artifact, artifact_path
+from team_registry import load_registry, game_ids, factorize_names
+
+# ==============================================================================
+# CALENDARIO: STAGIONE, GIORNATA, RIPOSO E PARTITE RAVVICINATE (vettoriale)
+# ==============================================================================
+# Season_Year veniva ricalcolato riga per riga con .apply(lambda x: ...) in
+# feature.py, add_final_features.py, final_dataset_polish.py e nel notebook, e
+# la giornata con un groupby().cumcount() sul dataset (quindi senza le partite
+# scartate per mancanza di formazioni).
+# Qui tutto parte dal calendario (fbref_schedule.csv): una riga per squadra e
+# partita, e UN solo ordinamento per (squadra, data), da cui:
+#   Season_Year -> stagione (anno di inizio, da agosto in poi è la nuova)
+#   matchweek   -> n-esima partita della squadra nella stagione
+#   Rest_Days   -> giorni dalla partita precedente della squadra (NaN alla prima)
+#   Games_7d / Games_14d / Games_21d -> partite giocate negli N giorni prima
+#                  (intervallo [data - N, data), la partita di oggi esclusa)
+#   Is_Midweek  -> 1 se si gioca martedì, mercoledì o giovedì
+# Niente groupby né apply: solo np.lexsort, differenze e searchsorted, quindi
+# scala a calendari di molti campionati e decenni.
+
+CONGESTION_WINDOWS = [7, 14, 21]
+MIDWEEK_DAYS = [1, 2, 3]  # lunedì = 0
+CALENDAR_FEATURES = ['Rest_Days'] + [f'Games_{w}d' for w in CONGESTION_WINDOWS]
+
+
+def season_year(dates):
+    """Stagione (anno di inizio): da agosto in poi è la stagione nuova."""
+    return dates.dt.year - (dates.dt.month <= 7).astype(int)
+
+
+def schedule_dates(schedule):
+    """Data di ogni partita: colonna 'date' se c'è, altrimenti i primi 10 caratteri di 'game'."""
+    if 'date' in schedule.columns:
+        return pd.to_datetime(schedule['date']).dt.normalize()
+    return pd.to_datetime(schedule['game'].astype(str).str[:10])
+
+
+def calendar_features(dates, team_ids):
+    """
+    Feature di calendario per righe (data, team_id) in qualsiasi ordine.
+    Ritorna un dict di array allineati alle righe in ingresso.
+    """
+    day = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    team = np.asarray(team_ids, dtype=np.int64)
+    n = len(day)
+
+    # Un solo ordinamento: squadra, poi data (a parità vale l'ordine di ingresso)
+    order = np.lexsort((day, team))
+    day_s, team_s = day[order], team[order]
+    # Chiave unica crescente: blocchi per squadra, date dentro il blocco
+    key = (team_s << 32) + day_s
+    pos = np.arange(n)
+
+    same_team = np.zeros(n, dtype=bool)
+    same_team[1:] = team_s[1:] == team_s[:-1]
+
+    rest = np.full(n, np.nan)
+    rest[1:] = day_s[1:] - day_s[:-1]
+    rest[~same_team] = np.nan
+
+    # Giornata: posizione dentro il blocco (squadra, stagione)
+    dt = day_s.astype('datetime64[D]')
+    year = dt.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = dt.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    season = year - (month <= 7)
+    new_block = ~same_team
+    new_block[1:] |= season[1:] != season[:-1]
+    block_start = np.maximum.accumulate(np.where(new_block, pos, 0))
+
+    sorted_out = {
+        'Season_Year': season,
+        'matchweek': pos - block_start + 1,
+        'Rest_Days': rest,
+    }
+    for w in CONGESTION_WINDOWS:
+        # Partite della stessa squadra con data in [oggi - w, oggi): la chiave
+        # key - w resta nel blocco della squadra
+        sorted_out[f'Games_{w}d'] = pos - np.searchsorted(key, key - w, side='left')
+
+    out = {}
+    for name, values in sorted_out.items():
+        col = np.empty_like(values)
+        col[order] = values
+        out[name] = col
+    # 1970-01-01 era giovedì (3)
+    out['Is_Midweek'] = np.isin((day + 3) % 7, MIDWEEK_DAYS).astype(np.int8)
+    return out
+
+
+def build_calendar(schedule_stats, registry=None):
+    """
+    Dal calendario FBref (una riga per partita) alle feature di calendario,
+    una riga per squadra e partita (casa e ospite consecutive). 'team' è il
+    nome della squadra nel registro (la prima grafia vista).
+    """
+    schedule = schedule_stats[0] if isinstance(schedule_stats, tuple) else schedule_stats
+    registry = registry if registry is not None else load_registry()
+
+    dates = schedule_dates(schedule)
+    home = registry.ids(schedule['home_team'])
+    away = registry.ids(schedule['away_team'])
+    registry.save()
+
+    # Una riga per partita valida: le righe ripetute del calendario hanno lo stesso
+    # game_id (data, casa, ospite), quindi si deduplica su un intero, non sul testo
+    gid = game_ids(dates, home, away)
+    _, first = np.unique(np.where(gid >= 0, gid, np.iinfo(np.int64).max), return_index=True)
+    keep = np.sort(first[gid[first] >= 0])
+    game_codes, games = factorize_names(schedule['game'])
+
+    # Casa e ospite alternate: [casa_0, ospite_0, casa_1, ...]
+    # (stringhe come categorie: un intero per riga invece di una stringa)
+    n = len(keep)
+    team_ids = np.stack([home[keep], away[keep]], axis=1).ravel()
+    cal = pd.DataFrame({
+        'game': pd.Categorical.from_codes(np.repeat(game_codes[keep], 2), games),
+        'game_id': np.repeat(gid[keep], 2),
+        'date': np.repeat(dates.to_numpy()[keep], 2),
+        'team': pd.Categorical.from_codes(team_ids, registry.names),
+        'team_id': team_ids,
+        'is_home': np.tile(np.array([1, 0], dtype=np.int8), n),
+    })
+    if 'league' in schedule.columns:
+        league_codes, leagues = factorize_names(schedule['league'])
+        cal.insert(0, 'league', pd.Categorical.from_codes(np.repeat(league_codes[keep], 2), leagues))
+
+    for name, values in calendar_features(cal['date'].to_numpy(), cal['team_id'].to_numpy()).items():
+        cal[name] = values
+    return cal
+
+
+if __name__ == '__main__':
+    import time
+    from final_dataset_polish import load_schedule_stats
+
+    print("--- FEATURE DI CALENDARIO ---")
+    try:
+        schedule_stats = load_schedule_stats()
+    except FileNotFoundError:
+        print("❌ Errore: Manca il calendario (data/fbref_schedule.csv).")
+        exit()
+
+    t0 = time.perf_counter()
+    cal = build_calendar(schedule_stats)
+    print(f"✅ {len(cal)} righe squadra/partita in {time.perf_counter() - t0:.2f}s")
+    print(cal.head())
+    save_artifact(cal, 'calendar_3')
+    print(f"📁 File salvato come: {artifact_path('calendar_3')}")
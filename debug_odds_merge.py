@@ -1,133 +1,82 @@
 import pandas as pd
 import warnings
+from storage import load_artifact, save_artifact, artifact_path
+from odds import attach_odds, bookmaker_prefixes, main_prefix, odds_long, team_keys
+from team_registry import load_registry
+from instrument import record_metric, share
 
 warnings.filterwarnings('ignore')
 
-print("--- DEBUG E RIPARAZIONE QUOTE ---")
 
-# 1. CARICAMENTO
-try:
-    df = pd.read_csv('data/dataset_ultimate_3.csv') # Il tuo dataset senza quote
-    odds = pd.read_csv('data/odds_history.csv')   # Il file delle quote
+def load_odds():
+    """Il file delle quote (MatchHistory)."""
+    return pd.read_csv('data/odds_history.csv')
+
+
+def merge_odds(df, odds):
+    """
+    Aggiunge al dataset le quote di tutti i bookmaker (prospettiva della squadra,
+    o della squadra di casa se il dataset ha una riga per partita), la quota
+    migliore, le probabilità di consenso e Odds_1/Odds_X/Odds_2.
+    """
+    team_col = 'Home_Team' if 'Home_Team' in df.columns else 'team'
     print(f"✅ File caricati.\nDataset: {len(df)} righe\nOdds: {len(odds)} righe")
-except FileNotFoundError:
-    print("❌ Errore: File non trovati.")
-    exit()
-
-# 2. CONTROLLO NOMI COLONNE (Il problema potrebbe essere qui)
-print("\n🔍 --- NOMI COLONNE NEL FILE ODDS ---")
-print(odds.columns.tolist())
-
-# Cerchiamo colonne che sembrano quote (H, D, A)
-potential_cols = [c for c in odds.columns if c.endswith('H') and len(c) < 7]
-print(f"👉 Colonne che sembrano quote Casa: {potential_cols}")
-
-if not potential_cols:
-    print("❌ NON TROVO COLONNE QUOTE! Controlla il CSV.")
-    exit()
-
-# Scegliamo le migliori (Priorità: B365 -> Avg -> Prima che trova)
-if 'B365H' in odds.columns:
-    cols = ['B365H', 'B365D', 'B365A']
-    print("✅ Uso quote Bet365")
-elif 'AvgH' in odds.columns:
-    cols = ['AvgH', 'AvgD', 'AvgA']
-    print("✅ Uso quote Medie (Avg)")
-else:
-    # Prende la prima che ha trovato (es. PSH)
-    prefix = potential_cols[0][:-1] # Toglie l'ultima lettera H
-    cols = [prefix+'H', prefix+'D', prefix+'A']
-    print(f"⚠️ Non trovo Bet365, uso: {cols}")
-
-# 3. FIX DATE (Il problema più probabile)
-print("\n🛠️ --- RIPARAZIONE DATE ---")
-print(f"Esempio Data Dataset (Prima): {df['date'].iloc[0]}")
-print(f"Esempio Data Odds (Prima):    {odds['date'].iloc[0]}")
-
-# Trasformiamo tutto in Datetime
-df['date'] = pd.to_datetime(df['date'])
-odds['date'] = pd.to_datetime(odds['date'])
-
-# !!! TRUCCO FONDAMENTALE !!!
-# Rimuoviamo l'orario (normalize) così 20:45 diventa 00:00 e combacia
-df['date_norm'] = df['date'].dt.normalize()
-odds['date_norm'] = odds['date'].dt.normalize()
-
-print("✅ Date normalizzate (orario rimosso).")
-
-# 4. STANDARDIZZAZIONE NOMI
-def clean_name(name):
-    if pd.isna(name): return ""
-    name = str(name).lower().strip()
-    replacements = {
-        'inter': 'inter', 'internazionale': 'inter',
-        'milan': 'milan', 'ac milan': 'milan',
-        'juventus': 'juventus', 'juve': 'juventus',
-        'manchester city': 'man city', 'man city': 'man city',
-        'manchester united': 'man utd', 'man utd': 'man utd',
-        'verona': 'verona', 'hellas verona': 'verona'
-    }
-    return replacements.get(name, name)
-
-df['team_key'] = df['team'].apply(clean_name)
-odds['home_key'] = odds['home_team'].apply(clean_name)
-odds['away_key'] = odds['away_team'].apply(clean_name)
-
-# 5. PREPARAZIONE QUOTE (Match-Centric -> Team-Centric)
-# Creiamo un dizionario lookup: (Data, Squadra) -> [1, X, 2]
-odds_lookup = {}
-
-print("🔄 Indicizzazione quote...")
-count = 0
-for _, row in odds.iterrows():
-    d = row['date_norm']
-    h_team = row['home_key']
-    a_team = row['away_key']
-    
-    # Quote 1X2 dal CSV
-    q1 = row[cols[0]]
-    qX = row[cols[1]]
-    q2 = row[cols[2]]
-    
-    # Per la squadra di CASA: Win=1, Draw=X, Lose=2
-    odds_lookup[(d, h_team)] = {'Odds_1': q1, 'Odds_X': qX, 'Odds_2': q2}
-    
-    # Per la squadra OSPITE: Win=2, Draw=X, Lose=1 (INVERSIONE!)
-    # Nota: Qui Odds_1 significa "Quota che IO vinca" (che è il 2 della schedina)
-    odds_lookup[(d, a_team)] = {'Odds_1': q2, 'Odds_X': qX, 'Odds_2': q1}
-    count += 1
-
-print(f"   Indicizzate {len(odds_lookup)} coppie (Data, Squadra).")
-
-# 6. APPLICAZIONE AL DATASET
-print("🔗 Unione al dataset...")
-
-def get_odds(row):
-    key = (row['date_norm'], row['team_key'])
-    if key in odds_lookup:
-        return pd.Series(odds_lookup[key])
-    else:
-        return pd.Series([None, None, None], index=['Odds_1', 'Odds_X', 'Odds_2'])
-
-# Applica la funzione riga per riga
-odds_cols = df.apply(get_odds, axis=1)
-df_final = pd.concat([df, odds_cols], axis=1)
-
-# Pulizia
-df_final.drop(columns=['date_norm', 'team_key'], inplace=True)
-
-# 7. VERIFICA FINALE
-missing = df_final['Odds_1'].isna().sum()
-print("\n📊 --- RISULTATO ---")
-print(f"Totale Righe: {len(df_final)}")
-print(f"Righe con Quote: {len(df_final) - missing}")
-print(f"Righe SENZA Quote: {missing}")
-
-if missing < len(df_final):
+
+    # 2. CONTROLLO NOMI COLONNE (Il problema potrebbe essere qui)
+    print("\n🔍 --- NOMI COLONNE NEL FILE ODDS ---")
+    print(odds.columns.tolist())
+
+    # Tutte le triple H/D/A complete (B365, PS, Avg, Max, ...)
+    prefixes = bookmaker_prefixes(odds.columns)
+    print(f"👉 Bookmaker trovati: {prefixes}")
+
+    if not prefixes:
+        raise ValueError("NON TROVO COLONNE QUOTE! Controlla il CSV.")
+
+    # Odds_1/X/2: Priorità B365 -> Avg -> Prima che trova
+    print(f"✅ Odds_1/X/2 da: {main_prefix(prefixes)}")
+
+    # 3. UNIONE VETTORIALE
+    # Date normalizzate (20:45 -> 00:00) e team_id del registro squadre, poi un solo join
+    print("🔗 Unione al dataset (data normalizzata + squadra)...")
+    df_final = attach_odds(df, odds, prefixes, team_col=team_col)
+
+    # 4. VERIFICA FINALE
+    missing = df_final['Odds_1'].isna().sum()
+    print("\n📊 --- RISULTATO ---")
+    print(f"Totale Righe: {len(df_final)}")
+    print(f"Righe con Quote: {len(df_final) - missing}")
+    print(f"Righe SENZA Quote: {missing}")
+    record_metric('odds_found_share', share(len(df_final) - missing, len(df_final)))
+
+    if missing == len(df_final):
+        print("❌ ANCORA TUTTO VUOTO. Il problema è nei nomi delle squadre o le date non coincidono per niente.")
+        print("Esempio Chiave Dataset:", (pd.to_datetime(df['date']).dt.normalize().iloc[0], team_keys(df[team_col])[0]))
+        registry = load_registry()
+        long = odds_long(odds, prefixes, registry)
+        print("Esempio Chiave Odds (primi 3):", [(d, registry.name(t)) for d, t in zip(long['date_norm'], long['team_id'])][:3])
+        raise ValueError("Nessuna quota collegata al dataset.")
+
     print("✅ SUCCESSO! Le quote sono state inserite.")
-    df_final.to_csv('data/dataset_con_quote_FIXED_3.csv', index=False)
-    print("📁 Salvato in: 'data/dataset_con_quote_FIXED.csv'")
-else:
-    print("❌ ANCORA TUTTO VUOTO. Il problema è nei nomi delle squadre o le date non coincidono per niente.")
-    print("Esempio Chiave Dataset:", (df['date_norm'].iloc[0], df['team_key'].iloc[0]))
-    print("Esempio Chiave Odds (primi 3):", list(odds_lookup.keys())[:3])
\ No newline at end of file
+    return df_final
+
+
+if __name__ == '__main__':
+    print("--- DEBUG E RIPARAZIONE QUOTE ---")
+
+    # 1. CARICAMENTO
+    try:
+        df = load_artifact('dataset_match_3') # Il tuo dataset senza quote (una riga per partita, match_table.py)
+        odds = load_odds()   # Il file delle quote
+    except FileNotFoundError:
+        print("❌ Errore: File non trovati.")
+        exit()
+
+    try:
+        df_final = merge_odds(df, odds)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit()
+
+    save_artifact(df_final, 'dataset_con_quote_FIXED_3')
+    print(f"📁 Salvato in: '{artifact_path('dataset_con_quote_FIXED_3')}'")
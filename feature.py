@@ -1,145 +1,300 @@
+import os
+import numpy as np
 import pandas as pd
-from thefuzz import process
+from name_cache import resolve_names
+from valuation_index import load_valuation_index
+from storage import save_artifact
+from raw_store import load_raw, iter_raw, PARTITION_COLUMNS
+from team_registry import load_registry
+from calendar_features import season_year
+from instrument import record_metric, share
+from partitions import split_partitions, map_partitions
 import warnings
 
 # Ignoriamo i warning per pulizia
 warnings.filterwarnings('ignore')
 
-print("--- AVVIO INTEGRAZIONE FBREF & TRANSFERMARKT ---")
+# Modalità streaming (SERIE_A_STREAMING=1 o python pipeline.py --streaming):
+# le formazioni non vengono mai caricate per intero, ma lette a blocchi di
+# LINEUP_CHUNK_ROWS righe e sommate per (partita, squadra) man mano.
+# Il risultato è identico alla modalità normale; la memoria dipende dalla
+# dimensione del blocco e dal numero di partite, non dalle righe di formazione.
+LINEUP_COLUMNS = ['game', 'team', 'player', 'is_starter']
+LINEUP_CHUNK_ROWS = int(os.environ.get('SERIE_A_CHUNK_ROWS', 500_000))
+
+
+def streaming_enabled():
+    return os.environ.get('SERIE_A_STREAMING', '').lower() in ('1', 'true', 'on')
+
+
+class LineupChunks:
+    """Le formazioni come sorgente da leggere a blocchi (solo le colonne che servono)."""
+
+    def __init__(self, chunksize=LINEUP_CHUNK_ROWS):
+        self.chunksize = chunksize
+
+    def __iter__(self):
+        # Nomi, partite e squadre si ripetono molto: categorie invece di stringhe
+        dtype = {'game': 'category', 'team': 'category', 'player': 'category'}
+        for chunk in iter_raw('lineups', LINEUP_COLUMNS, chunksize=self.chunksize, dtype=dtype):
+            # Filtriamo subito i TITOLARI: le riserve non entrano nel valore
+            yield chunk[chunk['is_starter'] == True]
+
 
 # ==============================================================================
 # 1. CARICAMENTO DATI FBREF
 # ==============================================================================
-print("1. Caricamento dati FBref...")
-try:
-    df_lineups = pd.read_csv('data/fbref_lineups.csv') 
-    df_stats = pd.read_csv('data/fbref_match_stats.csv') 
+def load_fbref():
+    """Carica lineups e statistiche FBref e ricava la data dalla colonna 'game'."""
+    print("1. Caricamento dati FBref...")
+    df_stats = load_raw('match_stats')
+    if 'game' in df_stats.columns:
+        df_stats['date'] = pd.to_datetime(df_stats['game'].str[:10])
+
+    if streaming_enabled():
+        # La data delle formazioni viene ricavata blocco per blocco
+        print(f"   🌊 Modalità streaming: formazioni lette a blocchi di {LINEUP_CHUNK_ROWS} righe.")
+        return LineupChunks(), df_stats
+
+    # Archivio partizionato data/raw/ se c'è, altrimenti i Master File CSV
+    df_lineups = load_raw('lineups')
 
     # --- CORREZIONE FONDAMENTALE: CREAZIONE DELLA DATA ---
     print("   🛠️  Estraggo la data dalla colonna 'game'...")
-    
+
     # Se la colonna 'game' esiste, estraiamo i primi 10 caratteri (YYYY-MM-DD)
     if 'game' in df_lineups.columns:
         df_lineups['date'] = pd.to_datetime(df_lineups['game'].str[:10])
     else:
-        print("❌ ERRORE: Nel file fbref_lineups.csv manca la colonna 'game'!")
-        exit()
-        
-    # Facciamo lo stesso per le statistiche
-    if 'game' in df_stats.columns:
-         df_stats['date'] = pd.to_datetime(df_stats['game'].str[:10])
+        raise KeyError("Nel file fbref_lineups.csv manca la colonna 'game'!")
+
+    return df_lineups, df_stats
 
-except FileNotFoundError:
-    print("❌ ERRORE: Non trovo i file fbref nella cartella 'data/'.")
-    exit()
 
 # ==============================================================================
 # 2. CARICAMENTO DATI KAGGLE (SOLDI)
 # ==============================================================================
-print("2. Caricamento dati Valori (Kaggle)...")
-try:
+def load_kaggle():
+    """Carica i giocatori Kaggle e l'indice dei valori di mercato."""
+    print("2. Caricamento dati Valori (Kaggle)...")
     # Carichiamo solo quello che serve
     df_k_players = pd.read_csv('data/players.csv', usecols=['player_id', 'name', 'last_season'])
-    df_k_vals = pd.read_csv('data/player_valuations.csv')
-    
-    # Convertiamo la data in formato data
-    df_k_vals['date'] = pd.to_datetime(df_k_vals['date'])
-    
-except FileNotFoundError:
-    print("❌ ERRORE: Non trovo i file Kaggle (players.csv, player_valuations.csv).")
-    exit()
 
-# ==============================================================================
-# 3. CREAZIONE DIZIONARIO NOMI (FUZZY MATCHING)
-# ==============================================================================
-print("3. Creazione mappa nomi (questo potrebbe richiedere 1-2 minuti)...")
+    # Le valutazioni arrivano dall'indice binario (ricostruito solo se il CSV cambia)
+    val_index = load_valuation_index('data/player_valuations.csv')
 
-# Ottimizzazione: Filtriamo solo giocatori recenti di Kaggle per velocizzare
-recent_players = df_k_players[df_k_players['last_season'] >= 2017]
-kaggle_names = recent_players['name'].unique()
+    return df_k_players, val_index
 
-# Nomi da FBref
-fbref_names = df_lineups['player'].dropna().unique()
 
-print(f"   Devo mappare {len(fbref_names)} giocatori...")
+def map_names(fbref_names, recent_players):
+    """Nomi FBref -> nomi Kaggle (la cache su disco evita il fuzzy sui nomi già visti)."""
+    print(f"   Devo mappare {len(fbref_names)} giocatori...")
 
-name_mapping = {}
-# Creiamo dizionario per match esatto veloce (lowercase)
-kaggle_names_clean = {str(n).lower(): n for n in kaggle_names}
+    # La cache su disco (data/name_mapping_cache.csv) ricorda i nomi già risolti:
+    # il fuzzy matching gira solo sui giocatori mai visti prima.
+    name_mapping = resolve_names(fbref_names, recent_players)
 
-for name in fbref_names:
-    n_str = str(name)
-    n_clean = n_str.lower()
-    
-    # 1. Match Esatto
-    if n_clean in kaggle_names_clean:
-        name_mapping[name] = kaggle_names_clean[n_clean]
-    else:
-        # 2. Match Fuzzy (Simile)
-        match, score = process.extractOne(n_str, kaggle_names)
-        if score >= 85: 
-            name_mapping[name] = match
-        else:
-            name_mapping[name] = None 
+    n_mapped = len([k for k,v in name_mapping.items() if v])
+    print(f"   Mappati {n_mapped} su {len(fbref_names)} giocatori.")
+    record_metric('names_mapped_share', share(n_mapped, len(fbref_names)))
+    return name_mapping
 
-print(f"   Mappati {len([k for k,v in name_mapping.items() if v])} su {len(fbref_names)} giocatori.")
 
-# ==============================================================================
-# 4. APPLICAZIONE VALORI E CALCOLO
-# ==============================================================================
-print("4. Calcolo valore formazioni...")
+def empty_lineup_values():
+    return pd.DataFrame({'game_code': pd.Series(dtype=np.int64), 'team_id': pd.Series(dtype=np.int32),
+                         'market_value_in_eur': pd.Series(dtype=np.float64)})
 
-# Uniamo i nomi corretti
-df_lineups['kaggle_name'] = df_lineups['player'].map(name_mapping)
-df_lineups_matched = df_lineups.dropna(subset=['kaggle_name'])
 
-# Recuperiamo l'ID giocatore Kaggle
-df_lineups_matched = df_lineups_matched.merge(recent_players[['name', 'player_id']], left_on='kaggle_name', right_on='name', how='left')
+def lineup_values_in_memory(df_lineups, recent_players, val_index, registry, games):
+    """
+    Somma dei valori dei titolari per (game_code, team_id), formazioni tutte in memoria.
+    Nomi e chiavi intere si risolvono qui; il resto gira per partizione
+    (lega, stagione) in lineup_partition_values, anche in più processi (partitions.py).
+    """
+    # Nomi da FBref
+    name_mapping = map_names(df_lineups['player'].dropna().unique(), recent_players)
 
-# Ordiniamo per il merge asof
-df_k_vals = df_k_vals.sort_values('date')
-df_lineups_matched = df_lineups_matched.sort_values('date')
+    # ==============================================================================
+    # 4. APPLICAZIONE VALORI E CALCOLO
+    # ==============================================================================
+    print("4. Calcolo valore formazioni...")
 
-# Colleghiamo il valore (Soldi) alla partita (Data)
-df_valued = pd.merge_asof(
-    df_lineups_matched,
-    df_k_vals[['player_id', 'date', 'market_value_in_eur']],
-    on='date',
-    by='player_id',
-    direction='backward'
-)
+    # --- QUI C'ERA L'ERRORE PRIMA: USIAMO 'game' INVECE DI 'game_id' ---
+    lineups = pd.DataFrame({'game_code': games.get_indexer(df_lineups['game']),
+                            'team_id': registry.ids(df_lineups['team']),
+                            'player': df_lineups['player'].to_numpy(),
+                            'date': df_lineups['date'].to_numpy(),
+                            'is_starter': df_lineups['is_starter'].to_numpy()})
 
-# Filtriamo solo i TITOLARI (is_starter = True)
-starters = df_valued[df_valued['is_starter'] == True]
+    keys = [c for c in PARTITION_COLUMNS if c in df_lineups.columns]
+    parts = split_partitions(df_lineups, keys) if keys else [(None, np.arange(len(lineups)))]
+    tasks = []
+    for _, rows in parts:
+        part = lineups.iloc[rows]
+        # A ogni partizione solo i nomi che contiene
+        names = part['player'].dropna().unique()
+        tasks.append((part, {n: name_mapping[n] for n in names}))
 
-# --- QUI C'ERA L'ERRORE PRIMA: USIAMO 'game' INVECE DI 'game_id' ---
-lineup_values = starters.groupby(['game', 'team'])['market_value_in_eur'].sum().reset_index()
-lineup_values.rename(columns={'market_value_in_eur': 'Starting_XI_Value'}, inplace=True)
+    partials = map_partitions(lineup_partition_values, tasks, shared=(recent_players[['name', 'player_id']], val_index),
+                              n_rows=len(lineups))
+    if not partials:
+        return empty_lineup_values()
+    # Una partita sta in una sola partizione: la somma finale serve solo se i dati la spezzano
+    return pd.concat(partials).groupby(['game_code', 'team_id'])['market_value_in_eur'].sum().reset_index()
 
-# ==============================================================================
-# 5. MERGE FINALE E FEATURE ENGINEERING
-# ==============================================================================
-print("5. Creazione dataset finale...")
 
-# Uniamo usando 'game' e 'team'
-final_df = df_stats.merge(lineup_values, on=['game', 'team'], how='left')
+def lineup_partition_values(shared, task):
+    """Valore dei titolari di una partizione per (game_code, team_id) (gira anche in un processo figlio)."""
+    player_ids, val_index = shared
+    df_lineups, name_mapping = task
+
+    # Uniamo i nomi corretti
+    df_lineups = df_lineups.copy()
+    df_lineups['kaggle_name'] = df_lineups['player'].map(name_mapping)
+    df_lineups_matched = df_lineups.dropna(subset=['kaggle_name'])
+
+    # Recuperiamo l'ID giocatore Kaggle
+    df_lineups_matched = df_lineups_matched.merge(player_ids, left_on='kaggle_name', right_on='name', how='left')
+
+    # Colleghiamo il valore (Soldi) alla partita (Data)
+    # Ultima valutazione del giocatore con data <= data partita (come merge_asof 'backward')
+    df_valued = df_lineups_matched
+    df_valued['market_value_in_eur'] = val_index.values_asof(df_valued['player_id'], df_valued['date'])
+
+    # Filtriamo solo i TITOLARI (is_starter = True)
+    starters = df_valued[df_valued['is_starter'] == True]
+
+    # Le partite che non sono nelle statistiche non servono (il join è un left join)
+    starters = starters[(starters['game_code'] >= 0) & (starters['team_id'] >= 0)]
+    return starters.groupby(['game_code', 'team_id'])['market_value_in_eur'].sum().reset_index()
 
-# Creiamo l'anno della stagione
-final_df['Season_Year'] = final_df['date'].apply(lambda x: x.year if x.month > 7 else x.year - 1)
 
-# Calcoliamo la mediana stagionale ("Valore Solito")
-final_df['Typical_XI_Value'] = final_df.groupby(['team', 'Season_Year'])['Starting_XI_Value'].transform('median')
+def stream_lineup_values(lineups, recent_players, val_index, registry, games, compact_every=16):
+    """
+    Come lineup_values_in_memory ma a blocchi (modalità streaming), in due passate:
+    1. i nomi distinti dei titolari, risolti una volta sola;
+    2. per ogni blocco: chiavi intere, ID Kaggle, valore "as-of" alla data della
+       partita e somma parziale per (game_code, team_id).
+    Le somme parziali vengono ricompattate ogni `compact_every` blocchi: in memoria
+    restano al massimo un blocco e una riga per (partita, squadra).
+    I valori sono euro interi, quindi le somme non dipendono dall'ordine dei blocchi.
+    """
+    # Nomi da FBref (solo i titolari: gli altri non entrano nel valore)
+    fbref_names = {}
+    for chunk in lineups:
+        fbref_names.update(dict.fromkeys(chunk['player'].dropna().unique()))
+    name_mapping = map_names(list(fbref_names), recent_players)
 
-# Feature: Ratio (Valore Oggi / Valore Solito)
-final_df['Lineup_Strength_Ratio'] = final_df['Starting_XI_Value'] / final_df['Typical_XI_Value']
+    print("4. Calcolo valore formazioni (a blocchi)...")
+    # La data della partita arriva dal suo codice (primi 10 caratteri di 'game')
+    game_dates = pd.to_datetime(pd.Series(games).str[:10]).to_numpy()
+    player_ids = recent_players[['name', 'player_id']]
 
-# Pulizia finale
-final_df = final_df.dropna(subset=['Starting_XI_Value']) # Rimuove righe senza valori
-cols_to_keep = ['date', 'game', 'team', 'opponent', 'result', 'xG', 'Starting_XI_Value', 'Lineup_Strength_Ratio']
-final_output = final_df[[c for c in cols_to_keep if c in final_df.columns]]
+    partials, n_rows, n_chunks = [], 0, 0
+    for chunk in lineups:
+        n_rows += len(chunk)
+        n_chunks += 1
+        part = pd.DataFrame({'game_code': games.get_indexer(np.asarray(chunk['game'], dtype=object)),
+                             'team_id': registry.ids(chunk['team']),
+                             'kaggle_name': np.asarray(chunk['player'], dtype=object)})
+        part = part[(part['game_code'] >= 0) & (part['team_id'] >= 0)]
+        part['kaggle_name'] = part['kaggle_name'].map(name_mapping)
+        part = part.dropna(subset=['kaggle_name'])
 
-print("-" * 30)
-print(f"✅ FATTO! Dataset creato con {len(final_output)} partite.")
-print(final_output.head())
+        # Recuperiamo l'ID giocatore Kaggle (nomi doppi -> righe doppie, come in memoria)
+        part = part.merge(player_ids, left_on='kaggle_name', right_on='name', how='left')
+        part['market_value_in_eur'] = val_index.values_asof(part['player_id'],
+                                                            game_dates[part['game_code'].to_numpy()])
+        partials.append(part.groupby(['game_code', 'team_id'])['market_value_in_eur'].sum().reset_index())
+
+        if len(partials) >= compact_every:
+            partials = [pd.concat(partials).groupby(['game_code', 'team_id'])['market_value_in_eur'].sum().reset_index()]
+
+    print(f"   {n_rows} titolari letti in {n_chunks} blocchi.")
+    record_metric('lineup_chunks', n_chunks)
+    if not partials:
+        return empty_lineup_values()
+    return pd.concat(partials).groupby(['game_code', 'team_id'])['market_value_in_eur'].sum().reset_index()
+
+
+def build_lineup_dataset(fbref, kaggle):
+    """Dai dati FBref e Kaggle al dataset con il valore delle formazioni (Starting_XI_Value)."""
+    df_lineups, df_stats = fbref
+    df_k_players, val_index = kaggle
+
+    # ==============================================================================
+    # 3. CREAZIONE DIZIONARIO NOMI (FUZZY MATCHING)
+    # ==============================================================================
+    print("3. Creazione mappa nomi (solo i nomi nuovi, il resto arriva dalla cache)...")
+
+    # Ottimizzazione: Filtriamo solo giocatori recenti di Kaggle per velocizzare
+    recent_players = df_k_players[df_k_players['last_season'] >= 2017]
+
+    # Chiavi intere invece delle stringhe: game_code (posizione della partita nelle
+    # statistiche) e team_id del registro squadre
+    registry = load_registry()
+    df_stats = df_stats.copy()
+    codes, games = pd.factorize(df_stats['game'])
+    games = pd.Index(np.asarray(games))  # stringhe anche se 'game' arriva come categoria
+    df_stats['game_code'] = codes
+    df_stats['team_id'] = registry.ids(df_stats['team'])
+
+    if isinstance(df_lineups, LineupChunks):
+        lineup_values = stream_lineup_values(df_lineups, recent_players, val_index, registry, games)
+    else:
+        lineup_values = lineup_values_in_memory(df_lineups, recent_players, val_index, registry, games)
+    registry.save()
+    lineup_values.rename(columns={'market_value_in_eur': 'Starting_XI_Value'}, inplace=True)
+
+    # ==============================================================================
+    # 5. MERGE FINALE E FEATURE ENGINEERING
+    # ==============================================================================
+    print("5. Creazione dataset finale...")
+
+    # Uniamo usando partita e squadra (codici interi)
+    final_df = df_stats.merge(lineup_values, on=['game_code', 'team_id'], how='left')
+
+    # Creiamo l'anno della stagione
+    final_df['Season_Year'] = season_year(final_df['date'])
+
+    # Calcoliamo la mediana stagionale ("Valore Solito")
+    final_df['Typical_XI_Value'] = final_df.groupby(['team', 'Season_Year'])['Starting_XI_Value'].transform('median')
+
+    # Feature: Ratio (Valore Oggi / Valore Solito)
+    final_df['Lineup_Strength_Ratio'] = final_df['Starting_XI_Value'] / final_df['Typical_XI_Value']
+
+    # Partite/squadra con il valore della formazione (le altre vengono scartate qui sotto)
+    record_metric('rows_with_value_share', share(int(final_df['Starting_XI_Value'].notna().sum()), len(final_df)))
+
+    # Pulizia finale
+    final_df = final_df.dropna(subset=['Starting_XI_Value']) # Rimuove righe senza valori
+    cols_to_keep = ['date', 'game', 'team', 'opponent', 'result', 'xG', 'Starting_XI_Value', 'Lineup_Strength_Ratio']
+    final_output = final_df[[c for c in cols_to_keep if c in final_df.columns]]
+
+    print("-" * 30)
+    print(f"✅ FATTO! Dataset creato con {len(final_output)} partite.")
+    print(final_output.head())
+
+    return final_output
+
+
+if __name__ == '__main__':
+    print("--- AVVIO INTEGRAZIONE FBREF & TRANSFERMARKT ---")
+
+    try:
+        fbref = load_fbref()
+    except FileNotFoundError:
+        print("❌ ERRORE: Non trovo i file fbref nella cartella 'data/'.")
+        exit()
+    except KeyError as e:
+        print(f"❌ ERRORE: {e}")
+        exit()
+
+    try:
+        kaggle = load_kaggle()
+    except FileNotFoundError:
+        print("❌ ERRORE: Non trovo i file Kaggle (players.csv, player_valuations.csv).")
+        exit()
 
-final_output.to_csv('data/dataset_completo_xgboost_3.csv', index=False)
\ No newline at end of file
+    final_output = build_lineup_dataset(fbref, kaggle)
+    save_artifact(final_output, 'dataset_completo_xgboost_3')
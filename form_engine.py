@@ -0,0 +1,269 @@
+import os
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# MOTORE "FORMA" PER SQUADRA (media mobile xG / xGA delle ultime 5 partite)
+# ==============================================================================
+# Gli script di training calcolavano la forma con
+#   groupby('team')[col].transform(lambda x: x.shift(1).rolling(5, min_periods=1).mean())
+# rifacendo tutta la storia ad ogni esecuzione, e le previsioni live usavano la
+# forma PRE-partita dell'ultima riga salvata (quindi senza l'ultimo risultato).
+#
+# Qui ogni squadra ha uno stato fisso:
+#   - ring buffer con gli ultimi 5 valori (serve per toglierli dalla finestra)
+#   - somma della finestra con la stessa somma compensata (Kahan) di pandas,
+#     così i risultati sono IDENTICI bit per bit a rolling().mean()
+# Aggiungere una partita costa O(1); form() restituisce la forma dopo l'ultima
+# partita giocata, cioè quella da usare per la prossima.
+# Lo stato si salva in data/form_state.npz e si aggiorna solo con le partite nuove.
+
+FORM_WINDOW = 5
+FORM_STATS = ['xG', 'xGA']
+STATE_PATH = 'data/form_state.npz'
+
+
+class FormEngine:
+    def __init__(self, stats=FORM_STATS, window=FORM_WINDOW):
+        self.stats = list(stats)
+        self.window = window
+        self.teams = []
+        self.team_index = {}
+
+        n_stats = len(self.stats)
+        self.buffer = np.full((0, window, n_stats), np.nan)  # ultimi valori (ring buffer)
+        self.pos = np.zeros(0, dtype=np.int64)                 # prossima cella da scrivere
+        self.n_games = np.zeros(0, dtype=np.int64)             # partite viste
+        self.last_date = np.zeros(0, dtype='datetime64[ns]')   # data ultima partita
+        # Stato della somma compensata (come roll_mean di pandas)
+        self.sum_x = np.zeros((0, n_stats))
+        self.comp_add = np.zeros((0, n_stats))
+        self.comp_remove = np.zeros((0, n_stats))
+        self.nobs = np.zeros((0, n_stats), dtype=np.int64)
+        self.neg_ct = np.zeros((0, n_stats), dtype=np.int64)
+        self.same_ct = np.zeros((0, n_stats), dtype=np.int64)
+        self.prev = np.zeros((0, n_stats))
+        # Media e deviazione standard del campionato nella stagione in corso (per lo z-score)
+        self.league_mean = np.full(n_stats, np.nan)
+        self.league_std = np.full(n_stats, np.nan)
+
+    # --------------------------------------------------------------------------
+    # SQUADRE
+    # --------------------------------------------------------------------------
+    def team_ids(self, teams, create=True):
+        """Nomi squadra -> righe dello stato (nuove squadre aggiunte se create=True, altrimenti -1)."""
+        new = [t for t in dict.fromkeys(teams) if t not in self.team_index]
+        if new and create:
+            for t in new:
+                self.team_index[t] = len(self.teams)
+                self.teams.append(t)
+            k, n_stats = len(new), len(self.stats)
+            self.buffer = np.concatenate([self.buffer, np.full((k, self.window, n_stats), np.nan)])
+            self.pos = np.concatenate([self.pos, np.zeros(k, dtype=np.int64)])
+            self.n_games = np.concatenate([self.n_games, np.zeros(k, dtype=np.int64)])
+            self.last_date = np.concatenate([self.last_date, np.full(k, np.datetime64('NaT'), dtype='datetime64[ns]')])
+            for name in ['sum_x', 'comp_add', 'comp_remove']:
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros((k, n_stats))]))
+            for name in ['nobs', 'neg_ct', 'same_ct']:
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros((k, n_stats), dtype=np.int64)]))
+            self.prev = np.concatenate([self.prev, np.full((k, n_stats), np.nan)])
+        return np.array([self.team_index.get(t, -1) for t in teams], dtype=np.int64)
+
+    # --------------------------------------------------------------------------
+    # AGGIORNAMENTO (vettoriale su più squadre, ognuna al massimo una volta)
+    # --------------------------------------------------------------------------
+    def _add(self, idx, vals):
+        ok = ~np.isnan(vals)
+        s, c = self.sum_x[idx], self.comp_add[idx]
+        y = vals - c
+        t = s + y
+        self.comp_add[idx] = np.where(ok, t - s - y, c)
+        self.sum_x[idx] = np.where(ok, t, s)
+        self.nobs[idx] += ok
+        self.neg_ct[idx] += ok & np.signbit(vals)
+        # pandas conta i valori uguali consecutivi per evitare residui di arrotondamento
+        same = vals == self.prev[idx]
+        self.same_ct[idx] = np.where(ok, np.where(same, self.same_ct[idx] + 1, 1), self.same_ct[idx])
+        self.prev[idx] = np.where(ok, vals, self.prev[idx])
+
+    def _remove(self, idx, vals):
+        ok = ~np.isnan(vals)
+        s, c = self.sum_x[idx], self.comp_remove[idx]
+        y = -vals - c
+        t = s + y
+        self.comp_remove[idx] = np.where(ok, t - s - y, c)
+        self.sum_x[idx] = np.where(ok, t, s)
+        self.nobs[idx] -= ok
+        self.neg_ct[idx] -= ok & np.signbit(vals)
+
+    def _mean(self, idx):
+        nobs, neg = self.nobs[idx], self.neg_ct[idx]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            res = self.sum_x[idx] / nobs
+        res = np.where(self.same_ct[idx] >= nobs, self.prev[idx], res)
+        res = np.where((self.same_ct[idx] < nobs) & (neg == 0) & (res < 0), 0.0, res)
+        res = np.where((self.same_ct[idx] < nobs) & (neg == nobs) & (res > 0), 0.0, res)
+        return np.where(nobs > 0, res, np.nan)
+
+    def _push(self, idx, vals, dates=None):
+        """Nuova partita per le squadre idx: esce il valore di 5 partite fa, entra quello nuovo."""
+        full = self.n_games[idx] >= self.window
+        old = np.where(full[:, None], self.buffer[idx, self.pos[idx]], np.nan)
+        self._remove(idx, old)
+        self._add(idx, vals)
+        self.buffer[idx, self.pos[idx]] = vals
+        self.pos[idx] = (self.pos[idx] + 1) % self.window
+        self.n_games[idx] += 1
+        if dates is not None:
+            self.last_date[idx] = dates
+
+    # --------------------------------------------------------------------------
+    # API
+    # --------------------------------------------------------------------------
+    def update(self, team, values, date=None):
+        """Aggiunge UNA partita giocata da `team` (values: dict statistica -> valore). O(1)."""
+        idx = self.team_ids([team])
+        vals = np.array([[float(values.get(s, np.nan)) for s in self.stats]])
+        dates = None if date is None else np.array([pd.Timestamp(date).to_datetime64()], dtype='datetime64[ns]')
+        self._push(idx, vals, dates)
+
+    def form(self, team):
+        """Forma attuale (dopo l'ultima partita giocata): dict statistica -> media, None se squadra sconosciuta."""
+        if team not in self.team_index:
+            return None
+        means = self._mean(np.array([self.team_index[team]]))[0]
+        return dict(zip(self.stats, means.tolist()))
+
+    def relative_form(self, team):
+        """
+        Forma attuale come nel training: (media mobile - media campionato) / dev. std,
+        0 se non calcolabile. Ritorna dict statistica -> z-score, None se squadra sconosciuta.
+        """
+        form = self.form(team)
+        if form is None:
+            return None
+        z = (np.array([form[s] for s in self.stats]) - self.league_mean) / self.league_std
+        return dict(zip(self.stats, np.nan_to_num(z, nan=0.0).tolist()))
+
+    def ingest(self, df, team_col='team', date_col='date'):
+        """
+        Aggiunge tutte le righe di df (una per squadra e partita), nell'ordine
+        in cui compaiono per ciascuna squadra. Ritorna la forma PRE-partita di
+        ogni riga (array n_righe x n_stats), come shift(1).rolling(...).mean().
+        Le righe senza squadra restano NaN (come groupby).
+        """
+        out = np.full((len(df), len(self.stats)), np.nan)
+        teams = df[team_col]
+        valid = teams.notna().to_numpy()
+        if not valid.any():
+            return out
+
+        rows = np.flatnonzero(valid)
+        idx = self.team_ids(teams.to_numpy()[rows].tolist())
+        vals = df[self.stats].to_numpy(np.float64)[rows]
+        dates = pd.to_datetime(df[date_col]).to_numpy()[rows] if date_col in df.columns else None
+        # k-esima partita di ogni squadra in questo df
+        rank = pd.Series(idx).groupby(idx).cumcount().to_numpy()
+
+        # Passo k: tutte le squadre alla loro k-esima partita insieme
+        order = np.argsort(rank, kind='stable')
+        bounds = np.searchsorted(rank[order], np.arange(rank.max() + 2))
+        for k in range(rank.max() + 1):
+            step = order[bounds[k]:bounds[k + 1]]
+            out[rows[step]] = self._mean(idx[step])
+            self._push(idx[step], vals[step], None if dates is None else dates[step])
+        return out
+
+    # --------------------------------------------------------------------------
+    # SALVATAGGIO
+    # --------------------------------------------------------------------------
+    def save(self, path=STATE_PATH):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, stats=np.array(self.stats), window=self.window,
+                 teams=np.array(self.teams, dtype=str), buffer=self.buffer, pos=self.pos,
+                 n_games=self.n_games, last_date=self.last_date, sum_x=self.sum_x,
+                 comp_add=self.comp_add, comp_remove=self.comp_remove, nobs=self.nobs,
+                 neg_ct=self.neg_ct, same_ct=self.same_ct, prev=self.prev,
+                 league_mean=self.league_mean, league_std=self.league_std)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        with np.load(path) as data:
+            engine = cls(data['stats'].tolist(), int(data['window']))
+            engine.teams = data['teams'].tolist()
+            engine.team_index = {t: i for i, t in enumerate(engine.teams)}
+            for name in ['buffer', 'pos', 'n_games', 'last_date', 'sum_x', 'comp_add',
+                         'comp_remove', 'nobs', 'neg_ct', 'same_ct', 'prev', 'league_mean', 'league_std']:
+                setattr(engine, name, data[name])
+        return engine
+
+
+def rolling_form(df, col, by='team', window=FORM_WINDOW):
+    """
+    Media delle ultime `window` partite PRIMA di ogni riga, per squadra.
+    Identica a df.groupby(by)[col].transform(lambda x: x.shift(1).rolling(window, min_periods=1).mean())
+    """
+    return rolling_forms(df, [col], by, window)[col]
+
+
+def rolling_forms(df, cols, by='team', window=FORM_WINDOW, partition=None):
+    """
+    rolling_form su più colonne insieme (DataFrame con le colonne `cols`).
+    partition: chiave per riga (es. la lega della squadra) che non divide mai
+    una squadra fra due partizioni: ogni partizione gira da sola, anche in
+    più processi (partitions.py), con lo stesso risultato.
+    """
+    data = df[[by] + list(cols)]
+    if partition is None:
+        pre = _rolling_partition(window, data)
+    else:
+        from partitions import split_partitions, map_partitions
+        pre = np.full((len(df), len(cols)), np.nan)
+        parts = split_partitions(data, [partition])
+        results = map_partitions(_rolling_partition, [data.iloc[rows] for _, rows in parts],
+                                 shared=window, n_rows=len(df))
+        for (_, rows), part_pre in zip(parts, results):
+            pre[rows] = part_pre
+    return pd.DataFrame(pre, index=df.index, columns=list(cols))
+
+
+def _rolling_partition(window, data):
+    """Forma pre-partita delle righe di `data` (prima colonna = squadra, poi le statistiche)."""
+    engine = FormEngine(list(data.columns[1:]), window)
+    return engine.ingest(data, team_col=data.columns[0], date_col=None)
+
+
+def update_form_state(stats_df, path=STATE_PATH):
+    """
+    Porta lo stato salvato in `path` alla situazione di stats_df (statistiche
+    FBref per squadra e partita): aggiunge solo le partite più recenti
+    dell'ultima già vista per ogni squadra. Crea lo stato se non esiste.
+    """
+    engine = FormEngine.load(path) if os.path.exists(path) else FormEngine()
+
+    df = stats_df.dropna(subset=['team']).copy()
+    df['date'] = pd.to_datetime(df['date'])
+    for s in engine.stats:
+        if s not in df.columns:
+            df[s] = np.nan
+    df = df.sort_values(['team', 'date'], kind='stable')
+
+    # Statistiche del campionato nella stagione più recente (stessa regola di
+    # calendar_features.season_year, senza importare storage/pyarrow qui)
+    season = df['date'].dt.year - (df['date'].dt.month <= 7).astype(int)
+    current = df[season == season.max()]
+    engine.league_mean = current[engine.stats].mean().to_numpy(np.float64)
+    engine.league_std = current[engine.stats].std().to_numpy(np.float64)
+
+    # Solo partite successive all'ultima già nello stato
+    known = engine.team_ids(df['team'].tolist(), create=False)
+    last = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+    last[known >= 0] = engine.last_date[known[known >= 0]]
+    new = pd.isna(last) | (df['date'].to_numpy() > last)
+    df = df[new]
+
+    if len(df):
+        engine.ingest(df)
+    engine.save(path)
+    return engine, len(df)
@@ -0,0 +1,237 @@
+import os
+import unicodedata
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from rapidfuzz import fuzz, process as rf_process
+from thefuzz.utils import full_process
+
+# ==============================================================================
+# FUZZY MATCHER A BLOCCHI (sostituisce process.extractOne nome per nome)
+# ==============================================================================
+# process.extractOne confronta OGNI nome FBref con TUTTI i nomi Kaggle:
+# costo = (nomi FBref x nomi Kaggle), su un solo core.
+#
+# Qui costruiamo UNA volta un indice dei nomi Kaggle e, per ogni nome da
+# cercare, confrontiamo solo i candidati che condividono almeno un "blocco":
+#   - lo stesso cognome (ultimo token) o un altro token del nome;
+#   - le stesse iniziali + cognome (es. "l martinez");
+#   - abbastanza trigrammi di caratteri (per errori di battitura).
+# Blocchi e trigrammi usano il nome con gli accenti ripiegati ('Iván' -> 'ivan'):
+# il preprocessing di thefuzz (force_ascii) li CANCELLA ('ivn') e il nome
+# giusto finirebbe fuori dal blocco.
+# I candidati vengono poi valutati tutti insieme (rapidfuzz cpdist) con lo
+# STESSO punteggio di thefuzz (WRatio + full_process, arrotondato all'intero).
+# Il blocco però non garantisce il risultato di extractOne: a pari punteggio
+# extractOne sceglie il PRIMO nome della lista, che può stare fuori dal blocco.
+# Con exhaustive=True si ricontrollano su tutta la lista Kaggle (rapidfuzz
+# cdist su tutti i core) SOLO le query a rischio: nessun candidato del blocco
+# sopra soglia, o punteggio intero entro RECHECK_MARGIN dalla soglia (lì un
+# pari merito o un nome fuori dal blocco cambia il match). Chi ha 100 o un
+# punteggio ben sopra soglia tiene il match del blocco: un pari merito fuori
+# dal blocco a quei punteggi è possibile ma non l'abbiamo mai visto nei test.
+
+# Oltre questa dimensione un trigramma è troppo comune per fare da blocco
+MAX_NGRAM_BLOCK = 1000
+# Quota minima di trigrammi in comune col candidato
+MIN_NGRAM_SHARE = 0.6
+# Query valutate insieme in un solo cpdist (limita la memoria delle coppie)
+SCORE_BATCH = 2000
+# exhaustive: si ricontrollano le query con punteggio intero del blocco <= soglia + RECHECK_MARGIN
+RECHECK_MARGIN = 1
+# Celle (query x nomi Kaggle) di un cdist del ricontrollo (~40 MB in float64)
+RECHECK_CELLS = 5_000_000
+# Sotto questo numero di nomi non conviene aprire un pool di processi
+PARALLEL_MIN_QUERIES = 5000
+
+
+def process_query(name):
+    """Stesso preprocessing che thefuzz applica alla query in extractOne."""
+    return full_process(full_process(str(name)), force_ascii=True)
+
+
+def process_choice(name):
+    """Stesso preprocessing che thefuzz applica ai nomi candidati."""
+    return full_process(str(name), force_ascii=True)
+
+
+# Lettere che NFKD non scompone in lettera base + accento
+FOLD_EXTRA = str.maketrans({'ø': 'o', 'Ø': 'O', 'ß': 'ss', 'ł': 'l', 'Ł': 'L', 'đ': 'd', 'Đ': 'D',
+                            'æ': 'ae', 'Æ': 'AE', 'œ': 'oe', 'Œ': 'OE', 'ı': 'i'})
+
+
+def fold_name(name):
+    """Nome per i blocchi: accenti ripiegati in ASCII ('Iván Hóffmánn' -> 'ivan hoffmann')."""
+    decomposed = unicodedata.normalize('NFKD', str(name).translate(FOLD_EXTRA))
+    return full_process(''.join(c for c in decomposed if not unicodedata.combining(c)), force_ascii=True)
+
+
+def name_trigrams(processed):
+    padded = f" {processed} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def block_keys(processed):
+    """Chiavi di blocco "esatte": token del nome e iniziali + cognome."""
+    tokens = processed.split()
+    if not tokens:
+        return []
+    keys = ['t:' + t for t in tokens if len(t) >= 2]
+    if len(tokens) >= 2:
+        keys.append('i:' + ''.join(t[0] for t in tokens[:-1]) + ' ' + tokens[-1])
+        keys.append('s:' + tokens[0][0] + ' ' + tokens[-1])
+    return keys
+
+
+class NameMatcher:
+    """
+    Indice dei nomi Kaggle costruito una volta sola.
+    match() restituisce per ogni query la coppia (nome Kaggle, punteggio) come
+    process.extractOne, oppure (None, punteggio) se sotto la soglia.
+    """
+
+    def __init__(self, choices):
+        self.choices = [c for c in choices]
+        self.processed = [process_choice(c) for c in self.choices]
+
+        # Indice invertito (sui nomi ripiegati): chiave di blocco -> array ordinato di posizioni
+        blocks = {}
+        grams = {}
+        for idx, folded in enumerate(fold_name(c) for c in self.choices):
+            for key in block_keys(folded):
+                blocks.setdefault(key, []).append(idx)
+            for g in name_trigrams(folded):
+                grams.setdefault(g, []).append(idx)
+
+        self.blocks = {k: np.array(v, dtype=np.int64) for k, v in blocks.items()}
+        self.grams = {k: np.array(v, dtype=np.int64) for k, v in grams.items() if len(v) <= MAX_NGRAM_BLOCK}
+        # Trigrammi troppo comuni: non fanno da blocco ma contano come "in comune"
+        self.common_grams = {k for k, v in grams.items() if len(v) > MAX_NGRAM_BLOCK}
+
+    def candidates(self, folded):
+        """Posizioni (ordinate) dei nomi Kaggle nello stesso blocco della query (nome ripiegato)."""
+        parts = [self.blocks[k] for k in block_keys(folded) if k in self.blocks]
+
+        q_grams = name_trigrams(folded)
+        postings = [self.grams[g] for g in q_grams if g in self.grams]
+        if postings:
+            ids, counts = np.unique(np.concatenate(postings), return_counts=True)
+            n_common = sum(1 for g in q_grams if g in self.common_grams)
+            needed = max(1, int(np.ceil(MIN_NGRAM_SHARE * len(q_grams))) - n_common)
+            parts.append(ids[counts >= needed])
+
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        # np.unique ordina: a parità di punteggio vince il nome che viene
+        # prima nella lista, proprio come in extractOne
+        return np.unique(np.concatenate(parts))
+
+    def _score_blocked(self, queries_proc, queries_fold, min_score):
+        """
+        Punteggio batch su tutte le coppie (query, candidato) dei blocchi.
+        Le coppie sotto soglia valgono 0 (rapidfuzz le scarta subito: più veloce).
+        """
+        cand_lists = [self.candidates(q) for q in queries_fold]
+        lengths = np.array([len(c) for c in cand_lists], dtype=np.int64)
+
+        best_idx = np.full(len(queries_proc), -1, dtype=np.int64)
+        best_score = np.zeros(len(queries_proc), dtype=np.float64)
+        if lengths.sum() == 0:
+            return best_idx, best_score
+
+        cand = np.concatenate(cand_lists)
+        owner = np.repeat(np.arange(len(queries_proc)), lengths)
+        pair_queries = [queries_proc[i] for i in owner]
+        pair_choices = [self.processed[i] for i in cand]
+        scores = rf_process.cpdist(pair_queries, pair_choices, scorer=fuzz.WRatio,
+                                   processor=None, score_cutoff=min_score - 0.5, dtype=np.float64)
+
+        # Massimo per query (primo in caso di parità)
+        has = lengths > 0
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])[has]
+        seg_max = np.maximum.reduceat(scores, starts)
+        is_max = scores == np.repeat(seg_max, lengths[has])
+        pos = np.flatnonzero(is_max)
+        first = np.unique(owner[pos], return_index=True)[1]
+        best_idx[has] = cand[pos[first]]
+        best_score[has] = seg_max
+        return best_idx, best_score
+
+    def _recheck(self, queries_proc, best_idx, best_score, min_score, workers):
+        """
+        Punteggio su TUTTA la lista per le query indicate, in blocchi di righe
+        di cdist: vince il primo nome col punteggio massimo, come in extractOne.
+        """
+        rows = max(1, RECHECK_CELLS // max(1, len(self.processed)))
+        for start in range(0, len(queries_proc), rows):
+            scores = rf_process.cdist(queries_proc[start:start + rows], self.processed, scorer=fuzz.WRatio,
+                                      processor=None, score_cutoff=min_score - 0.5, dtype=np.float64,
+                                      workers=workers)
+            top = np.argmax(scores, axis=1)  # primo indice col massimo
+            top_score = scores[np.arange(len(scores)), top]
+            sl = slice(start, start + len(scores))
+            better = top_score >= np.maximum(best_score[sl], min_score - 0.5)
+            best_idx[sl] = np.where(better, top, best_idx[sl])
+            best_score[sl] = np.where(better, top_score, best_score[sl])
+
+    def _match_chunk(self, queries, min_score, exhaustive, workers=-1):
+        queries_proc = [process_query(q) for q in queries]
+        queries_fold = [fold_name(q) for q in queries]
+        best_idx = np.full(len(queries_proc), -1, dtype=np.int64)
+        best_score = np.zeros(len(queries_proc), dtype=np.float64)
+        for start in range(0, len(queries_proc), SCORE_BATCH):
+            end = start + SCORE_BATCH
+            best_idx[start:end], best_score[start:end] = self._score_blocked(
+                queries_proc[start:end], queries_fold[start:end], min_score)
+
+        if exhaustive:
+            # Ricontrollo su tutta la lista solo vicino alla soglia (o sotto)
+            rounded = np.array([int(round(s)) for s in best_score], dtype=np.int64)
+            risky = np.flatnonzero((rounded <= min_score + RECHECK_MARGIN) & (best_score < 100))
+            if len(risky):
+                idx, score = best_idx[risky], best_score[risky]
+                self._recheck([queries_proc[i] for i in risky], idx, score, min_score, workers)
+                best_idx[risky], best_score[risky] = idx, score
+        rounded = np.array([int(round(s)) for s in best_score], dtype=np.int64)
+
+        return [
+            (self.choices[j] if (j >= 0 and r >= min_score) else None, int(r))
+            for j, r in zip(best_idx, rounded)
+        ]
+
+    def match(self, queries, min_score=85, exhaustive=False, n_workers=None):
+        """
+        Cerca ogni nome di `queries` tra i nomi Kaggle.
+        min_score è la soglia inclusiva sul punteggio intero (>= 85 in feature.py,
+        > 80 cioè >= 81 nelle predizioni live).
+        exhaustive=True: ricontrollo su tutta la lista delle query senza match
+        o vicine alla soglia (la mappa di extractOne anche nei pari merito).
+        """
+        queries = list(queries)
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+
+        if n_workers <= 1 or len(queries) < PARALLEL_MIN_QUERIES:
+            return self._match_chunk(queries, min_score, exhaustive)
+
+        # Batch grandi: dividiamo le query tra più processi
+        chunk_size = int(np.ceil(len(queries) / (n_workers * 4)))
+        chunks = [queries[i:i + chunk_size] for i in range(0, len(queries), chunk_size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(self,)) as pool:
+            for part in pool.map(_worker_match, chunks, [min_score] * len(chunks), [exhaustive] * len(chunks)):
+                results.extend(part)
+        return results
+
+
+# --- Supporto per il pool di processi (l'indice viene passato una volta sola) ---
+_WORKER_MATCHER = None
+
+
+def _init_worker(matcher):
+    global _WORKER_MATCHER
+    _WORKER_MATCHER = matcher
+
+
+def _worker_match(queries, min_score, exhaustive):
+    # Un core per processo: il pool usa già tutti i core
+    return _WORKER_MATCHER._match_chunk(queries, min_score, exhaustive, workers=1)
@@ -0,0 +1,374 @@
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ==============================================================================
+# STRUMENTAZIONE: TEMPO, CPU, MEMORIA, RIGHE E PERCENTUALI DI MATCH PER FASE
+# ==============================================================================
+# Le print con le emoji dicono cosa succede, non quanto costa. Ogni fase della
+# pipeline (pipeline.py) e gli script di previsione aprono un blocco
+#     with stage('feature', rows_in=...) as rec: ...
+# che a fine blocco aggiunge UNA riga JSON a data/run_log.jsonl con:
+#   run_id, script, stage, start       -> quale esecuzione, quale fase
+#   wall_s, cpu_s                      -> tempo reale e CPU (del thread della fase:
+#                                         le fasi della pipeline girano in parallelo)
+#   rss_mb, max_rss_mb                 -> memoria del processo a fine fase e picco
+#   rows_in, rows_out                  -> righe in ingresso e in uscita
+#   metrics                            -> percentuali di match ecc. (record_metric)
+#   status, error                      -> 'ok' oppure 'error' con il messaggio
+#   profile                            -> funzioni più costose, se profilata
+# Il codice dentro una fase aggiunge metriche con record_metric(nome, valore)
+# senza sapere chi lo chiama (fuori da una fase non fa niente). Per una
+# funzione chiamata più volte c'è il decoratore @timed('nome').
+#
+# Profilazione a richiesta, per fase (variabili d'ambiente o pipeline.py --profile):
+#   SERIE_A_PROFILE=feature,odds   (o "all")
+#   SERIE_A_PROFILER=cprofile      -> cProfile, file .prof in data/profiles/
+#                   =sample        -> campionamento dello stack ogni 5 ms (costo minimo)
+# SERIE_A_RUN_LOG=off disattiva il log (o un altro percorso per cambiarlo).
+#
+# Riepilogo: python instrument.py [--runs 10] [--top 10]
+# (solo libreria standard: importarlo non rallenta gli script di previsione)
+
+RUN_LOG_PATH = 'data/run_log.jsonl'
+PROFILE_DIR = 'data/profiles'
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 10
+SPARK = '▁▂▃▄▅▆▇█'
+
+# Una esecuzione = un processo (tutte le fasi di un lancio della pipeline)
+RUN_ID = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+SCRIPT = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'
+
+_current = contextvars.ContextVar('stage_record', default=None)
+_write_lock = threading.Lock()
+# Un solo cProfile attivo alla volta (da Python 3.12 due profiler insieme danno errore)
+_cprofile_lock = threading.Lock()
+
+
+def run_log_path():
+    return os.environ.get('SERIE_A_RUN_LOG', RUN_LOG_PATH)
+
+
+def count_rows(value):
+    """Righe di un risultato (somma delle tabelle se è una tupla/lista, None se non si sa)."""
+    if isinstance(value, (tuple, list)):
+        counts = [count_rows(v) for v in value]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    return len(value) if hasattr(value, '__len__') and hasattr(value, 'columns') else None
+
+
+def memory_mb():
+    """(memoria residente attuale, picco del processo) in MB; None se non disponibili."""
+    rss = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    peak = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux in KB, macOS in byte
+        peak = peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+    return rss, peak
+
+
+def record_metric(name, value):
+    """Aggiunge una metrica (es. percentuale di nomi trovati) alla fase in corso."""
+    rec = _current.get()
+    if rec is not None:
+        rec['metrics'][name] = round(float(value), 6) if value is not None else None
+
+
+def record_rows(rows_in=None, rows_out=None):
+    """Righe in ingresso/uscita della fase in corso (None = lascia com'è)."""
+    rec = _current.get()
+    if rec is None:
+        return
+    if rows_in is not None:
+        rec['rows_in'] = int(rows_in)
+    if rows_out is not None:
+        rec['rows_out'] = int(rows_out)
+
+
+def share(part, total):
+    """part / total, None se total è 0."""
+    return part / total if total else None
+
+
+# ==============================================================================
+# PROFILAZIONE (cProfile o campionamento)
+# ==============================================================================
+def profile_mode(name):
+    """'cprofile', 'sample' o None per la fase name (da SERIE_A_PROFILE / SERIE_A_PROFILER)."""
+    wanted = {s.strip() for s in os.environ.get('SERIE_A_PROFILE', '').split(',') if s.strip()}
+    if not wanted & {'all', name}:
+        return None
+    return os.environ.get('SERIE_A_PROFILER', 'cprofile').lower()
+
+
+def _frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+class Sampler:
+    """
+    Profilatore a campionamento: un thread guarda ogni SAMPLE_INTERVAL lo stack
+    del thread della fase. self = funzione in cima allo stack, total = funzione
+    presente nello stack (conta una volta per campione).
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.self_counts[_frame_name(frame.f_code)] += 1
+            seen = set()
+            while frame is not None:
+                seen.add(_frame_name(frame.f_code))
+                frame = frame.f_back
+            self.total_counts.update(seen)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, name):
+        self._stop.set()
+        self._thread.join()
+        n = max(self.samples, 1)
+        return {
+            'mode': 'sample', 'samples': self.samples, 'interval_s': self.interval,
+            'self': [[f, round(c / n, 4)] for f, c in self.self_counts.most_common(TOP_FUNCTIONS)],
+            'total': [[f, round(c / n, 4)] for f, c in self.total_counts.most_common(TOP_FUNCTIONS)],
+        }
+
+
+class CProfiler:
+    """cProfile sul thread della fase: file .prof completo + le funzioni col tempo proprio più alto."""
+
+    def __init__(self):
+        import cProfile
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+        return self
+
+    def stop(self, name):
+        import pstats
+        self.profile.disable()
+        _cprofile_lock.release()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{RUN_ID}-{name}.prof")
+        self.profile.dump_stats(path)
+        stats = pstats.Stats(self.profile).stats
+        top = sorted(stats.items(), key=lambda kv: kv[1][2], reverse=True)[:TOP_FUNCTIONS]
+        return {
+            'mode': 'cprofile', 'path': path,
+            'self': [[f"{os.path.basename(f)}:{line}({fn})", round(tt, 4), round(ct, 4)]
+                     for (f, line, fn), (cc, nc, tt, ct, callers) in top],
+        }
+
+
+def start_profiler(name):
+    mode = profile_mode(name)
+    if mode is None:
+        return None
+    # cProfile già occupato da un'altra fase in parallelo: campionamento
+    if mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+        return CProfiler().start()
+    return Sampler(threading.get_ident()).start()
+
+
+# ==============================================================================
+# FASI
+# ==============================================================================
+def log_record(record):
+    """Aggiunge una riga JSON al log delle esecuzioni."""
+    path = run_log_path()
+    if not path or path.lower() == 'off':
+        return
+    line = json.dumps(record, default=lambda o: o.item() if hasattr(o, 'item') else str(o), ensure_ascii=False)
+    with _write_lock:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+@contextmanager
+def stage(name, rows_in=None, process_cpu=False, **fields):
+    """
+    Misura il blocco come fase name e lo scrive nel log. process_cpu=True conta
+    la CPU di tutto il processo (per il totale della pipeline) invece del thread.
+    """
+    cpu_clock = time.process_time if process_cpu else time.thread_time
+    record = {
+        'run_id': RUN_ID, 'script': SCRIPT, 'stage': name,
+        'start': datetime.now().isoformat(timespec='seconds'),
+        'rows_in': rows_in, 'rows_out': None, 'metrics': {}, 'status': 'ok', **fields,
+    }
+    token = _current.set(record)
+    profiler = start_profiler(name)
+    t0, c0 = time.perf_counter(), cpu_clock()
+    try:
+        yield record
+    except BaseException as e:
+        record['status'] = 'error'
+        record['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record['wall_s'] = round(time.perf_counter() - t0, 4)
+        record['cpu_s'] = round(cpu_clock() - c0, 4)
+        if profiler is not None:
+            record['profile'] = profiler.stop(name)
+        record['rss_mb'], record['max_rss_mb'] = (round(m, 1) if m is not None else None for m in memory_mb())
+        _current.reset(token)
+        log_record(record)
+
+
+def timed(name):
+    """Decoratore: ogni chiamata della funzione è una fase name (vedi stage)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ==============================================================================
+# RIEPILOGO: FASI PIÙ LENTE E ANDAMENTO TRA LE ESECUZIONI
+# ==============================================================================
+def load_run_log(path=None):
+    path = path or run_log_path()
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # riga troncata (processo interrotto mentre scriveva)
+    return records
+
+
+def sparkline(values):
+    known = [v for v in values if v is not None]
+    if not known:
+        return ''
+    lo, hi = min(known), max(known)
+    span = (hi - lo) or 1
+    return ''.join(' ' if v is None else SPARK[int((v - lo) / span * (len(SPARK) - 1))] for v in values)
+
+
+def format_metric(key, value):
+    if value is None:
+        return '-'
+    return f"{value:.1%}" if key.endswith('share') else f"{value:g}"
+
+
+def summarize(records, runs=10, top=10, script=None):
+    """
+    Stampa le fasi più lente e l'andamento delle ultime runs esecuzioni, per
+    UNO script (default: quello dell'esecuzione più recente). Con la cache
+    della pipeline una fase non gira ad ogni esecuzione: per ogni fase vale
+    la sua ultima esecuzione.
+    """
+    if not records:
+        print("Nessuna esecuzione registrata.")
+        return
+    script = script or records[-1].get('script')
+    records = [r for r in records if r.get('script') == script]
+    if not records:
+        print(f"Nessuna esecuzione di {script}.")
+        return
+
+    by_run = {}
+    for r in records:
+        by_run.setdefault(r['run_id'], []).append(r)
+    run_ids = list(by_run)[-runs:]
+    latest = {}
+    for rid in run_ids:
+        for r in by_run[rid]:
+            latest[r['stage']] = r
+
+    print(f"{script}: {len(run_ids)} esecuzioni, dalla {run_ids[0]} alla {run_ids[-1]}\n")
+    print(f"Fasi più lente (ultima esecuzione di ogni fase)\n")
+    print(f"{'fase':<24} {'wall s':>8} {'cpu s':>8} {'rss MB':>8} {'righe in':>10} {'righe out':>10}  metriche")
+    for r in sorted(latest.values(), key=lambda r: r.get('wall_s', 0), reverse=True)[:top]:
+        metrics = ', '.join(f"{k}={format_metric(k, v)}" for k, v in r.get('metrics', {}).items())
+        status = '' if r.get('status') == 'ok' else f"  ❌ {r.get('error', '')}"
+        rss = r.get('max_rss_mb') or 0
+        rows_in = r['rows_in'] if r.get('rows_in') is not None else '-'
+        rows_out = r['rows_out'] if r.get('rows_out') is not None else '-'
+        print(f"{r['stage']:<24} {r.get('wall_s', 0):>8.2f} {r.get('cpu_s', 0):>8.2f} {rss:>8.0f} "
+              f"{rows_in:>10} {rows_out:>10}  {metrics}{status}")
+        # Le funzioni più costose, se la fase è stata profilata
+        for entry in (r.get('profile') or {}).get('self', [])[:3]:
+            print(f"{'':<26}↳ {entry[0]} {entry[1]}")
+
+    # Andamento: tempo di ogni fase nelle esecuzioni (vuoto = fase saltata)
+    width = max(len(run_ids), 5)
+    print(f"\nAndamento (wall s; ultima = ultima volta che la fase è girata, mediana delle precedenti)\n")
+    print(f"{'fase':<24} {'trend':<{width}}  {'ultima':>8} {'mediana':>8} {'delta':>7}")
+    for name in latest:
+        values = [next((r.get('wall_s') for r in by_run[rid] if r['stage'] == name), None) for rid in run_ids]
+        known = [v for v in values if v is not None]
+        previous = sorted(known[:-1])
+        median = previous[len(previous) // 2] if previous else None
+        delta = f"{known[-1] / median - 1:>+7.0%}" if median else f"{'':>7}"
+        shown_median = f"{median:.2f}" if median is not None else '-'
+        print(f"{name:<24} {sparkline(values):<{width}}  {known[-1]:>8.2f} {shown_median:>8} {delta}")
+
+    # Percentuali di match nel tempo (un calo = nomi/quote che non si collegano più)
+    metric_keys = list(dict.fromkeys((r['stage'], k) for rid in run_ids for r in by_run[rid]
+                                     for k in r.get('metrics', {})))
+    if metric_keys:
+        print(f"\nMetriche (ultimo valore)\n")
+        for name, key in metric_keys:
+            values = [next((r['metrics'].get(key) for r in by_run[rid]
+                            if r['stage'] == name and key in r.get('metrics', {})), None) for rid in run_ids]
+            known = [v for v in values if v is not None]
+            shown = format_metric(key, known[-1] if known else None)
+            print(f"{name + ':' + key:<44} {sparkline(values):<{width}}  {shown:>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Riepilogo del log delle esecuzioni (fasi più lente, andamento)')
+    parser.add_argument('--log', default=None, help=f'File del log (default {RUN_LOG_PATH})')
+    parser.add_argument('--runs', type=int, default=10, help='Esecuzioni da confrontare')
+    parser.add_argument('--top', type=int, default=10, help='Fasi più lente da mostrare')
+    parser.add_argument('--script', default=None,
+                        help="Script da riassumere (es. pipeline.py; default: quello dell'ultima esecuzione)")
+    args = parser.parse_args()
+    summarize(load_run_log(args.log), runs=args.runs, top=args.top, script=args.script)
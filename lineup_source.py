@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import requests
+from bs4 import BeautifulSoup
+from team_registry import team_key
+
+# ==============================================================================
+# PROBABILI FORMAZIONI: SCARICATE UNA VOLTA, IN CACHE, INDICIZZATE
+# ==============================================================================
+# auto_predict_live.py scaricava e rianalizzava con BeautifulSoup l'intera pagina
+# di fantacalcio.it per OGNI partita, scorrendo il testo di tutti i div
+# match-preview, e ignorava qualsiasi errore.
+# Qui ogni pagina (una per fonte/campionato):
+#   - si scarica al massimo una volta ogni LINEUP_TTL secondi (cache su disco in
+#     data/cache/lineups/); scaduto il TTL si chiede al sito solo se è cambiata
+#     (If-None-Match / If-Modified-Since: 304 = si riusa la copia salvata)
+#   - si analizza UNA volta in un indice (casa, ospite) -> formazioni
+# Più fonti si scaricano in parallelo (asyncio). Se il sito non risponde si usa
+# l'ultima copia salvata, avvisando; gli errori vengono stampati, non nascosti.
+
+LINEUP_SOURCES = {
+    'serie_a': 'https://www.fantacalcio.it/probabili-formazioni-serie-a',
+}
+CACHE_DIR = 'data/cache/lineups'
+LINEUP_TTL = 15 * 60   # secondi
+HTTP_TIMEOUT = 5
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+
+def normalize_team(name):
+    return ' '.join(str(name).lower().split())
+
+
+# ==============================================================================
+# 1. DOWNLOAD CON CACHE E RICHIESTE CONDIZIONALI
+# ==============================================================================
+def _cache_paths(url, cache_dir):
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, key + '.html'), os.path.join(cache_dir, key + '.json')
+
+
+def _write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def fetch_page(url, ttl=LINEUP_TTL, cache_dir=CACHE_DIR):
+    """
+    Testo HTML della pagina. Ritorna (html, stato) con stato:
+    'cache' (copia ancora valida), '304' (non cambiata), '200' (scaricata),
+    'stale' (sito non raggiungibile, copia vecchia). Solleva l'errore di rete
+    se non c'è nessuna copia salvata.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    body_path, meta_path = _cache_paths(url, cache_dir)
+    meta = {}
+    if os.path.exists(body_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if time.time() - meta.get('fetched_at', 0) < ttl:
+            with open(body_path, encoding='utf-8') as f:
+                return f.read(), 'cache'
+
+    headers = dict(HEADERS)
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+
+    try:
+        response = requests.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        if response.status_code == 304 and meta:
+            status = '304'
+            with open(body_path, encoding='utf-8') as f:
+                html = f.read()
+        else:
+            response.raise_for_status()
+            status, html = '200', response.text
+            _write_atomic(body_path, html.encode('utf-8'))
+            meta = {'url': url, 'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')}
+    except requests.RequestException as e:
+        if not meta:
+            raise
+        print(f"   ⚠️ {url} non raggiungibile ({e}): uso la copia del "
+              f"{time.strftime('%d/%m %H:%M', time.localtime(meta.get('fetched_at', 0)))}")
+        with open(body_path, encoding='utf-8') as f:
+            return f.read(), 'stale'
+
+    meta['fetched_at'] = time.time()
+    _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+    return html, status
+
+
+# ==============================================================================
+# 2. ANALISI (una volta per pagina) -> INDICE PER PARTITA
+# ==============================================================================
+class LineupIndex:
+    """(casa, ospite) -> {'home': [...], 'away': [...]}; ricerca per nome o per testo."""
+
+    def __init__(self):
+        self.by_teams = {}
+        self.previews = []  # (testo in minuscolo, formazioni) per le pagine senza nomi squadra
+
+    def add(self, teams, text, lineups):
+        if len(teams) >= 2:
+            # Stessa chiave squadra delle altre fonti (alias risolti: "Internazionale" = "Inter")
+            self.by_teams[(team_key(teams[0]), team_key(teams[1]))] = lineups
+        self.previews.append((text, lineups))
+
+    def update(self, other):
+        self.by_teams.update(other.by_teams)
+        self.previews.extend(other.previews)
+
+    def get(self, home_team, away_team):
+        """Formazioni della partita, None se non c'è (o se i titolari sono meno di 11)."""
+        lineups = self.by_teams.get((team_key(home_team), team_key(away_team)))
+        if lineups is None:
+            home, away = normalize_team(home_team), normalize_team(away_team)
+            # Come prima: il div che nomina entrambe le squadre
+            lineups = next((lu for text, lu in self.previews if home in text and away in text), None)
+        return lineups
+
+    def __len__(self):
+        return len(self.previews)
+
+
+def parse_lineups(html):
+    """Pagina delle probabili formazioni -> LineupIndex (i primi 11 nomi casa, i successivi 11 ospite)."""
+    index = LineupIndex()
+    soup = BeautifulSoup(html, 'html.parser')
+    for div in soup.find_all('div', class_='match-preview'):
+        names = [p.get_text().strip() for p in div.find_all('a', class_='player-name')]
+        if len(names) < 22:
+            continue
+        teams = [t.get_text().strip() for t in div.find_all(class_='team-name')]
+        index.add(teams, normalize_team(div.get_text(' ')), {'home': names[:11], 'away': names[11:22]})
+    return index
+
+
+# ==============================================================================
+# 3. PIÙ FONTI IN PARALLELO
+# ==============================================================================
+async def _fetch_all(urls, ttl, cache_dir):
+    tasks = [asyncio.to_thread(fetch_page, url, ttl, cache_dir) for url in urls]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def load_lineup_index(sources=None, ttl=LINEUP_TTL, cache_dir=CACHE_DIR):
+    """
+    Scarica (o prende dalla cache) tutte le fonti insieme e ritorna un unico
+    LineupIndex. Le fonti che falliscono senza copia salvata vengono segnalate e saltate.
+    """
+    sources = sources or LINEUP_SOURCES
+    results = asyncio.run(_fetch_all(list(sources.values()), ttl, cache_dir))
+    index = LineupIndex()
+    for name, res in zip(sources, results):
+        if isinstance(res, Exception):
+            print(f"   ❌ Formazioni {name} non disponibili: {res}")
+            continue
+        html, status = res
+        page = parse_lineups(html)
+        print(f"   🌍 Formazioni {name}: {len(page)} partite ({status})")
+        index.update(page)
+    return index
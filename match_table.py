@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+import warnings
+from storage import load_artifact, save_artifact, artifact_path
+from form_engine import rolling_form, rolling_forms
+from final_dataset_polish import load_schedule_stats
+from team_registry import load_registry, game_ids
+from calendar_features import season_year, build_calendar, CALENDAR_FEATURES
+from instrument import record_metric, share
+
+warnings.filterwarnings('ignore')
+
+# ==============================================================================
+# DA RIGHE PER SQUADRA A UNA RIGA PER PARTITA (casa / ospite) IN UN SOLO PASSO
+# ==============================================================================
+# Prima la catena era:
+#   add_final_features.py   -> merge del dataset con se stesso su 'game'
+#                              (4 righe per partita), filtro team != avversario, dedup
+#   final_dataset_polish.py -> secondo merge con se stesso su (game, opponent)
+#   prepare_final_dataset.py -> butta via metà righe tenendo is_home == 1
+# Qui le feature di ogni squadra (forma xG/xGA, giornata) si calcolano sulle
+# righe per squadra, poi si costruisce direttamente UNA riga per partita:
+# la squadra di casa secondo il calendario + le feature dell'ospite, con un
+# solo merge tra metà righe. Stesso risultato di dataset_con_quote -> is_home == 1.
+
+# Colonne del dataset finale per partita (oltre a date, game, matchweek, result)
+HOME_AWAY_FEATURES = {
+    'Starting_XI_Value': 'Value',
+    'Lineup_Strength_Ratio': 'Lineup_Ratio',
+    'xG_Relative_Form': 'Attack_Form',
+    'Defense_Form_Relative': 'Defense_Form',
+}
+
+
+def relative_form(df, col, by='team', rolling=None):
+    """
+    Media delle ultime 5 partite (prima di oggi) come z-score sulla stagione, NaN -> 0.
+    rolling: media mobile già calcolata (rolling_forms), altrimenti calcolata qui.
+    """
+    if rolling is None:
+        rolling = rolling_form(df, col, by=by)
+    league = df.groupby('Season_Year')[col].agg(['mean', 'std'])
+    mean = df['Season_Year'].map(league['mean'])
+    std = df['Season_Year'].map(league['std'])
+    return ((rolling - mean) / std).fillna(0)
+
+
+def team_leagues(df, stats_raw, registry):
+    """Lega di ogni riga secondo la sua squadra (la prima in cui compare; None senza colonna 'league')."""
+    if 'league' not in stats_raw.columns:
+        return None
+    league_of = pd.Series(stats_raw['league'].to_numpy(dtype=object), index=registry.ids(stats_raw['team']))
+    league_of = league_of[~league_of.index.duplicated()]
+    return df['team_id'].map(league_of).to_numpy(dtype=object)
+
+
+def team_features(df, schedule_stats, calendar, registry):
+    """
+    Feature per squadra e partita (una riga ciascuna), come add_final_features +
+    final_dataset_polish prima del merge con l'avversario. Restano solo le
+    partite con almeno due squadre diverse (come faceva il merge con se stesso).
+    Join e groupby su chiavi intere: team_id/opponent_id dal registro squadre e
+    game_code (posizione della partita nel dataset) al posto delle stringhe.
+    """
+    schedule, stats_raw = schedule_stats
+
+    df = df.copy()
+    df['team_id'] = registry.ids(df['team'])
+    df['opponent_id'] = registry.ids(df['opponent'])
+    codes, games = pd.factorize(df['game'])
+    df['game_code'] = codes
+    games = pd.Index(np.asarray(games))  # stringhe anche se 'game' arriva come categoria
+    # La stringa della partita viaggia come categoria (codici interi) nei merge
+    df['game'] = pd.Categorical.from_codes(codes, games)
+    df = df[(df['game_code'] >= 0) & (df['team_id'] >= 0)]
+
+    df = df.drop_duplicates(subset=['game_code', 'team_id'])
+    n_teams = df.groupby('game_code')['team_id'].transform('size')
+    df = df[n_teams >= 2].copy()
+    df['Season_Year'] = season_year(df['date'])
+
+    # Valore dell'avversario: la prima ALTRA squadra della stessa partita
+    first = df.groupby('game_code', sort=False)['team_id'].transform('first')
+    is_first = (df['team_id'] == first).to_numpy()
+    value = df['Starting_XI_Value']
+    first_value = value.groupby(df['game_code'], sort=False).transform('first')
+    second_value = value[~is_first].groupby(df.loc[~is_first, 'game_code'], sort=False).first()
+    df['Opponent_Value'] = np.where(is_first, df['game_code'].map(second_value), first_value)
+    df['Value_Ratio_vs_Opponent'] = df['Starting_XI_Value'] / (df['Opponent_Value'] + 1)
+
+    # Forma offensiva (xG) e difensiva (xGA), in ordine di data per squadra
+    # (squadre in ordine alfabetico come prima: l'ordine delle righe finali non cambia)
+    df['team_rank'] = pd.factorize(df['team'], sort=True)[0]
+    df = df.sort_values(['team_rank', 'date'], kind='stable')
+
+    if 'xGA' in stats_raw.columns and 'game' in stats_raw.columns:
+        xga = pd.DataFrame({'game_code': games.get_indexer(stats_raw['game']),
+                            'team_id': registry.ids(stats_raw['team']),
+                            'xGA': stats_raw['xGA'].to_numpy()})
+        xga = xga.drop_duplicates(subset=['game_code', 'team_id'])
+        df = df.merge(xga, on=['game_code', 'team_id'], how='left')
+
+    # Medie mobili per lega della squadra (la forma attraversa le stagioni, non i
+    # campionati), anche in più processi; lo z-score per stagione resta su tutto
+    form_cols = ['xG'] + (['xGA'] if 'xGA' in df.columns else [])
+    rolling = rolling_forms(df, form_cols, by='team_id', partition=team_leagues(df, stats_raw, registry))
+    df['xG_Relative_Form'] = relative_form(df, 'xG', rolling=rolling['xG'])
+    if 'xGA' in df.columns:
+        df['Defense_Form_Relative'] = relative_form(df, 'xGA', rolling=rolling['xGA'])
+    else:
+        print("⚠️ Attenzione: Colonna 'xGA' non trovata. Salto feature difensiva avanzata.")
+        df['Defense_Form_Relative'] = 0
+
+    # Giornata, riposo e partite ravvicinate dal calendario (calendar_features.py)
+    cal_cols = ['matchweek', 'Is_Midweek'] + CALENDAR_FEATURES
+    cal = pd.DataFrame({'game_code': games.get_indexer(calendar['game']), 'team_id': registry.ids(calendar['team']),
+                        **{c: calendar[c].to_numpy() for c in cal_cols}})
+    cal = cal[cal['game_code'] >= 0].drop_duplicates(subset=['game_code', 'team_id'])
+    df = df.merge(cal, on=['game_code', 'team_id'], how='left')
+
+    # Casa / trasferta dal calendario: stesso team_id della squadra di casa
+    schedule = schedule.drop_duplicates('game')
+    home_of = np.full(len(games), -1, dtype=np.int32)
+    sched_code = games.get_indexer(schedule['game'])
+    known = sched_code >= 0
+    home_of[sched_code[known]] = registry.ids(schedule['home_team'])[known]
+    df['is_home'] = (df['team_id'].to_numpy() == home_of[df['game_code'].to_numpy()]).astype(int)
+    return df
+
+
+def build_match_table(df, schedule_stats, calendar=None, registry=None):
+    """
+    Dataset di feature.py (righe per squadra) -> una riga per partita, colonne Home_/Away_.
+    calendar: risultato di calendar_features.build_calendar (calcolato qui se manca).
+    """
+    registry = registry if registry is not None else load_registry()
+    if calendar is None:
+        calendar = build_calendar(schedule_stats, registry)
+    print(f"✅ Dati caricati. Righe per squadra: {len(df)}")
+    print("1. Feature per squadra (forma xG/xGA, giornata, casa/trasferta)...")
+    teams = team_features(df, schedule_stats, calendar, registry)
+    registry.save()
+
+    print("2. Una riga per partita (casa + ospite)...")
+    home = teams[teams['is_home'] == 1]
+    # Ospite: la riga della squadra avversaria nella stessa partita (un solo merge, su interi)
+    away_cols = ['game_code', 'team_id'] + list(HOME_AWAY_FEATURES)[1:] + CALENDAR_FEATURES
+    away = teams[away_cols].rename(columns={'team_id': 'opponent_id', **{c: 'Away_' + n for c, n in HOME_AWAY_FEATURES.items()},
+                                            **{c: 'Away_' + c for c in CALENDAR_FEATURES}})
+    matches = home.merge(away, on=['game_code', 'opponent_id'], how='left')
+    matches = matches.drop_duplicates(subset=['game_code', 'team_id'])
+
+    matches = matches.rename(columns={
+        'team': 'Home_Team', 'opponent': 'Away_Team', 'Opponent_Value': 'Away_Value',
+        'team_id': 'Home_Team_ID', 'opponent_id': 'Away_Team_ID',
+        **{c: 'Home_' + n for c, n in HOME_AWAY_FEATURES.items()},
+        **{c: 'Home_' + c for c in CALENDAR_FEATURES}})
+    matches['game_id'] = game_ids(matches['date'], matches['Home_Team_ID'], matches['Away_Team_ID'])
+    # Forma mancante = media del campionato
+    form_cols = ['Home_Attack_Form', 'Home_Defense_Form', 'Away_Attack_Form', 'Away_Defense_Form']
+    matches[form_cols] = matches[form_cols].fillna(0)
+
+    final_cols = [
+        'date', 'game', 'game_id', 'matchweek',
+        'Home_Team', 'Away_Team', 'Home_Team_ID', 'Away_Team_ID',
+        'result',                                      # result dal punto di vista della squadra di casa
+        'Home_Value', 'Away_Value', 'Value_Ratio_vs_Opponent',
+        'Home_Lineup_Ratio', 'Away_Lineup_Ratio',
+        'Home_Attack_Form', 'Home_Defense_Form', 'Away_Attack_Form', 'Away_Defense_Form',
+        'Is_Midweek',                                  # calendario (calendar_features.py)
+        *[f'{side}_{c}' for side in ['Home', 'Away'] for c in CALENDAR_FEATURES],
+    ]
+    matches = matches[[c for c in final_cols if c in matches.columns]].reset_index(drop=True)
+
+    # Partite con anche la riga dell'ospite (le altre hanno le colonne Away_ vuote)
+    record_metric('away_found_share', share(int(matches['Away_Lineup_Ratio'].notna().sum()), len(matches)))
+    print(f"✅ {len(matches)} partite da {len(teams)} righe per squadra.")
+    return matches
+
+
+if __name__ == '__main__':
+    print("--- TABELLA PER PARTITA (CASA / OSPITE) ---")
+
+    try:
+        df = load_artifact('dataset_completo_xgboost_3')
+        schedule_stats = load_schedule_stats()
+    except FileNotFoundError:
+        print("❌ Errore: Mancano i file. Esegui prima feature.py.")
+        exit()
+
+    matches = build_match_table(df, schedule_stats)
+
+    save_artifact(matches, 'dataset_match_3')
+    print(f"📁 File salvato come: {artifact_path('dataset_match_3')}")
@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import hashlib
+import datetime
+import numpy as np
+import xgboost as xgb
+
+# ==============================================================================
+# MODELLO IN FORMATO NATIVO XGBOOST (UBJSON) + MANIFEST
+# ==============================================================================
+# Il notebook salvava solo modello_serie_a.pkl con joblib.dump: per caricarlo
+# serve tutto lo stack sklearn e le stesse versioni di pickle/xgboost del training.
+# Ora salviamo anche:
+#   train/modello_serie_a.ubj            -> il booster nel formato nativo (UBJSON)
+#   train/modello_serie_a.manifest.json  -> ordine delle feature, classi (0=1, 1=X, 2=2),
+#                                           obiettivo, versione xgboost e hash del .ubj
+#   train/modello_serie_a.trees.npz      -> gli stessi alberi in array numpy (tree_model.py)
+# NativeModel carica il booster senza sklearn e calcola le probabilità con
+# inplace_predict (niente DMatrix), con la stessa interfaccia predict_proba
+# del vecchio XGBClassifier: gli script di previsione non cambiano.
+#
+# Uso (dal pickle già esistente): python model_artifact.py [train/modello_serie_a.pkl]
+
+NATIVE_MODEL_PATH = 'train/modello_serie_a.ubj'
+PICKLE_MODEL_PATH = 'train/modello_serie_a.pkl'
+# Codifica del Target nel training: 0 = vittoria casa, 1 = pareggio, 2 = vittoria ospite
+CLASS_NAMES = ['1', 'X', '2']
+
+
+def manifest_path(model_path):
+    return os.path.splitext(model_path)[0] + '.manifest.json'
+
+
+def trees_path(model_path):
+    return os.path.splitext(model_path)[0] + '.trees.npz'
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def export_native(model, path=NATIVE_MODEL_PATH, class_names=CLASS_NAMES, lineage=None):
+    """
+    Salva (in modo atomico) il booster di un XGBClassifier in UBJSON più il manifest.
+    lineage: campi in più per il manifest (versione, modello padre, ... vedi train/update_model.py).
+    """
+    booster = model.get_booster()
+    features = booster.feature_names or list(getattr(model, 'feature_names_in_', []))
+    if not features:
+        raise ValueError("Il modello non ha i nomi delle feature: addestralo su un DataFrame")
+
+    tmp_path = path + '.tmp.ubj'
+    booster.save_model(tmp_path)
+    os.replace(tmp_path, path)
+
+    manifest = {
+        'model_file': os.path.basename(path),
+        'sha256': _sha256(path),
+        'features': list(features),
+        'classes': [int(c) for c in model.classes_],
+        'class_names': list(class_names),
+        'objective': model.get_xgb_params().get('objective', 'multi:softprob'),
+        'num_trees': len(booster.get_dump()),
+        'xgboost_version': xgb.__version__,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        **(lineage or {}),
+    }
+    # Il manifest si scrive per ultimo: se c'è, il .ubj a cui si riferisce è completo
+    tmp_manifest = manifest_path(path) + '.tmp'
+    with open(tmp_manifest, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_manifest, manifest_path(path))
+
+    # Versione solo-numpy per gli avvii a freddo (verificata contro il booster)
+    from tree_model import compile_booster
+    compile_booster(booster, manifest['features'], manifest['classes'], class_names).save(trees_path(path))
+    return manifest
+
+
+class NativeModel:
+    """Booster nativo + manifest, con predict_proba come XGBClassifier."""
+
+    def __init__(self, booster, manifest):
+        self.booster = booster
+        self.manifest = manifest
+        self.features = manifest['features']
+        self.feature_names_in_ = np.array(self.features, dtype=object)
+        self.classes_ = np.array(manifest['classes'])
+        self.class_names = manifest['class_names']
+
+    @classmethod
+    def load(cls, path=NATIVE_MODEL_PATH):
+        with open(manifest_path(path)) as f:
+            manifest = json.load(f)
+        # Manifest e booster devono essere della stessa esportazione
+        if manifest.get('sha256') and manifest['sha256'] != _sha256(path):
+            raise ValueError(f"{path} non corrisponde al suo manifest (esportazione a metà?)")
+        booster = xgb.Booster()
+        booster.load_model(path)
+        return cls(booster, manifest)
+
+    def predict_proba(self, X):
+        """Probabilità (n, n_classi). X: DataFrame (colonne riordinate come nel training) o array già ordinato."""
+        if hasattr(X, 'columns'):
+            X = X[self.features].to_numpy(dtype=np.float64)
+        probs = self.booster.inplace_predict(np.asarray(X, dtype=np.float64))
+        return probs.reshape(len(X), -1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def default_model_path():
+    """Il modello nativo se è stato esportato, altrimenti il vecchio pickle."""
+    if os.path.exists(NATIVE_MODEL_PATH) and os.path.exists(manifest_path(NATIVE_MODEL_PATH)):
+        return NATIVE_MODEL_PATH
+    return PICKLE_MODEL_PATH
+
+
+def load_model(path=None):
+    """
+    Carica il modello: .ubj/.json con il manifest (veloce), .trees.npz con il
+    valutatore numpy, .pkl con joblib (compatibilità).
+    """
+    path = path or default_model_path()
+    if path.endswith('.pkl'):
+        import joblib
+        return joblib.load(path)
+    if path.endswith('.npz'):
+        from tree_model import TreeEnsemble
+        return TreeEnsemble.load(path)
+    return NativeModel.load(path)
+
+
+if __name__ == '__main__':
+    import warnings
+    import joblib
+    warnings.filterwarnings('ignore')
+
+    source = sys.argv[1] if len(sys.argv) > 1 else PICKLE_MODEL_PATH
+    target = sys.argv[2] if len(sys.argv) > 2 else NATIVE_MODEL_PATH
+    print(f"--- 📦 ESPORTAZIONE MODELLO NATIVO ({source} -> {target}) ---")
+    manifest = export_native(joblib.load(source), target)
+    print(f"✅ {manifest['num_trees']} alberi, {len(manifest['features'])} feature, "
+          f"classi {dict(zip(manifest['classes'], manifest['class_names']))}")
+    print(f"📁 Manifest: {manifest_path(target)}, alberi numpy: {trees_path(target)}")
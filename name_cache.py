@@ -0,0 +1,128 @@
+import os
+import hashlib
+import pandas as pd
+from fuzzy_matcher import NameMatcher
+from instrument import record_metric, share
+
+# ==============================================================================
+# CACHE PERSISTENTE DEI NOMI (FBref -> Kaggle)
+# ==============================================================================
+# Il fuzzy matching dei nomi è la parte più lenta di feature.py.
+# Salviamo su disco ogni nome FBref già risolto, così ad ogni aggiornamento
+# (es. la nuova giornata aggiunta con merge_seasons.py) facciamo il fuzzy
+# matching SOLO sui nomi mai visti prima.
+#
+# Una riga per nome FBref:
+#   fbref_name     -> nome grezzo come appare in fbref_lineups.csv
+#   kaggle_name    -> nome Kaggle trovato (vuoto se nessun match)
+#   player_id      -> ID Kaggle del giocatore trovato
+#   score          -> punteggio del match (100 = match esatto)
+#   source_version -> versione della lista nomi Kaggle usata per il match
+
+CACHE_PATH = 'data/name_mapping_cache.csv'
+CACHE_COLUMNS = ['fbref_name', 'kaggle_name', 'player_id', 'score', 'source_version']
+FUZZY_THRESHOLD = 85
+
+
+def kaggle_source_version(kaggle_names):
+    """
+    Impronta (hash corto) della lista nomi Kaggle.
+    Se il dump Kaggle cambia (nuovi giocatori), cambia anche la versione.
+    """
+    h = hashlib.sha1()
+    for name in sorted(str(n) for n in kaggle_names):
+        h.update(name.encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()[:12]
+
+
+def load_cache(path=CACHE_PATH):
+    """Carica la cache come dizionario fbref_name -> record."""
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, dtype={'fbref_name': str, 'kaggle_name': str, 'source_version': str})
+    df['kaggle_name'] = df['kaggle_name'].astype(object)
+    df['kaggle_name'] = df['kaggle_name'].where(df['kaggle_name'].notna(), None)
+    return {row['fbref_name']: row for row in df.to_dict('records')}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    """Salva la cache in modo atomico (file temporaneo + rename)."""
+    df = pd.DataFrame(list(cache.values()), columns=CACHE_COLUMNS)
+    df['player_id'] = df['player_id'].astype('Int64')
+    df = df.sort_values('fbref_name')
+    tmp_path = path + '.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def match_names(names, kaggle_names, kaggle_names_clean):
+    """
+    Stessa logica di sempre: prima match esatto (lowercase), poi fuzzy >= 85.
+    Il fuzzy gira in un colpo solo su tutti i nomi rimasti (NameMatcher a blocchi).
+    Restituisce {nome: (nome Kaggle o None, punteggio)}.
+    """
+    results = {}
+    fuzzy_names = []
+    for name in names:
+        # 1. Match Esatto
+        n_clean = str(name).lower()
+        if n_clean in kaggle_names_clean:
+            results[name] = (kaggle_names_clean[n_clean], 100)
+        else:
+            fuzzy_names.append(name)
+
+    # 2. Match Fuzzy (Simile)
+    if fuzzy_names:
+        matcher = NameMatcher(kaggle_names)
+        for name, res in zip(fuzzy_names, matcher.match(fuzzy_names, min_score=FUZZY_THRESHOLD, exhaustive=True)):
+            results[name] = res
+    return results
+
+
+def resolve_names(fbref_names, recent_players, path=CACHE_PATH, refresh=False):
+    """
+    Restituisce il dizionario {nome FBref: nome Kaggle o None}.
+
+    Vengono ricalcolati solo:
+    - i nomi che non sono mai stati visti;
+    - i nomi senza match salvati con una versione Kaggle diversa
+      (nel nuovo dump potrebbe esserci il giocatore);
+    - i match il cui nome Kaggle non esiste più nel dump attuale.
+    Con refresh=True si ricalcola tutto da zero.
+    """
+    kaggle_names = recent_players['name'].unique()
+    kaggle_names_clean = {str(n).lower(): n for n in kaggle_names}
+    kaggle_set = set(kaggle_names)
+    name_to_id = recent_players.drop_duplicates('name').set_index('name')['player_id'].to_dict()
+    version = kaggle_source_version(kaggle_names)
+
+    cache = {} if refresh else load_cache(path)
+
+    to_resolve = []
+    for name in fbref_names:
+        rec = cache.get(name)
+        if rec is None:
+            to_resolve.append(name)
+        elif rec['kaggle_name'] is None:
+            if rec['source_version'] != version:
+                to_resolve.append(name)
+        elif rec['kaggle_name'] not in kaggle_set:
+            to_resolve.append(name)
+
+    print(f"   Cache nomi: {len(fbref_names) - len(to_resolve)} già risolti, {len(to_resolve)} da calcolare.")
+    record_metric('names_from_cache_share', share(len(fbref_names) - len(to_resolve), len(fbref_names)))
+
+    for name, (match, score) in match_names(to_resolve, kaggle_names, kaggle_names_clean).items():
+        cache[name] = {
+            'fbref_name': name,
+            'kaggle_name': match,
+            'player_id': name_to_id.get(match) if match is not None else None,
+            'score': score,
+            'source_version': version,
+        }
+
+    if to_resolve or refresh:
+        save_cache(cache, path)
+
+    return {name: cache[name]['kaggle_name'] for name in fbref_names}
@@ -0,0 +1,140 @@
+import warnings
+import numpy as np
+import pandas as pd
+# Normalizzazione nomi squadra unica per tutte le fonti (clean_name = team_key)
+from team_registry import team_key as clean_name, team_keys, load_registry
+
+# ==============================================================================
+# QUOTE MULTI-BOOKMAKER (odds_history.csv) -> DATASET PER SQUADRA
+# ==============================================================================
+# odds_history.csv ha una riga per partita e una tripla H/D/A per ogni
+# bookmaker (B365H, B365D, B365A, PSH, ..., AvgH, MaxH, ...).
+# Il dataset invece ha una riga per squadra. Qui, in un solo passaggio
+# vettoriale (niente iterrows/apply):
+#   1. troviamo tutte le triple H/D/A complete;
+#   2. passiamo al formato "per squadra": la casa tiene H/D/A, l'ospite le
+#      inverte (A/D/H), così Odds_1 = "quota che QUESTA squadra vinca";
+#   3. uniamo al dataset su (data normalizzata, team_id del registro squadre),
+#      cioè su due interi invece che su stringhe.
+# Colonne prodotte:
+#   Odds_<BOOK>_1/X/2 -> quote di ogni bookmaker
+#   Odds_Best_1/X/2   -> quota migliore sul mercato
+#   Prob_1/X/2        -> probabilità di consenso senza margine del bookmaker
+#   Odds_Margin       -> margine medio (overround) dei bookmaker
+#   Odds_1/X/2        -> la tripla "storica" (Bet365 -> Media -> prima trovata)
+
+OUTCOMES = ['1', 'X', '2']
+# Prefissi che non sono bookmaker ma medie/massimi di mercato
+AGGREGATE_PREFIXES = ['Avg', 'Max', 'BbAv', 'BbMx', 'AvgC', 'MaxC']
+# Quote di chiusura (B365CH, PSCH, AvgCH, ...): al momento della giocata non
+# c'erano ancora, quindi restano fuori da quota migliore, consenso e margine.
+# Oltre a questi, è di chiusura ogni <P>C se anche <P> è un bookmaker del file.
+CLOSING_PREFIXES = ['B365C', 'BWC', 'IWC', 'PSC', 'WHC', 'VCC', 'BFC', 'BFEC', '1XBC', 'LBC', 'AvgC', 'MaxC']
+# Priorità per la tripla Odds_1/X/2 usata dal modello
+PREFERRED_PREFIXES = ['B365', 'Avg']
+
+
+def bookmaker_prefixes(columns):
+    """Prefissi con tripla completa <P>H, <P>D, <P>A (handicap asiatico e quote di chiusura esclusi)."""
+    columns = list(columns)
+    available = set(columns)
+    prefixes = []
+    for col in columns:
+        prefix = col[:-1]
+        if (col.endswith('H') and prefix and 'AH' not in prefix
+                and prefix + 'D' in available and prefix + 'A' in available and prefix not in prefixes):
+            prefixes.append(prefix)
+    return [p for p in prefixes if not is_closing(p, prefixes)]
+
+
+def is_closing(prefix, prefixes):
+    """True per le quote di chiusura: 'PSC' se c'è 'PS', ma 'VC' (VC Bet) resta un bookmaker."""
+    return prefix in CLOSING_PREFIXES or (prefix.endswith('C') and prefix[:-1] in prefixes)
+
+
+def main_prefix(prefixes):
+    """La tripla per Odds_1/X/2: Bet365, poi la Media, altrimenti la prima trovata."""
+    for prefix in PREFERRED_PREFIXES:
+        if prefix in prefixes:
+            return prefix
+    return prefixes[0]
+
+
+def odds_long(odds, prefixes=None, registry=None):
+    """
+    Dal file quote (una riga per partita) al formato per squadra: una riga per
+    (date_norm, team_id) con le quote di tutti i bookmaker dal punto di vista
+    di quella squadra, più quota migliore, probabilità di consenso e margine.
+    """
+    if prefixes is None:
+        prefixes = bookmaker_prefixes(odds.columns)
+    if not prefixes:
+        raise ValueError("NON TROVO COLONNE QUOTE! Controlla il CSV.")
+
+    n_books = len(prefixes)
+    triple_cols = [p + side for p in prefixes for side in ('H', 'D', 'A')]
+    home_view = odds[triple_cols].apply(pd.to_numeric, errors='coerce').to_numpy(np.float64).reshape(-1, n_books, 3)
+    # Per l'ospite la vittoria è la A e la sconfitta la H: invertiamo la tripla
+    away_view = home_view[:, :, ::-1]
+
+    # Righe alternate [casa_0, ospite_0, casa_1, ...]: a parità di chiave vince
+    # l'ultima, come quando si riempiva il dizionario riga per riga
+    values = np.stack([home_view, away_view], axis=1).reshape(-1, n_books, 3)
+    dates = np.repeat(pd.to_datetime(odds['date']).dt.normalize().to_numpy(), 2)
+    registry = registry if registry is not None else load_registry()
+    teams = np.stack([registry.ids(odds['home_team']), registry.ids(odds['away_team'])], axis=1).ravel()
+
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # Righe senza nessuna quota: nanmax/nanmean avviserebbero per ogni slice vuota
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+        # Quota migliore tra tutti i bookmaker
+        best = np.nanmax(values, axis=1)
+
+        # Probabilità implicite senza margine: 1/quota normalizzata sulla tripla
+        implied = 1.0 / values
+        booksum = implied.sum(axis=2, keepdims=True)
+        fair = implied / booksum
+
+        # Consenso: media dei bookmaker veri (le colonne Avg/Max li ripetono)
+        real = [i for i, p in enumerate(prefixes) if p not in AGGREGATE_PREFIXES] or list(range(n_books))
+        consensus = np.nanmean(fair[:, real, :], axis=1)
+        consensus = consensus / consensus.sum(axis=1, keepdims=True)
+        margin = np.nanmean(booksum[:, real, 0], axis=1) - 1.0
+
+    long = pd.DataFrame(values.reshape(len(values), -1),
+                        columns=[f'Odds_{p}_{o}' for p in prefixes for o in OUTCOMES])
+    main = prefixes.index(main_prefix(prefixes))
+    for j, o in enumerate(OUTCOMES):
+        long[f'Odds_{o}'] = values[:, main, j]
+    for j, o in enumerate(OUTCOMES):
+        long[f'Odds_Best_{o}'] = best[:, j]
+    for j, o in enumerate(OUTCOMES):
+        long[f'Prob_{o}'] = consensus[:, j]
+    long['Odds_Margin'] = margin
+    long.insert(0, 'date_norm', dates)
+    long.insert(1, 'team_id', teams)
+
+    return long.drop_duplicates(subset=['date_norm', 'team_id'], keep='last')
+
+
+def attach_odds(df, odds, prefixes=None, team_col='team', registry=None):
+    """
+    Aggiunge al dataset (colonne 'date' e `team_col`) tutte le colonne quote di
+    odds_long, dal punto di vista di `team_col` ('team' per le righe per squadra,
+    'Home_Team' per le righe per partita). Le righe senza quote restano NaN.
+    Le grafie nuove delle squadre finiscono nel registro squadre.
+    """
+    registry = registry if registry is not None else load_registry()
+    long = odds_long(odds, prefixes, registry)
+
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    keys = pd.DataFrame({'date_norm': df['date'].dt.normalize().to_numpy(), 'team_id': registry.ids(df[team_col])})
+    registry.save()
+
+    # long ha chiavi uniche: il left join mantiene numero e ordine delle righe
+    matched = keys.merge(long, on=['date_norm', 'team_id'], how='left')
+    matched = matched.drop(columns=['date_norm', 'team_id'])
+    matched.index = df.index
+    return pd.concat([df, matched], axis=1)
@@ -0,0 +1,81 @@
+import os
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from instrument import record_metric
+
+# ==============================================================================
+# CALCOLO PER PARTIZIONI (lega / stagione) IN PIÙ PROCESSI
+# ==============================================================================
+# Con più campionati (get_data.ipynb scarica Serie A, Liga, Bundesliga e
+# Premier) le parti pesanti delle fasi feature e match_table non hanno bisogno
+# di vedere tutto il dataset insieme:
+#   - il valore delle formazioni è una somma per (partita, squadra): basta la
+#     partizione (lega, stagione) della partita;
+#   - la forma (media mobile) è per squadra ma attraversa le stagioni: basta la
+#     lega della squadra.
+# Le partizioni girano in un pool di processi e i risultati si rimettono
+# insieme in ordine di partizione (ordinato), quindi l'esito è identico a
+# quello in un solo processo. Quello che mescola i campionati (mediane e
+# z-score per stagione, registro squadre, cache dei nomi) resta nel processo
+# principale.
+#
+# Processi: SERIE_A_PROCS (o pipeline.py --procs), di default tutti i core.
+# Sotto PARALLEL_MIN_ROWS righe si resta in un processo: avviare il pool
+# costa più del calcolo.
+
+PARALLEL_MIN_ROWS = 200_000
+
+# Dati comuni a tutte le partizioni (es. l'indice dei valori), inviati una
+# volta per processo figlio invece che con ogni partizione
+_shared = None
+
+
+def partition_workers(workers=None):
+    """Numero di processi: argomento, poi SERIE_A_PROCS, poi i core della macchina."""
+    if workers is None:
+        workers = int(os.environ.get('SERIE_A_PROCS', 0)) or os.cpu_count() or 1
+    return max(1, workers)
+
+
+def split_partitions(df, keys):
+    """
+    Indici (posizionali) delle righe di ogni partizione, in ordine di chiave.
+    Dentro una partizione le righe restano nell'ordine di `df`.
+    `keys`: colonne di df o array allineati alle righe.
+    """
+    keys = [df[k] if isinstance(k, str) else pd.Series(np.asarray(k), index=df.index) for k in keys]
+    groups = pd.Series(np.arange(len(df)), index=df.index).groupby(keys, sort=True, dropna=False)
+    return [(key, rows.to_numpy()) for key, rows in groups]
+
+
+def _init_worker(shared):
+    global _shared
+    _shared = shared
+
+
+def _call_shared(func, task):
+    return func(_shared, task)
+
+
+def map_partitions(func, tasks, shared=None, workers=None, n_rows=None):
+    """
+    [func(shared, t) for t in tasks], in un pool di processi se conviene.
+    func deve essere una funzione di modulo (viene importata nei processi figli).
+    I risultati tornano nell'ordine di `tasks`.
+    """
+    workers = min(partition_workers(workers), len(tasks))
+    if n_rows is not None and n_rows < PARALLEL_MIN_ROWS:
+        workers = 1
+    record_metric('partitions', len(tasks))
+    record_metric('partition_workers', workers)
+    if workers <= 1:
+        return [func(shared, t) for t in tasks]
+
+    # spawn: le fasi della pipeline girano in thread, e fork da un processo
+    # con thread (pool di Arrow compresi) può bloccarsi
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(shared,)) as pool:
+        return list(pool.map(functools.partial(_call_shared, func), tasks))
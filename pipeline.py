@@ -0,0 +1,334 @@
+import os
+import ast
+import glob
+import json
+import time
+import hashlib
+import argparse
+import importlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from instrument import stage as instrument_stage, count_rows, record_metric
+
+# ==============================================================================
+# PIPELINE COMPLETA IN UN SOLO PROCESSO (con cache per fase)
+# ==============================================================================
+# Invece di lanciare a mano feature.py -> add_final_features.py -> ... ->
+# prepare_final_dataset.py, dichiariamo le fasi con i loro input e output.
+# Le fasi si passano i DataFrame in memoria; ogni fase viene SALTATA se i file
+# in ingresso (hash del contenuto) e il codice non sono cambiati dall'ultima
+# esecuzione. Le fasi indipendenti (es. caricamento FBref e caricamento Kaggle)
+# girano in parallelo.
+#
+# Tempi, memoria e righe di ogni fase finiscono in data/run_log.jsonl
+# (instrument.py; riepilogo con: python instrument.py).
+#
+# Uso: python pipeline.py [--force] [--fake-odds] [--streaming] [--procs N] [--profile feature,odds [--profiler sample]]
+
+STATE_PATH = 'data/.pipeline_state.json'
+# Moduli condivisi: se cambiano, cambia il risultato di tutte le fasi che salvano dataset
+SHARED_CODE = ['storage.py']
+# Stesso suffisso di merge_seasons.NEW_SEASON
+NEW_SEASON = '2526'
+
+
+class Stage:
+    """
+    Una fase della pipeline.
+    func     -> 'modulo:funzione', chiamata con i risultati delle fasi in deps
+    files    -> file grezzi letti dalla fase (entrano nell'hash, anche come pattern glob)
+    code     -> sorgenti in più che determinano il risultato (entrano nell'hash); il
+                modulo di func e i moduli del progetto che importa, anche
+                indirettamente, si aggiungono da soli (local_imports)
+    artifact -> nome del dataset salvato con storage (None = fase di solo caricamento)
+    output   -> file scritto direttamente dalla funzione (al posto di artifact)
+    """
+
+    def __init__(self, name, func, deps=(), files=(), code=(), artifact=None, export_csv=False, output=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.files = list(files)
+        self.code = list(code)
+        self.artifact = artifact
+        self.export_csv = export_csv
+        self.output = output
+
+    @property
+    def produces(self):
+        # Fasi con un risultato su disco (le altre caricano solo dati in memoria)
+        return self.artifact is not None or self.output is not None
+
+    def call(self, *args):
+        module_name, func_name = self.func.split(':')
+        module = importlib.import_module(module_name)
+        return getattr(module, func_name)(*args)
+
+
+def raw_parts(table):
+    """Pattern dei file dell'archivio partizionato (raw_store.py) di una tabella."""
+    return f'data/raw/{table}/*/*/part-*.parquet'
+
+
+def build_stages(fake_odds=False):
+    """Il grafo delle fasi, nell'ordine in cui si lanciavano gli script."""
+    stages = [
+        Stage('load_fbref', 'feature:load_fbref',
+              files=['data/fbref_lineups.csv', 'data/fbref_match_stats.csv',
+                     raw_parts('lineups'), raw_parts('match_stats')]),
+        Stage('load_kaggle', 'feature:load_kaggle',
+              files=['data/players.csv', 'data/player_valuations.csv']),
+        Stage('feature', 'feature:build_lineup_dataset', deps=['load_fbref', 'load_kaggle'],
+              artifact='dataset_completo_xgboost_3'),
+        Stage('load_schedule_stats', 'final_dataset_polish:load_schedule_stats',
+              files=['data/fbref_schedule.csv', 'data/fbref_match_stats.csv',
+                     raw_parts('schedule'), raw_parts('match_stats')]),
+        # Stagione, giornata, riposo e partite ravvicinate dal calendario (un solo ordinamento)
+        Stage('calendar', 'calendar_features:build_calendar', deps=['load_schedule_stats'], artifact='calendar_3'),
+        # Una riga per partita (casa/ospite) in un passo: sostituisce
+        # add_final_features + final_dataset_polish e i loro merge con se stessi
+        Stage('match_table', 'match_table:build_match_table', deps=['feature', 'load_schedule_stats', 'calendar'],
+              artifact='dataset_match_3'),
+    ]
+
+    if fake_odds:
+        # Bypass delle quote (come fake_odds.py): quote neutre a 1.0
+        stages.append(Stage('odds', 'fake_odds:add_fake_odds', deps=['match_table'],
+                            artifact='dataset_con_quote_FIXED_3'))
+    else:
+        stages += [
+            Stage('load_odds', 'debug_odds_merge:load_odds', files=['data/odds_history.csv']),
+            Stage('odds', 'debug_odds_merge:merge_odds', deps=['match_table', 'load_odds'],
+                  artifact='dataset_con_quote_FIXED_3'),
+        ]
+
+    stages.append(Stage('prepare_final_dataset', 'prepare_final_dataset:prepare_final_dataset', deps=['odds'],
+                        artifact='dataset_train_final_3', export_csv=True))
+    # Stato per squadra per gli script di previsione (train/predict_tonight.py, ...)
+    stages.append(Stage('team_state', 'team_state:save_team_state', deps=['prepare_final_dataset'],
+                        output='data/team_state.json'))
+    return stages
+
+
+# ==============================================================================
+# HASH DI FILE E CODICE
+# ==============================================================================
+def file_hash(path, state_files):
+    """
+    Hash del contenuto di un file. Se dimensione e data di modifica non sono
+    cambiate riusiamo l'hash salvato (niente rilettura dei CSV grandi).
+    """
+    if not os.path.exists(path):
+        return 'missing'
+    st = os.stat(path)
+    cached = state_files.get(path)
+    if cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+        return cached['sha1']
+
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    state_files[path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': h.hexdigest()}
+    return h.hexdigest()
+
+
+def local_imports(module_name, code_dir, seen=None):
+    """
+    Sorgenti del progetto (file .py in code_dir) da cui dipende un modulo: il
+    modulo stesso e quelli che importa, anche dentro le funzioni e a catena.
+    Letti con ast, senza importarli (niente pandas se non serve); i moduli
+    esterni (pandas, thefuzz, ...) si ignorano.
+    """
+    seen = set() if seen is None else seen
+    path = os.path.join(code_dir, module_name + '.py')
+    if module_name in seen or not os.path.exists(path):
+        return seen
+    seen.add(module_name)
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            local_imports(name.split('.')[0], code_dir, seen)
+    return seen
+
+
+def stage_code(stage, code_dir):
+    """File sorgente nell'hash di una fase: import del modulo di func + code + SHARED_CODE."""
+    module_name = stage.func.split(':')[0]
+    code = {m + '.py' for m in local_imports(module_name, code_dir)} | set(stage.code)
+    return sorted(code | (set(SHARED_CODE) if stage.produces else set()))
+
+
+def stage_keys(stages, state_files, code_dir):
+    """Chiave di ogni fase = hash(codice, file in ingresso, chiavi delle fasi da cui dipende)."""
+    fmt = os.environ.get('SERIE_A_FORMAT', 'parquet').lower()
+    keys = {}
+    for stage in stages:
+        code = stage_code(stage, code_dir)
+        payload = [
+            stage.name, stage.func, fmt, stage.export_csv,
+            [file_hash(os.path.join(code_dir, c), state_files) for c in code],
+            [file_hash(f, state_files) for pattern in stage.files for f in (sorted(glob.glob(pattern)) or [pattern])],
+            [keys[d] for d in stage.deps],
+        ]
+        keys[stage.name] = hashlib.sha1(json.dumps(payload).encode('utf-8')).hexdigest()
+    return keys
+
+
+def load_state(path=STATE_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'files': {}, 'stages': {}}
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+# ==============================================================================
+# ESECUZIONE
+# ==============================================================================
+def plan(stages, keys, state, force=False):
+    """Quali fasi vanno eseguite: quelle con chiave cambiata + i caricamenti che servono loro."""
+    by_name = {s.name: s for s in stages}
+    to_run = set()
+    for stage in stages:
+        if not stage.produces:
+            continue
+        saved = state['stages'].get(stage.name, {})
+        if force or saved.get('key') != keys[stage.name] or not os.path.exists(saved.get('output', '')):
+            to_run.add(stage.name)
+
+    # Le fasi di caricamento (senza dataset salvato) girano solo se qualcuno le usa
+    for name in list(to_run):
+        for dep in by_name[name].deps:
+            if not by_name[dep].produces:
+                to_run.add(dep)
+    return to_run
+
+
+def run_pipeline(force=False, fake_odds=False, workers=4, state_path=STATE_PATH):
+    # Una riga di log per tutta l'esecuzione (CPU di tutto il processo), una per fase
+    with instrument_stage('pipeline', process_cpu=True, force=force, fake_odds=fake_odds):
+        _run_pipeline(force, fake_odds, workers, state_path)
+
+
+def _run_pipeline(force, fake_odds, workers, state_path):
+    t_start = time.perf_counter()
+    code_dir = os.path.dirname(os.path.abspath(__file__))
+    state = load_state(state_path)
+
+    # 0. Nuova stagione da unire? (merge_seasons.py riscrive i Master File)
+    # (lista file ricalcolata qui per non importare pandas quando non serve)
+    merge_stage = Stage('merge_seasons', 'merge_seasons:merge_seasons')
+    merge_files = [f'data/{n}_{NEW_SEASON}.csv' for n in ['fbref_lineups', 'fbref_match_stats', 'fbref_schedule']]
+    merge_stage.files = [f for f in merge_files if os.path.exists(f)]
+    if merge_stage.files:
+        merge_key = stage_keys([merge_stage], state['files'], code_dir)['merge_seasons']
+        if force or state['stages'].get('merge_seasons', {}).get('key') != merge_key:
+            print("▶️  merge_seasons: unione nuova stagione...")
+            merge_stage.call()
+            state['stages']['merge_seasons'] = {'key': merge_key}
+
+    stages = build_stages(fake_odds)
+    by_name = {s.name: s for s in stages}
+    keys = stage_keys(stages, state['files'], code_dir)
+    to_run = plan(stages, keys, state, force)
+
+    for stage in stages:
+        if stage.produces and stage.name not in to_run:
+            print(f"⏭️  {stage.name}: invariata, salto.")
+
+    record_metric('stages_run', len([s for s in stages if s.name in to_run and s.produces]))
+    record_metric('stages_skipped', len([s for s in stages if s.name not in to_run and s.produces]))
+
+    if not to_run:
+        save_state(state, state_path)
+        print(f"✅ Niente da fare ({time.perf_counter() - t_start:.2f}s).")
+        return
+
+    # Import solo se c'è davvero qualcosa da calcolare (pandas è lento da importare)
+    from storage import save_artifact, load_artifact, artifact_path
+
+    results = {}
+
+    def get_input(dep_name):
+        # In memoria se calcolato ora, altrimenti dal dataset salvato l'ultima volta
+        if dep_name in results:
+            return results[dep_name]
+        return load_artifact(by_name[dep_name].artifact)
+
+    def execute(stage):
+        t0 = time.perf_counter()
+        args = [get_input(d) for d in stage.deps]
+        with instrument_stage(stage.name, rows_in=count_rows(args)) as rec:
+            value = stage.call(*args)
+            if stage.artifact:
+                value = save_artifact(value, stage.artifact, export_csv=stage.export_csv)
+            rec['rows_out'] = count_rows(value)
+        return value, time.perf_counter() - t0
+
+    pending = [s for s in stages if s.name in to_run]
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            # Lanciamo tutte le fasi i cui input sono pronti
+            for stage in list(pending):
+                if all(d in results or d not in to_run for d in stage.deps):
+                    print(f"▶️  {stage.name}...")
+                    running[pool.submit(execute, stage)] = stage
+                    pending.remove(stage)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage = running.pop(fut)
+                value, elapsed = fut.result()
+                results[stage.name] = value
+                print(f"✅ {stage.name} completata in {elapsed:.2f}s")
+                if stage.produces:
+                    output = artifact_path(stage.artifact) if stage.artifact else stage.output
+                    state['stages'][stage.name] = {'key': keys[stage.name], 'output': output}
+                    save_state(state, state_path)
+
+    save_state(state, state_path)
+    print(f"🚀 Pipeline completata in {time.perf_counter() - t_start:.2f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pipeline completa Serie A con cache per fase')
+    parser.add_argument('--force', action='store_true', help='Ricalcola tutte le fasi')
+    parser.add_argument('--fake-odds', action='store_true', help='Quote neutre (come fake_odds.py)')
+    parser.add_argument('--workers', type=int, default=4, help='Fasi eseguite in parallelo')
+    parser.add_argument('--profile', default=None, help='Fasi da profilare, separate da virgola (o "all")')
+    parser.add_argument('--profiler', choices=['cprofile', 'sample'], default='cprofile',
+                        help='cProfile (file .prof in data/profiles/) o campionamento dello stack')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Formazioni lette a blocchi (memoria limitata, stesso risultato)')
+    parser.add_argument('--procs', type=int, default=None,
+                        help='Processi per le partizioni lega/stagione (default: tutti i core)')
+    args = parser.parse_args()
+
+    if args.procs is not None:
+        # Letto da partitions.py
+        os.environ['SERIE_A_PROCS'] = str(args.procs)
+    if args.streaming:
+        # Letto da feature.load_fbref
+        os.environ['SERIE_A_STREAMING'] = '1'
+
+    if args.profile:
+        # Letti da instrument.py all'inizio di ogni fase
+        os.environ['SERIE_A_PROFILE'] = args.profile
+        os.environ['SERIE_A_PROFILER'] = args.profiler
+
+    print("--- PIPELINE SERIE A ---")
+    run_pipeline(force=args.force, fake_odds=args.fake_odds, workers=args.workers)
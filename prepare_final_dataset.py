@@ -1,45 +1,20 @@
-import pandas as pd
-
-print("--- PULIZIA E PREPARAZIONE FINALE (1X2) ---")
-
-# 1. CARICA IL DATASET CON QUOTE (quello FIXED)
-try:
-    # Usa il file generato dallo script di debug/fix
-    df = pd.read_csv('data/dataset_con_quote_FIXED_3.csv')
-    print(f"1. Righe Totali Iniziali: {len(df)}")
-except FileNotFoundError:
-    print("❌ Errore: Manca 'data/dataset_con_quote_FIXED.csv'")
-    exit()
-
-# 2. GESTIONE PARTITE SENZA QUOTE (MODIFICATO)
-# Non rimuoviamo più le partite senza quote, perché servono per il training!
-initial_count = len(df)
-
-# Invece di cancellare, riempiamo i NaN delle quote con 0.0 o 1.0
-# Questo ci permette di mantenere la riga per il training.
-cols_quotes = ['Odds_1', 'Odds_X', 'Odds_2']
-for col in cols_quotes:
-    if col in df.columns:
-        df[col] = df[col].fillna(1.0) # Mettiamo 1.0 come valore neutro/fittizio
-
-df_clean = df.copy() # Teniamo tutto
-
-print(f"2. Pulizia Quote: MANTENUTE tutte le {len(df_clean)} righe (Quote mancanti settate a 1.0).")
-
-
-print(f"   Righe valide rimaste: {len(df_clean)}")
-
-# 3. TRASFORMAZIONE IN RIGA SINGOLA (MATCH-CENTRIC)
-# Teniamo solo le righe 'is_home' == 1.
-# Poiché abbiamo le righe doppie, ogni partita ha una riga Home e una Away.
-# Prendendo solo Home, abbiamo una riga per partita con tutti i dati.
-
-df_single = df_clean[df_clean['is_home'] == 1].copy()
-
-print(f"3. Trasformazione: Da {len(df_clean)} righe doppie a {len(df_single)} partite uniche.")
+from storage import load_artifact, save_artifact, artifact_path
+from team_state import save_team_state, TEAM_STATE_PATH
+from instrument import record_metric, share
+
+# Colonne del dataset con quote che servono per il dataset finale
+# (righe per partita da match_table.py, o le vecchie righe per squadra con is_home)
+INPUT_COLUMNS = [
+    'date', 'result', 'Odds_1', 'Odds_X', 'Odds_2', 'Value_Ratio_vs_Opponent',
+    'Home_Team', 'Away_Team', 'Home_Value', 'Away_Value', 'Home_Lineup_Ratio', 'Away_Lineup_Ratio',
+    'Home_Attack_Form', 'Home_Defense_Form', 'Away_Attack_Form', 'Away_Defense_Form',
+    'team', 'opponent', 'is_home',
+    'Starting_XI_Value', 'Opponent_Value', 'Lineup_Strength_Ratio', 'Opponent_Lineup_Ratio',
+    'xG_Relative_Form', 'Defense_Form_Relative', 'Opponent_Attack_Form', 'Opponent_Defense_Form'
+]
 
-# 4. RINOMINA COLONNE (Per chiarezza Input Casa vs Fuori)
-rename_map = {
+# Vecchie colonne per squadra (riga della squadra di casa) -> colonne Casa/Ospite
+RENAME_MAP = {
     'team': 'Home_Team',
     'opponent': 'Away_Team',
     'Starting_XI_Value': 'Home_Value',
@@ -53,32 +28,94 @@ rename_map = {
     # Le quote su riga Home sono già corrette (Odds_1 = Vittoria Casa)
 }
 
-df_single.rename(columns=rename_map, inplace=True)
-
-# 5. CREAZIONE TARGET (0, 1, 2)
-# Convertiamo W/D/L in 0/1/2
-target_map = {'W': 0, 'D': 1, 'L': 2}
-df_single['Target'] = df_single['result'].map(target_map)
-
-# 6. SELEZIONE FINALE COLONNE
-cols_order = [
-    'date', 'Home_Team', 'Away_Team', 'Target',          # Info Base
-    'Odds_1', 'Odds_X', 'Odds_2',                        # Quote
-    'Value_Ratio_vs_Opponent',                           # Feature Regina
-    'Home_Value', 'Away_Value',                          # Dati valore
-    'Home_Lineup_Ratio', 'Away_Lineup_Ratio',            # Dati assenze
-    'Home_Attack_Form', 'Home_Defense_Form',             # Dati forma Casa
-    'Away_Attack_Form', 'Away_Defense_Form'              # Dati forma Trasferta
-]
-
-# Filtriamo solo le colonne che esistono davvero
-final_cols = [c for c in cols_order if c in df_single.columns]
-df_final = df_single[final_cols]
 
-# 7. SALVATAGGIO
-print("-" * 30)
-print(df_final.head())
-print("-" * 30)
+def prepare_final_dataset(df):
+    """Dal dataset con quote (una riga per partita, o due per squadra) al dataset di training."""
+    df = df[[c for c in INPUT_COLUMNS if c in df.columns]].copy()
+    print(f"1. Righe Totali Iniziali: {len(df)}")
 
-df_final.to_csv('data/dataset_train_final_3.csv', index=False)
-print("🚀 TUTTO PRONTO! File salvato: 'data/dataset_train_final.csv'")
\ No newline at end of file
+    # 2. GESTIONE PARTITE SENZA QUOTE (MODIFICATO)
+    # Non rimuoviamo più le partite senza quote, perché servono per il training!
+    initial_count = len(df)
+
+    # Invece di cancellare, riempiamo i NaN delle quote con 0.0 o 1.0
+    # Questo ci permette di mantenere la riga per il training.
+    cols_quotes = ['Odds_1', 'Odds_X', 'Odds_2']
+    if 'Odds_1' in df.columns:
+        record_metric('odds_missing_share', share(int(df['Odds_1'].isna().sum()), len(df)))
+    for col in cols_quotes:
+        if col in df.columns:
+            df[col] = df[col].fillna(1.0) # Mettiamo 1.0 come valore neutro/fittizio
+
+    df_clean = df.copy() # Teniamo tutto
+
+    print(f"2. Pulizia Quote: MANTENUTE tutte le {len(df_clean)} righe (Quote mancanti settate a 1.0).")
+
+
+    print(f"   Righe valide rimaste: {len(df_clean)}")
+
+    # 3. TRASFORMAZIONE IN RIGA SINGOLA (MATCH-CENTRIC)
+    if 'Home_Team' in df_clean.columns:
+        # match_table.py produce già una riga per partita con colonne Casa/Ospite
+        df_single = df_clean
+        print(f"3. Dataset già per partita: {len(df_single)} partite.")
+    else:
+        # Vecchio formato: teniamo solo le righe 'is_home' == 1.
+        # Poiché abbiamo le righe doppie, ogni partita ha una riga Home e una Away.
+        # Prendendo solo Home, abbiamo una riga per partita con tutti i dati.
+        df_single = df_clean[df_clean['is_home'] == 1].copy()
+        print(f"3. Trasformazione: Da {len(df_clean)} righe doppie a {len(df_single)} partite uniche.")
+
+        # 4. RINOMINA COLONNE (Per chiarezza Input Casa vs Fuori)
+        df_single.rename(columns=RENAME_MAP, inplace=True)
+
+    # 5. CREAZIONE TARGET (0, 1, 2)
+    # Convertiamo W/D/L in 0/1/2
+    target_map = {'W': 0, 'D': 1, 'L': 2}
+    df_single['Target'] = df_single['result'].map(target_map)
+
+    # 6. SELEZIONE FINALE COLONNE
+    cols_order = [
+        'date', 'Home_Team', 'Away_Team', 'Target',          # Info Base
+        'Odds_1', 'Odds_X', 'Odds_2',                        # Quote
+        'Value_Ratio_vs_Opponent',                           # Feature Regina
+        'Home_Value', 'Away_Value',                          # Dati valore
+        'Home_Lineup_Ratio', 'Away_Lineup_Ratio',            # Dati assenze
+        'Home_Attack_Form', 'Home_Defense_Form',             # Dati forma Casa
+        'Away_Attack_Form', 'Away_Defense_Form'              # Dati forma Trasferta
+    ]
+
+    # Filtriamo solo le colonne che esistono davvero
+    final_cols = [c for c in cols_order if c in df_single.columns]
+    df_final = df_single[final_cols]
+
+    # 7. ANTEPRIMA
+    print("-" * 30)
+    print(df_final.head())
+    print("-" * 30)
+
+    return df_final
+
+
+if __name__ == '__main__':
+    print("--- PULIZIA E PREPARAZIONE FINALE (1X2) ---")
+
+    # 1. CARICA IL DATASET CON QUOTE (quello FIXED)
+    try:
+        # Usa il file generato dallo script di debug/fix
+        # Carichiamo solo le colonne che servono per il dataset finale
+        df = load_artifact('dataset_con_quote_FIXED_3', columns=INPUT_COLUMNS)
+    except FileNotFoundError:
+        print("❌ Errore: Manca 'data/dataset_con_quote_FIXED.csv'")
+        exit()
+
+    df_final = prepare_final_dataset(df)
+
+    # 8. SALVATAGGIO
+    # export_csv=True: il notebook di training legge ancora il CSV
+    save_artifact(df_final, 'dataset_train_final_3', export_csv=True)
+    print(f"🚀 TUTTO PRONTO! File salvato: '{artifact_path('dataset_train_final_3')}'")
+
+    # Fotografia dell'ultimo stato di ogni squadra per gli script di previsione
+    save_team_state(df_final)
+    print(f"📸 Stato squadre salvato: '{TEAM_STATE_PATH}'")
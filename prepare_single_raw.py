@@ -1,8 +1,8 @@
-import pandas as pd
+from storage import load_artifact, save_artifact, artifact_path
 
 # 1. Carica il dataset completo (quello con le quote)
 try:
-    df = pd.read_csv('data/dataset_con_quote_FIXED_3.csv')
+    df = load_artifact('dataset_con_quote_FIXED_3')
     print(f"Righe totali (Doppie): {len(df)}")
 except FileNotFoundError:
     print("❌ Esegui prima lo script delle quote!")
@@ -10,7 +10,8 @@ except FileNotFoundError:
 
 # 2. FILTRO: TENIAMO SOLO LA PROSPETTIVA DELLA SQUADRA DI CASA
 # Se is_home == 1, quella riga contiene già TUTTO: i dati della casa e i dati dell'avversario (ospite)
-df_single = df[df['is_home'] == 1].copy()
+# (il dataset di match_table.py è già una riga per partita: niente da filtrare)
+df_single = df[df['is_home'] == 1].copy() if 'is_home' in df.columns else df.copy()
 
 # 3. RINOMINA COLONNE (Per non confondersi)
 # Ora "team" diventa "Home_Team" e "opponent" diventa "Away_Team"
@@ -49,7 +50,7 @@ df_single['Target'] = df_single['result'].map(target_map)
 
 # Pulizia: Rimuoviamo colonne inutili ora
 cols_to_drop = ['is_home', 'matchweek', 'result'] # matchweek la teniamo se vuoi, is_home è sempre 1
-df_single.drop(columns=['is_home', 'result'], inplace=True)
+df_single.drop(columns=[c for c in ['is_home', 'result'] if c in df_single.columns], inplace=True)
 
 # 5. ORDINE COLONNE (Per pulizia visiva)
 cols_order = [
@@ -72,5 +73,5 @@ print("Esempio Target (0=1, 1=X, 2=2):")
 print(df_final[['date', 'Home_Team', 'Away_Team', 'Target', 'Odds_1']].head())
 
 # Salva
-df_final.to_csv('data/dataset_1x2_ready_3.csv', index=False)
-print("🚀 SALVATO: 'data/dataset_1x2_ready.csv'")
\ No newline at end of file
+save_artifact(df_final, 'dataset_1x2_ready_3')
+print(f"🚀 SALVATO: '{artifact_path('dataset_1x2_ready_3')}'")
\ No newline at end of file
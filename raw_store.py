@@ -0,0 +1,227 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# ==============================================================================
+# ARCHIVIO DATI GREZZI FBREF PARTIZIONATO (lega / stagione)
+# ==============================================================================
+# Prima merge_seasons.py rileggeva TUTTO lo storico (fbref_lineups.csv, ...),
+# aggiungeva la nuova stagione, faceva drop_duplicates e riscriveva il file:
+# costo che cresce con gli anni, e se lo script si interrompe a metà
+# scrittura il Master File è rovinato.
+#
+# Qui ogni tabella è una cartella di file Parquet che non vengono MAI riscritti:
+#   data/raw/<tabella>/league=<lega>/season=<stagione>/part-<inizio>-<fine>.parquet
+# Aggiungere una stagione (o una giornata) scrive solo i file nuovi, in modo
+# atomico (file temporaneo + os.replace).
+#
+# Deduplica: ogni riga porta l'hash della sua chiave (colonna _key) e
+# data/raw/<tabella>/_keys.npz tiene tutte le chiavi già presenti, così un
+# append legge solo le chiavi e non lo storico. La colonna _row (progressivo
+# globale) permette di rileggere le righe nell'ordine in cui sono arrivate,
+# come nel vecchio CSV.
+
+RAW_DIR = 'data/raw'
+
+# Tabella -> (Master File CSV, colonne chiave per la deduplica)
+TABLES = {
+    'lineups': ('data/fbref_lineups.csv', ['game', 'player']),
+    'match_stats': ('data/fbref_match_stats.csv', ['game', 'team']),
+    'schedule': ('data/fbref_schedule.csv', ['game_id']),
+}
+# Fallback per lo schedule senza game_id (come in merge_seasons.py)
+SCHEDULE_FALLBACK_KEY = ['date', 'home_team', 'away_team']
+PARTITION_COLUMNS = ['league', 'season']
+INTERNAL_COLUMNS = ['_key', '_row']
+
+
+def table_dir(table):
+    return os.path.join(RAW_DIR, table)
+
+
+def has_table(table):
+    """True se la tabella è già stata importata nell'archivio."""
+    return bool(_part_files(table))
+
+
+def _part_files(table):
+    return sorted(glob.glob(os.path.join(table_dir(table), '*', '*', 'part-*.parquet')))
+
+
+def _part_range(path):
+    """part-<inizio>-<fine>.parquet -> (inizio, fine) del progressivo _row."""
+    start, end = os.path.basename(path)[len('part-'):-len('.parquet')].split('-')
+    return int(start), int(end)
+
+
+def _partition_of(path):
+    """.../league=<lega>/season=<stagione>/part-... -> (lega, stagione) come stringhe."""
+    season_dir = os.path.dirname(path)
+    league = os.path.basename(os.path.dirname(season_dir))[len('league='):]
+    season = os.path.basename(season_dir)[len('season='):]
+    return league, season
+
+
+def _partition_dir(table, league, season):
+    # '/' nei nomi delle leghe romperebbe il percorso
+    league = str(league).replace('/', '_')
+    return os.path.join(table_dir(table), f'league={league}', f'season={season}')
+
+
+def _key_columns(table, df):
+    key = TABLES[table][1]
+    if table == 'schedule' and 'game_id' not in df.columns:
+        key = SCHEDULE_FALLBACK_KEY
+    return key
+
+
+def _hash_keys(df, key):
+    return pd.util.hash_pandas_object(df[key].astype(str), index=False).to_numpy(np.uint64)
+
+
+# ==============================================================================
+# INDICE DELLE CHIAVI (persistente)
+# ==============================================================================
+def _index_path(table):
+    return os.path.join(table_dir(table), '_keys.npz')
+
+
+def _load_key_index(table):
+    """
+    Chiavi già presenti nella tabella. L'indice salvato ricorda quali file
+    copre: se un append si è interrotto dopo aver scritto il Parquet ma prima
+    dell'indice, le chiavi mancanti vengono recuperate dai file stessi.
+    """
+    keys, covered = np.empty(0, dtype=np.uint64), set()
+    if os.path.exists(_index_path(table)):
+        with np.load(_index_path(table)) as data:
+            keys = data['keys']
+            covered = set(data['parts'].tolist())
+
+    missing = [p for p in _part_files(table) if os.path.relpath(p, table_dir(table)) not in covered]
+    if missing:
+        extra = [pq.read_table(p, columns=['_key']).column('_key').to_numpy() for p in missing]
+        keys = np.concatenate([keys] + extra)
+    return keys
+
+
+def _save_key_index(table, keys):
+    parts = [os.path.relpath(p, table_dir(table)) for p in _part_files(table)]
+    tmp_path = _index_path(table) + '.tmp.npz'
+    np.savez(tmp_path, keys=np.sort(keys), parts=np.array(parts, dtype=str))
+    os.replace(tmp_path, _index_path(table))
+
+
+# ==============================================================================
+# SCRITTURA (solo append)
+# ==============================================================================
+def append_rows(table, df):
+    """
+    Aggiunge all'archivio le righe di `df` non ancora presenti (stessa chiave).
+    Scrive un nuovo file per ogni (lega, stagione) toccata. Ritorna quante
+    righe sono state aggiunte.
+    """
+    key = _key_columns(table, df)
+    hashes = _hash_keys(df, key)
+
+    # Teniamo la prima occorrenza (come drop_duplicates) e scartiamo le chiavi già note
+    existing = _load_key_index(table)
+    first = ~pd.Series(hashes).duplicated().to_numpy()
+    new = first & ~np.isin(hashes, existing)
+    if not new.any():
+        return 0
+
+    df = df[new].copy()
+    df['_key'] = hashes[new]
+    parts = _part_files(table)
+    next_row = max(_part_range(p)[1] for p in parts) if parts else 0
+    df['_row'] = np.arange(next_row, next_row + len(df), dtype=np.int64)
+
+    for (league, season), part in df.groupby(PARTITION_COLUMNS, sort=False, dropna=False):
+        out_dir = _partition_dir(table, league, season)
+        os.makedirs(out_dir, exist_ok=True)
+        start, end = int(part['_row'].iloc[0]), int(part['_row'].iloc[-1]) + 1
+        path = os.path.join(out_dir, f'part-{start:012d}-{end:012d}.parquet')
+        # Scrittura atomica: un file o c'è tutto o non c'è
+        tmp_path = path + '.tmp'
+        part.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    _save_key_index(table, np.concatenate([existing, df['_key'].to_numpy()]))
+    return len(df)
+
+
+def import_master(table):
+    """Prima importazione: porta il Master File CSV nell'archivio (una volta sola)."""
+    if has_table(table):
+        return 0
+    master_path = TABLES[table][0]
+    if not os.path.exists(master_path):
+        return 0
+    return append_rows(table, pd.read_csv(master_path))
+
+
+# ==============================================================================
+# LETTURA
+# ==============================================================================
+def list_partitions(table):
+    """Elenco (lega, stagione) presenti nell'archivio."""
+    return sorted({_partition_of(p) for p in _part_files(table)})
+
+
+def read_table(table, leagues=None, seasons=None, columns=None):
+    """
+    Legge la tabella dall'archivio, solo le partizioni richieste
+    (leagues/seasons = liste di valori, None = tutte), nell'ordine di arrivo.
+    """
+    seasons = None if seasons is None else {str(s) for s in seasons}
+    leagues = None if leagues is None else {str(l).replace('/', '_') for l in leagues}
+
+    files = []
+    for path in _part_files(table):
+        league, season = _partition_of(path)
+        if (leagues is None or league in leagues) and (seasons is None or season in seasons):
+            files.append(path)
+
+    if not files:
+        raise FileNotFoundError(f"Nessuna partizione per '{table}' in {RAW_DIR}/")
+
+    read_cols = None if columns is None else list(columns) + ['_row']
+    df = pd.concat([pd.read_parquet(p, columns=read_cols) for p in files], ignore_index=True)
+    df = df.sort_values('_row', kind='stable').reset_index(drop=True)
+    return df.drop(columns=[c for c in INTERNAL_COLUMNS if c in df.columns])
+
+
+def load_raw(table, leagues=None, seasons=None, columns=None):
+    """
+    Dati grezzi per gli script: dall'archivio partizionato se esiste,
+    altrimenti dal vecchio Master File CSV.
+    """
+    if has_table(table):
+        return read_table(table, leagues, seasons, columns)
+
+    df = pd.read_csv(TABLES[table][0], usecols=columns)
+    if leagues is not None:
+        df = df[df['league'].isin(leagues)]
+    if seasons is not None:
+        df = df[df['season'].astype(str).isin({str(s) for s in seasons})]
+    return df
+
+
+def iter_raw(table, columns, chunksize=500_000, dtype=None):
+    """
+    Come load_raw ma a blocchi di al massimo `chunksize` righe, per chi
+    aggrega senza tenere in memoria tutta la tabella: dall'archivio un file
+    Parquet alla volta (a lotti), altrimenti il Master File CSV a pezzi con
+    solo le colonne `columns` (e i tipi `dtype`, es. 'category', per il CSV).
+    L'ordine di arrivo fra i blocchi NON è garantito: va bene per somme e conteggi.
+    """
+    if has_table(table):
+        for path in _part_files(table):
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=list(columns)):
+                yield batch.to_pandas()
+        return
+
+    yield from pd.read_csv(TABLES[table][0], usecols=columns, dtype=dtype, chunksize=chunksize)
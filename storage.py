@@ -0,0 +1,93 @@
+import os
+import pandas as pd
+import pyarrow.parquet as pq
+
+# ==============================================================================
+# SALVATAGGIO DATASET INTERMEDI (Parquet tipizzato invece di CSV)
+# ==============================================================================
+# Gli script si passano i dataset intermedi tramite file:
+#   dataset_completo_xgboost_3 (+ calendar_3) -> dataset_match_3 (match_table.py)
+#   -> dataset_con_quote_FIXED_3 -> dataset_train_final_3
+# (vecchia catena per squadra: dataset_xgboost_ready_3 -> dataset_ultimate_3)
+# Con il CSV ogni script deve rileggere tutto, ri-convertire le date e
+# ri-indovinare i tipi. Qui li salviamo in Parquet compresso con uno schema
+# esplicito (date come datetime, squadre come categorie, feature in float32),
+# e ogni script può caricare solo le colonne che gli servono.
+#
+# Formato scelto con la variabile d'ambiente SERIE_A_FORMAT:
+#   parquet (default) -> data/<nome>.parquet
+#   csv               -> data/<nome>.csv (come prima)
+
+DATA_DIR = 'data'
+ARTIFACT_FORMAT = os.environ.get('SERIE_A_FORMAT', 'parquet').lower()
+COMPRESSION = 'zstd'
+
+# --- SCHEMA ---
+DATE_COLUMNS = ['date']
+CATEGORY_COLUMNS = ['game', 'team', 'opponent', 'Home_Team', 'Away_Team', 'result']
+INT_COLUMNS = {'is_home': 'int8', 'matchweek': 'int16', 'Target': 'int8',
+               'game_id': 'int64', 'team_id': 'int32', 'Home_Team_ID': 'int32', 'Away_Team_ID': 'int32',
+               'Season_Year': 'int16', 'Is_Midweek': 'int8',
+               **{f'{side}Games_{w}d': 'int8' for side in ['', 'Home_', 'Away_'] for w in [7, 14, 21]}}
+
+
+def artifact_path(name, fmt=None):
+    return os.path.join(DATA_DIR, f"{name}.{fmt or ARTIFACT_FORMAT}")
+
+
+def apply_schema(df):
+    """Converte le colonne nei tipi dello schema (date, categorie, interi piccoli, float32)."""
+    df = df.copy()
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col])
+        elif col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype('category')
+        elif col in INT_COLUMNS and df[col].notna().all():
+            df[col] = df[col].astype(INT_COLUMNS[col])
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype('float32')
+    return df
+
+
+def save_artifact(df, name, export_csv=False):
+    """
+    Salva il dataset intermedio `name` nel formato scelto.
+    export_csv=True scrive ANCHE il CSV (es. per il notebook di training).
+    """
+    df = apply_schema(df)
+
+    if ARTIFACT_FORMAT == 'parquet':
+        path = artifact_path(name, 'parquet')
+        # Scrittura atomica: se lo script si interrompe, il file vecchio resta integro
+        tmp_path = path + '.tmp'
+        df.to_parquet(tmp_path, index=False, compression=COMPRESSION)
+        os.replace(tmp_path, path)
+
+    if ARTIFACT_FORMAT == 'csv' or export_csv:
+        df.to_csv(artifact_path(name, 'csv'), index=False)
+
+    return df
+
+
+def load_artifact(name, columns=None):
+    """
+    Carica il dataset intermedio `name` (solo `columns`, se indicato).
+    Se il Parquet non c'è ancora usa il vecchio CSV, già convertito nello schema.
+    Solleva FileNotFoundError se non esiste in nessun formato.
+    """
+    parquet_path = artifact_path(name, 'parquet')
+    csv_path = artifact_path(name, 'csv')
+
+    if ARTIFACT_FORMAT == 'parquet' and os.path.exists(parquet_path):
+        if columns is not None:
+            # Ignoriamo le colonne richieste che il file non ha (come facevano gli script)
+            available = pq.read_schema(parquet_path).names
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(parquet_path, columns=columns)
+
+    if os.path.exists(csv_path):
+        usecols = None if columns is None else (lambda c: c in columns)
+        return apply_schema(pd.read_csv(csv_path, usecols=usecols))
+
+    raise FileNotFoundError(f"Dataset '{name}' non trovato in {DATA_DIR}/")
@@ -0,0 +1,393 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# REGISTRO SQUADRE: UN team_id INTERO PER SQUADRA, UN game_id PER PARTITA
+# ==============================================================================
+# Ogni fonte scrive le squadre a modo suo: FBref ("Internazionale", "Hellas
+# Verona"), MatchHistory ("Inter", "Verona"), Transfermarkt ("FC Internazionale
+# Milano"), fantacalcio.it ("INTER"). Prima c'erano tre normalizzazioni diverse
+# (standardize_names in merge_odds.py, clean_name in debug_odds_merge.py, e il
+# test "il nome è contenuto nel nome della squadra di casa" per is_home).
+#
+# Qui c'è UNA chiave squadra (team_key: minuscolo, spazi normalizzati, alias
+# risolti) e un registro persistente chiave -> team_id intero, stabile tra le
+# esecuzioni (le squadre nuove prendono il primo id libero, quelle note non
+# cambiano mai). Le fasi fanno join e groupby su questi interi invece che
+# su stringhe lunghe.
+#
+# data/team_registry.csv ha una riga per grafia vista:
+#   name     -> nome come appare nella fonte
+#   team_key -> chiave normalizzata
+#   team_id  -> id intero della squadra (uguale per tutte le grafie della stessa squadra)
+#
+# game_id: data + squadra di casa + squadra ospite impacchettati in un int64,
+# quindi è lo stesso per la stessa partita in qualunque fonte (calendario FBref,
+# file quote), senza bisogno di salvarlo.
+
+REGISTRY_PATH = 'data/team_registry.csv'
+REGISTRY_COLUMNS = ['name', 'team_key', 'team_id']
+# game_id = giorno << 32 | casa << 16 | ospite: team_id deve stare in 16 bit
+MAX_TEAMS = 1 << 16
+
+# Grafie delle varie fonti -> chiave comune. Copre i campionati che la
+# pipeline e i benchmark usano (Serie A, Premier League, Liga, Bundesliga,
+# Ligue 1) nelle grafie di FBref, MatchHistory (football-data), Transfermarkt
+# e fantacalcio.it. I nomi già uguali tra le fonti (es. "Monza", "Lens") non
+# servono: la chiave è già il nome in minuscolo.
+TEAM_ALIASES = {
+    # --- Serie A ---
+    'inter': 'inter', 'internazionale': 'inter', 'fc internazionale': 'inter', 'inter milan': 'inter',
+    'fc internazionale milano': 'inter',
+    'milan': 'milan', 'ac milan': 'milan',
+    'juventus': 'juventus', 'juve': 'juventus', 'juventus fc': 'juventus',
+    'roma': 'roma', 'as roma': 'roma',
+    'napoli': 'napoli', 'ssc napoli': 'napoli',
+    'lazio': 'lazio', 'ss lazio': 'lazio',
+    'verona': 'verona', 'hellas verona': 'verona', 'hellas verona fc': 'verona',
+    'fiorentina': 'fiorentina', 'acf fiorentina': 'fiorentina',
+    'atalanta': 'atalanta', 'atalanta bc': 'atalanta',
+    'bologna': 'bologna', 'bologna fc 1909': 'bologna',
+    'torino': 'torino', 'torino fc': 'torino',
+    'udinese': 'udinese', 'udinese calcio': 'udinese',
+    'sassuolo': 'sassuolo', 'us sassuolo': 'sassuolo',
+    'genoa': 'genoa', 'genoa cfc': 'genoa',
+    'sampdoria': 'sampdoria', 'uc sampdoria': 'sampdoria',
+    'cagliari': 'cagliari', 'cagliari calcio': 'cagliari',
+    'lecce': 'lecce', 'us lecce': 'lecce',
+    'monza': 'monza', 'ac monza': 'monza',
+    'salernitana': 'salernitana', 'us salernitana 1919': 'salernitana',
+    'parma': 'parma', 'parma calcio 1913': 'parma',
+    'como': 'como', 'como 1907': 'como',
+    'empoli': 'empoli', 'fc empoli': 'empoli',
+    'cremonese': 'cremonese', 'us cremonese': 'cremonese',
+    'spezia': 'spezia', 'spezia calcio': 'spezia',
+    'venezia': 'venezia', 'venezia fc': 'venezia',
+    'frosinone': 'frosinone', 'frosinone calcio': 'frosinone',
+    'crotone': 'crotone', 'fc crotone': 'crotone',
+    'benevento': 'benevento', 'benevento calcio': 'benevento',
+    'spal': 'spal', 'spal 2013': 'spal',
+    'brescia': 'brescia', 'brescia calcio': 'brescia',
+    'chievo': 'chievo', 'chievo verona': 'chievo', 'ac chievo verona': 'chievo',
+    'pisa': 'pisa', 'pisa sc': 'pisa',
+    # --- Premier League ---
+    'manchester city': 'man city', 'man city': 'man city',
+    'manchester united': 'man utd', 'man utd': 'man utd', 'man united': 'man utd', 'manchester utd': 'man utd',
+    "nott'm forest": 'nottingham forest', "nott'ham forest": 'nottingham forest',
+    'nottingham forest': 'nottingham forest', 'nottingham': 'nottingham forest',
+    'wolves': 'wolves', 'wolverhampton': 'wolves', 'wolverhampton wanderers': 'wolves',
+    'newcastle': 'newcastle', 'newcastle utd': 'newcastle', 'newcastle united': 'newcastle',
+    'tottenham': 'tottenham', 'tottenham hotspur': 'tottenham', 'spurs': 'tottenham',
+    'west ham': 'west ham', 'west ham united': 'west ham',
+    'brighton': 'brighton', 'brighton & hove albion': 'brighton', 'brighton and hove albion': 'brighton',
+    'leicester': 'leicester', 'leicester city': 'leicester',
+    'leeds': 'leeds', 'leeds united': 'leeds',
+    'norwich': 'norwich', 'norwich city': 'norwich',
+    'west brom': 'west brom', 'west bromwich albion': 'west brom',
+    'sheffield united': 'sheffield utd', 'sheffield utd': 'sheffield utd',
+    'luton': 'luton', 'luton town': 'luton',
+    'ipswich': 'ipswich', 'ipswich town': 'ipswich',
+    'bournemouth': 'bournemouth', 'afc bournemouth': 'bournemouth',
+    'arsenal': 'arsenal', 'arsenal fc': 'arsenal',
+    'chelsea': 'chelsea', 'chelsea fc': 'chelsea',
+    'liverpool': 'liverpool', 'liverpool fc': 'liverpool',
+    'everton': 'everton', 'everton fc': 'everton',
+    'brentford': 'brentford', 'brentford fc': 'brentford',
+    'fulham': 'fulham', 'fulham fc': 'fulham',
+    'burnley': 'burnley', 'burnley fc': 'burnley',
+    # --- Liga ---
+    'ath madrid': 'atletico madrid', 'atlético madrid': 'atletico madrid', 'atletico madrid': 'atletico madrid',
+    'atlético de madrid': 'atletico madrid', 'atletico de madrid': 'atletico madrid',
+    'ath bilbao': 'athletic club', 'athletic club': 'athletic club', 'athletic bilbao': 'athletic club',
+    'betis': 'betis', 'real betis': 'betis', 'real betis balompié': 'betis',
+    'celta': 'celta vigo', 'celta vigo': 'celta vigo', 'celta de vigo': 'celta vigo',
+    'sociedad': 'real sociedad', 'real sociedad': 'real sociedad',
+    'espanol': 'espanyol', 'espanyol': 'espanyol', 'rcd espanyol barcelona': 'espanyol',
+    'vallecano': 'rayo vallecano', 'rayo vallecano': 'rayo vallecano',
+    'alaves': 'alaves', 'alavés': 'alaves', 'deportivo alavés': 'alaves',
+    'cadiz': 'cadiz', 'cádiz': 'cadiz', 'cádiz cf': 'cadiz',
+    'almeria': 'almeria', 'almería': 'almeria', 'ud almería': 'almeria',
+    'leganes': 'leganes', 'leganés': 'leganes', 'cd leganés': 'leganes',
+    'valladolid': 'valladolid', 'real valladolid': 'valladolid',
+    'barcelona': 'barcelona', 'fc barcelona': 'barcelona',
+    'real madrid': 'real madrid', 'real madrid cf': 'real madrid',
+    'sevilla': 'sevilla', 'sevilla fc': 'sevilla',
+    'valencia': 'valencia', 'valencia cf': 'valencia',
+    'villarreal': 'villarreal', 'villarreal cf': 'villarreal',
+    'getafe': 'getafe', 'getafe cf': 'getafe',
+    'osasuna': 'osasuna', 'ca osasuna': 'osasuna',
+    'girona': 'girona', 'girona fc': 'girona',
+    'levante': 'levante', 'levante ud': 'levante',
+    'mallorca': 'mallorca', 'rcd mallorca': 'mallorca',
+    'las palmas': 'las palmas', 'ud las palmas': 'las palmas',
+    # --- Bundesliga ---
+    'leverkusen': 'leverkusen', 'bayer leverkusen': 'leverkusen', 'bayer 04 leverkusen': 'leverkusen',
+    'bayern munich': 'bayern munich', 'bayern münchen': 'bayern munich', 'fc bayern münchen': 'bayern munich',
+    'dortmund': 'dortmund', 'borussia dortmund': 'dortmund',
+    "m'gladbach": 'gladbach', 'gladbach': 'gladbach', 'mönchengladbach': 'gladbach',
+    'borussia mönchengladbach': 'gladbach', 'borussia monchengladbach': 'gladbach',
+    'ein frankfurt': 'eintracht frankfurt', 'eint frankfurt': 'eintracht frankfurt',
+    'eintracht frankfurt': 'eintracht frankfurt',
+    'fc koln': 'koln', 'köln': 'koln', '1. fc köln': 'koln', 'koln': 'koln',
+    'mainz': 'mainz', 'mainz 05': 'mainz', '1.fsv mainz 05': 'mainz', '1. fsv mainz 05': 'mainz',
+    'hertha': 'hertha', 'hertha bsc': 'hertha', 'hertha berlin': 'hertha',
+    'union berlin': 'union berlin', '1.fc union berlin': 'union berlin', '1. fc union berlin': 'union berlin',
+    'rb leipzig': 'rb leipzig', 'leipzig': 'rb leipzig',
+    'hoffenheim': 'hoffenheim', 'tsg 1899 hoffenheim': 'hoffenheim', 'tsg hoffenheim': 'hoffenheim',
+    'stuttgart': 'stuttgart', 'vfb stuttgart': 'stuttgart',
+    'werder bremen': 'werder bremen', 'sv werder bremen': 'werder bremen', 'bremen': 'werder bremen',
+    'wolfsburg': 'wolfsburg', 'vfl wolfsburg': 'wolfsburg',
+    'freiburg': 'freiburg', 'sc freiburg': 'freiburg',
+    'augsburg': 'augsburg', 'fc augsburg': 'augsburg',
+    'bochum': 'bochum', 'vfl bochum': 'bochum',
+    'schalke 04': 'schalke', 'schalke': 'schalke', 'fc schalke 04': 'schalke',
+    'greuther furth': 'greuther furth', 'greuther fürth': 'greuther furth',
+    'st pauli': 'st pauli', 'st. pauli': 'st pauli', 'fc st. pauli': 'st pauli',
+    'bielefeld': 'arminia', 'arminia': 'arminia', 'arminia bielefeld': 'arminia',
+    'darmstadt': 'darmstadt', 'darmstadt 98': 'darmstadt', 'sv darmstadt 98': 'darmstadt',
+    'paderborn': 'paderborn', 'paderborn 07': 'paderborn', 'sc paderborn 07': 'paderborn',
+    'düsseldorf': 'dusseldorf', 'dusseldorf': 'dusseldorf', 'fortuna dusseldorf': 'dusseldorf',
+    'fortuna düsseldorf': 'dusseldorf',
+    # --- Ligue 1 ---
+    'paris sg': 'psg', 'paris s-g': 'psg', 'psg': 'psg', 'paris saint-germain': 'psg',
+    'st etienne': 'saint-etienne', 'saint-étienne': 'saint-etienne', 'saint-etienne': 'saint-etienne',
+    'as saint-étienne': 'saint-etienne',
+    'marseille': 'marseille', 'olympique marseille': 'marseille', 'olympique de marseille': 'marseille',
+    'lyon': 'lyon', 'olympique lyon': 'lyon', 'olympique lyonnais': 'lyon',
+    'monaco': 'monaco', 'as monaco': 'monaco',
+    'lille': 'lille', 'losc lille': 'lille',
+    'rennes': 'rennes', 'stade rennais': 'rennes', 'stade rennais fc': 'rennes',
+    'nice': 'nice', 'ogc nice': 'nice',
+    'brest': 'brest', 'stade brestois 29': 'brest',
+    'clermont': 'clermont foot', 'clermont foot': 'clermont foot',
+    'nimes': 'nimes', 'nîmes': 'nimes',
+}
+
+# Coppie (FBref, football-data) della stessa squadra: check_aliases() verifica
+# che abbiano la stessa chiave. Quando si aggiunge un campionato o una squadra
+# con grafie diverse tra le fonti, la coppia va aggiunta qui.
+SOURCE_PAIRS = [
+    # Serie A
+    ('Internazionale', 'Inter'), ('Hellas Verona', 'Verona'), ('Milan', 'Milan'),
+    # Premier League
+    ('Manchester City', 'Man City'), ('Manchester Utd', 'Man United'), ("Nott'ham Forest", "Nott'm Forest"),
+    ('Wolves', 'Wolves'), ('Newcastle Utd', 'Newcastle'), ('Tottenham', 'Tottenham'), ('West Ham', 'West Ham'),
+    ('Brighton', 'Brighton'), ('Leicester City', 'Leicester'), ('Leeds United', 'Leeds'),
+    ('Norwich City', 'Norwich'), ('West Brom', 'West Brom'), ('Sheffield Utd', 'Sheffield United'),
+    ('Luton Town', 'Luton'), ('Ipswich Town', 'Ipswich'),
+    # Liga
+    ('Atlético Madrid', 'Ath Madrid'), ('Athletic Club', 'Ath Bilbao'), ('Betis', 'Betis'),
+    ('Celta Vigo', 'Celta'), ('Real Sociedad', 'Sociedad'), ('Espanyol', 'Espanol'),
+    ('Rayo Vallecano', 'Vallecano'), ('Alavés', 'Alaves'), ('Cádiz', 'Cadiz'), ('Almería', 'Almeria'),
+    ('Leganés', 'Leganes'), ('Valladolid', 'Valladolid'),
+    # Bundesliga
+    ('Leverkusen', 'Leverkusen'), ('Bayern Munich', 'Bayern Munich'), ('Gladbach', "M'gladbach"),
+    ('Eint Frankfurt', 'Ein Frankfurt'), ('Köln', 'FC Koln'), ('Mainz 05', 'Mainz'), ('Hertha BSC', 'Hertha'),
+    ('Greuther Fürth', 'Greuther Furth'), ('St. Pauli', 'St Pauli'), ('Arminia', 'Bielefeld'),
+    ('Darmstadt 98', 'Darmstadt'), ('Paderborn 07', 'Paderborn'), ('Düsseldorf', 'Fortuna Dusseldorf'),
+    ('Schalke 04', 'Schalke 04'), ('Werder Bremen', 'Werder Bremen'),
+    # Ligue 1
+    ('Paris S-G', 'Paris SG'), ('Saint-Étienne', 'St Etienne'), ('Clermont Foot', 'Clermont'), ('Nîmes', 'Nimes'),
+]
+
+
+def check_aliases(pairs=SOURCE_PAIRS):
+    """Coppie di grafie della stessa squadra che finirebbero su chiavi diverse."""
+    return [(a, b, team_key(a), team_key(b)) for a, b in pairs if team_key(a) != team_key(b)]
+
+
+def team_key(name):
+    """Chiave squadra: minuscolo, spazi normalizzati, alias risolti ("" se manca)."""
+    if pd.isna(name): return ""
+    name = ' '.join(str(name).lower().split())
+    return TEAM_ALIASES.get(name, name)
+
+
+def factorize_names(names):
+    """
+    pd.factorize di una colonna di nomi (-1 = mancante). Le stringhe Arrow
+    passano da un array object: il factorize di pyarrow qui è ~6x più lento.
+    """
+    names = pd.Series(names)
+    if not isinstance(names.dtype, pd.CategoricalDtype):
+        names = names.to_numpy(dtype=object)
+    return pd.factorize(names)
+
+
+def team_keys(names):
+    """team_key su una colonna intera: calcolato una volta per nome distinto."""
+    codes, uniques = factorize_names(names)
+    # Il codice -1 (valore mancante) prende l'ultimo elemento: ""
+    keys = np.array([team_key(u) for u in uniques] + [""], dtype=object)
+    return keys[codes]
+
+
+class TeamRegistry:
+    """
+    Grafie squadra -> team_id intero (stabile, -1 = squadra mancante).
+    path=None: registro solo in memoria (save() non scrive nulla).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.key_ids = {}    # team_key -> team_id
+        self.name_ids = {}   # grafia -> team_id
+        self.names = []      # team_id -> prima grafia vista (per stampare)
+        self.changed = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _id(self, name, create):
+        name = str(name)
+        team_id = self.name_ids.get(name)
+        if team_id is not None:
+            return team_id
+        key = team_key(name)
+        if not key:
+            return -1
+        team_id = self.key_ids.get(key)
+        if team_id is None:
+            if not create:
+                return -1
+            if len(self.names) >= MAX_TEAMS:
+                raise ValueError(f"Registro squadre pieno ({MAX_TEAMS} squadre)")
+            team_id = len(self.names)
+            self.key_ids[key] = team_id
+            self.names.append(name)
+        # Anche senza create una grafia nuova di una squadra nota si ricorda
+        self.name_ids[name] = team_id
+        self.changed = True
+        return team_id
+
+    def ids(self, names, create=True):
+        """
+        Colonna di nomi -> array int32 di team_id (una sola risoluzione per nome
+        distinto). Nomi mancanti -> -1; squadre sconosciute -> nuovo id se
+        create=True, altrimenti -1.
+        """
+        codes, uniques = factorize_names(names)
+        with self._lock:
+            lookup = np.array([self._id(u, create) for u in uniques] + [-1], dtype=np.int32)
+        return lookup[codes]
+
+    def name(self, team_id):
+        return self.names[team_id] if 0 <= team_id < len(self.names) else None
+
+    def save(self):
+        """Salva (in modo atomico) solo se ci sono grafie nuove."""
+        if not self.changed or self.path is None:
+            return
+        with self._lock:
+            df = pd.DataFrame({'name': list(self.name_ids),
+                               'team_key': [team_key(n) for n in self.name_ids],
+                               'team_id': list(self.name_ids.values())}, columns=REGISTRY_COLUMNS)
+            df = df.sort_values(['team_id', 'name'])
+            tmp_path = self.path + '.tmp'
+            df.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
+            self.changed = False
+        with _LOADED_LOCK:
+            if _LOADED.get(self.path, (None,))[0] is self:
+                _LOADED[self.path] = (self, os.path.getmtime(self.path))
+
+    @classmethod
+    def load(cls, path=REGISTRY_PATH):
+        registry = cls(path)
+        if not os.path.exists(path):
+            return registry
+        df = pd.read_csv(path, dtype={'name': str, 'team_key': str}, keep_default_na=False)
+        # La grafia di ogni squadra da stampare è la prima salvata (ordine per team_id, nome);
+        # gli id uniti ad altri restano buchi (segnaposto unico), così gli altri id non si spostano
+        first = df.drop_duplicates('team_id')
+        registry.names = [f'<team_id {i}>' for i in range(int(df['team_id'].max()) + 1 if len(df) else 0)]
+        for name, team_id in zip(first['name'], first['team_id'].astype(int)):
+            registry.names[team_id] = name
+
+        # La colonna team_key salvata può essere vecchia: con gli alias ATTUALI
+        # due id diversi possono avere la stessa chiave (alias aggiunto dopo).
+        # Li uniamo nell'id più basso; gli id non coinvolti non cambiano.
+        names = df['name'].tolist()
+        keys = [team_key(n) for n in names]
+        ids = df['team_id'].astype(int).tolist()
+        root = {i: i for i in ids}
+
+        def find(i):
+            while root[i] != i:
+                root[i] = root[root[i]]
+                i = root[i]
+            return i
+
+        first_id = {}
+        for key, team_id in zip(keys, ids):
+            if not key:
+                continue
+            other = first_id.setdefault(key, team_id)
+            a, b = find(other), find(team_id)
+            if a != b:
+                root[max(a, b)] = min(a, b)
+        merged = [find(i) for i in ids]
+
+        registry.name_ids = dict(zip(names, merged))
+        registry.key_ids = {k: i for k, i in zip(keys, merged) if k}
+        if merged != ids:
+            joined = sorted({(i, m) for i, m in zip(ids, merged) if i != m})
+            print(f"🔗 Registro squadre: unisco {len(joined)} team_id con la stessa chiave ({joined[:5]})")
+            registry.changed = True
+            registry.save()
+        return registry
+
+
+_LOADED = {}
+_LOADED_LOCK = threading.Lock()
+
+
+def load_registry(path=REGISTRY_PATH):
+    """
+    Il registro salvato (vuoto se non esiste ancora). Nello stesso processo
+    tutte le fasi ricevono la STESSA istanza, così due fasi in parallelo
+    (pipeline.py) non assegnano id diversi alla stessa squadra nuova.
+    Si rilegge dal disco solo se il file è stato cambiato da un altro processo.
+    """
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with _LOADED_LOCK:
+        cached = _LOADED.get(path)
+        if cached is not None and (cached[1] == mtime or cached[0].changed):
+            return cached[0]
+        registry = TeamRegistry.load(path)
+        _LOADED[path] = (registry, mtime)
+        return registry
+
+
+def game_ids(dates, home_ids, away_ids):
+    """
+    (data, team_id casa, team_id ospite) -> game_id int64, uguale in tutte le
+    fonti per la stessa partita. -1 se manca la data o una delle due squadre.
+    """
+    days = pd.to_datetime(pd.Series(dates)).dt.normalize().to_numpy('datetime64[D]')
+    valid = ~np.isnat(days)
+    home = np.asarray(home_ids, dtype=np.int64)
+    away = np.asarray(away_ids, dtype=np.int64)
+    valid &= (home >= 0) & (away >= 0)
+    out = (days.astype(np.int64) << 32) | (home << 16) | away
+    return np.where(valid, out, -1)
+
+
+def split_game_ids(ids):
+    """game_id -> (data, team_id casa, team_id ospite)."""
+    ids = np.asarray(ids, dtype=np.int64)
+    days = (ids >> 32).astype('datetime64[D]')
+    return days, ((ids >> 16) & 0xFFFF).astype(np.int32), (ids & 0xFFFF).astype(np.int32)
+
+
+if __name__ == '__main__':
+    # python team_registry.py: controlla che le grafie FBref / football-data note abbiano la stessa chiave
+    bad = check_aliases()
+    for a, b, ka, kb in bad:
+        print(f"❌ '{a}' -> '{ka}' ma '{b}' -> '{kb}'")
+    if bad:
+        raise SystemExit(1)
+    print(f"✅ {len(SOURCE_PAIRS)} coppie di grafie con la stessa chiave")
@@ -0,0 +1,108 @@
+import os
+import json
+import pandas as pd
+
+# ==============================================================================
+# FOTOGRAFIA DELLO STATO DELLE SQUADRE (per le previsioni live)
+# ==============================================================================
+# predict_tonight.py / auto_predict_live.py cercavano l'ultima partita di ogni
+# squadra scorrendo tutto lo storico (maschera Home_Team | Away_Team) e
+# ricalcolavano il valore tipico con concat + groupby ad ogni avvio.
+# La pipeline di training ora salva, una volta, un piccolo JSON:
+#   squadra -> ultimo valore, lineup ratio, forma attacco/difesa,
+#              valore tipico (mediana storica) e data dell'ultima partita
+# che gli script caricano in millisecondi e interrogano in O(1).
+
+TEAM_STATE_PATH = 'data/team_state.json'
+STATE_FIELDS = ['Value', 'Lineup_Ratio', 'Attack_Form', 'Defense_Form']
+
+
+def build_team_state(df_history):
+    """Dal dataset finale (una riga per partita, Home_/Away_) allo stato per squadra."""
+    # Una riga per squadra e partita, con i campi dal punto di vista della squadra
+    sides = []
+    for side in ['Home', 'Away']:
+        cols = {f'{side}_Team': 'Team', **{f'{side}_{f}': f for f in STATE_FIELDS}}
+        sides.append(df_history[['date'] + list(cols)].rename(columns=cols))
+    long = pd.concat(sides, ignore_index=True)
+    long['Team'] = long['Team'].astype(str)
+
+    # Valore tipico: mediana di tutti i valori storici della squadra
+    typical = long.groupby('Team')['Value'].median()
+
+    # Ultima partita di ogni squadra (a parità di data vale l'ordine del file)
+    latest = long.sort_values('date', kind='stable').drop_duplicates('Team', keep='last').set_index('Team')
+
+    state = {}
+    for team, row in latest.iterrows():
+        entry = {f: float(row[f]) for f in STATE_FIELDS}
+        entry['Typical_Value'] = float(typical[team])
+        entry['Last_Date'] = str(pd.Timestamp(row['date']).date())
+        state[team] = entry
+    return state
+
+
+def save_team_state(df_history, path=TEAM_STATE_PATH):
+    """Costruisce e salva (in modo atomico) la fotografia delle squadre."""
+    state = build_team_state(df_history)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    return state
+
+
+def load_team_state(path=TEAM_STATE_PATH):
+    """dict squadra -> stato. Solleva FileNotFoundError se la pipeline non l'ha ancora creato."""
+    with open(path) as f:
+        return json.load(f)
+
+
+# ==============================================================================
+# FEATURE DEL MODELLO PER UNA LISTA DI PARTITE (vettoriale)
+# ==============================================================================
+# Stesso ordine delle colonne usate nel notebook di training
+MODEL_FEATURES = [
+    'Value_Ratio_vs_Opponent', 'Home_Value', 'Away_Value',
+    'Home_Lineup_Ratio', 'Away_Lineup_Ratio',
+    'Home_Attack_Form', 'Home_Defense_Form', 'Away_Attack_Form', 'Away_Defense_Form',
+    'Home_Attack_vs_Def', 'Away_Attack_vs_Def',
+]
+
+
+def fixture_features(home_teams, away_teams, team_state, form_engine=None):
+    """
+    Matrice delle feature (una riga per partita, colonne MODEL_FEATURES) per le
+    coppie casa/ospite indicate. Con form_engine la forma è quella aggiornata
+    all'ultima partita giocata. Le squadre sconosciute danno righe NaN.
+    """
+    table = pd.DataFrame.from_dict(team_state, orient='index')[STATE_FIELDS]
+
+    if form_engine is not None:
+        # Una sola chiamata per squadra distinta, non per partita
+        teams = pd.unique(pd.concat([pd.Series(home_teams), pd.Series(away_teams)]).astype(str))
+        live = {t: form_engine.relative_form(t) for t in teams}
+        live = {t: f for t, f in live.items() if f is not None and t in table.index}
+        if live:
+            live_df = pd.DataFrame.from_dict(live, orient='index')
+            table.loc[live_df.index, 'Attack_Form'] = live_df['xG']
+            table.loc[live_df.index, 'Defense_Form'] = live_df['xGA']
+
+    home = table.reindex(pd.Series(home_teams).astype(str).to_numpy()).reset_index(drop=True)
+    away = table.reindex(pd.Series(away_teams).astype(str).to_numpy()).reset_index(drop=True)
+
+    features = pd.DataFrame({
+        # Aggiungiamo 1 per evitare divisioni per zero (come nel training)
+        'Value_Ratio_vs_Opponent': home['Value'] / (away['Value'] + 1),
+        'Home_Value': home['Value'],
+        'Away_Value': away['Value'],
+        'Home_Lineup_Ratio': home['Lineup_Ratio'],
+        'Away_Lineup_Ratio': away['Lineup_Ratio'],
+        'Home_Attack_Form': home['Attack_Form'],
+        'Home_Defense_Form': home['Defense_Form'],
+        'Away_Attack_Form': away['Attack_Form'],
+        'Away_Defense_Form': away['Defense_Form'],
+        'Home_Attack_vs_Def': home['Attack_Form'] - away['Defense_Form'],
+        'Away_Attack_vs_Def': away['Attack_Form'] - home['Defense_Form'],
+    })
+    return features[MODEL_FEATURES]
@@ -1,11 +1,21 @@
+import os
+import sys
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from thefuzz import process
-import joblib
 import warnings
 import datetime
 
+# I moduli condivisi (fuzzy_matcher, ...) stanno nella cartella principale
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fuzzy_matcher import NameMatcher
+from valuation_index import load_valuation_index
+from storage import load_artifact
+from team_state import load_team_state, save_team_state
+from raw_store import load_raw
+from form_engine import update_form_state
+from model_artifact import load_model, default_model_path
+from lineup_source import load_lineup_index
+from instrument import stage, timed, record_metric, record_rows, share
+
 warnings.filterwarnings('ignore')
 
 print("--- 🤖 PREDIZIONE LIVE INTERATTIVA ---")
@@ -18,69 +28,47 @@ MATCHES_TONIGHT = [
 
 FILE_PLAYERS = 'data/players.csv'
 FILE_VALUATIONS = 'data/player_valuations.csv'
-FILE_HISTORY = 'data/dataset_train_final_3.csv'
-MODEL_PATH = 'train/modello_serie_a.pkl' # O 'train/modello_serie_a.pkl'
+HISTORY_ARTIFACT = 'dataset_train_final_3'
+MODEL_PATH = default_model_path() # modello_serie_a.ubj se esportato, altrimenti modello_serie_a.pkl
 
 # ==============================================================================
-# 1. FUNZIONI DI SCRAPING (Con gestione errore migliorata)
+# 1. FORMAZIONI PROBABILI (pagina scaricata e analizzata una volta, vedi lineup_source.py)
 # ==============================================================================
-def get_probable_lineups(home_team, away_team):
-    url = "https://www.fantacalcio.it/probabili-formazioni-serie-a"
-    print(f"🌍 Cerco formazioni su Fantacalcio.it...")
-    
+def get_probable_lineups(home_team, away_team, lineup_index):
     found_players = {home_team: [], away_team: []}
-    
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Logica di ricerca generica per trovare i team
-        match_divs = soup.find_all('div', class_='match-preview')
-        
-        for div in match_divs:
-            text = div.get_text().lower()
-            if home_team.lower() in text and away_team.lower() in text:
-                print(f"   ✅ Partita trovata nel sito!")
-                # Tenta di estrarre i nomi dai link giocatori
-                player_links = div.find_all('a', class_='player-name')
-                names = [p.get_text().strip() for p in player_links]
-                
-                if len(names) >= 22:
-                    found_players[home_team] = names[:11]
-                    found_players[away_team] = names[11:22]
-                    return found_players
-                break
-    except Exception:
-        pass # Se fallisce, restituisce liste vuote e gestiamo dopo
-        
+    lineups = lineup_index.get(home_team, away_team)
+    if lineups is not None:
+        print(f"   ✅ Partita trovata nel sito!")
+        found_players[home_team] = lineups['home']
+        found_players[away_team] = lineups['away']
     return found_players
 
 # ==============================================================================
 # 2. CALCOLO VALORE (Con Fuzzy Matching)
 # ==============================================================================
-def calculate_lineup_value(player_names, df_vals, df_players):
-    total_value = 0
-    mapped_count = 0
-    
-    # Valutazioni più recenti
-    latest_date = df_vals['date'].max()
-    df_recent_vals = df_vals[df_vals['date'] == latest_date]
-    kaggle_names = df_players['name'].unique()
+@timed('lineup_value')
+def calculate_lineup_value(player_names, val_index, df_players, matcher=None):
+    # Valutazioni più recenti: per ogni giocatore l'ultima valutazione fino a oggi
+    # (non solo chi ha una valutazione esattamente nell'ultima data del file)
+    today = pd.Timestamp(datetime.date.today())
+    if matcher is None:
+        matcher = NameMatcher(df_players['name'].unique())
+    name_to_id = df_players.drop_duplicates('name').set_index('name')['player_id']
     
     print(f"   ...Calcolo valore su {len(player_names)} giocatori...")
     
-    for p_name in player_names:
-        # Fuzzy Match per trovare il nome nel database Kaggle
-        match, score = process.extractOne(p_name, kaggle_names)
-        
-        if score > 80:
-            p_id = df_players[df_players['name'] == match]['player_id'].values[0]
-            val_row = df_recent_vals[df_recent_vals['player_id'] == p_id]
-            if not val_row.empty:
-                val = val_row['market_value_in_eur'].values[0]
-                total_value += val
-                mapped_count += 1
+    # Fuzzy Match per trovare i nomi nel database Kaggle (tutti insieme, soglia > 80)
+    # exhaustive=True: con 11 nomi il ricontrollo completo costa poco
+    matches = matcher.match(player_names, min_score=81, exhaustive=True)
+    p_ids = [name_to_id[match] if match is not None else None for match, score in matches]
+    
+    # Un'unica ricerca nell'indice per tutti i giocatori trovati
+    values = val_index.values_asof(pd.Series(p_ids, dtype='float64'), today)
+    mapped_count = int((~pd.isna(values)).sum())
+    record_rows(rows_in=len(player_names))
+    record_metric('players_valued_share', share(mapped_count, len(player_names)))
+    total_value = float(pd.Series(values).sum())
+    print(f"   ...Valore trovato per {mapped_count}/{len(player_names)} giocatori.")
     
     return total_value
 
@@ -88,36 +76,47 @@ def calculate_lineup_value(player_names, df_vals, df_players):
 # 3. CARICAMENTO DATI
 # ==============================================================================
 print("📂 Carico dati...")
-try:
-    df_p = pd.read_csv(FILE_PLAYERS)
-    df_v = pd.read_csv(FILE_VALUATIONS)
-    df_v['date'] = pd.to_datetime(df_v['date'])
-    df_hist = pd.read_csv(FILE_HISTORY)
+with stage('load'):
+    try:
+        df_p = pd.read_csv(FILE_PLAYERS)
+        val_index = load_valuation_index(FILE_VALUATIONS)
+        # Stato per squadra salvato dalla pipeline (ultima partita, forma, valore tipico)
+        try:
+            team_state = load_team_state()
+        except FileNotFoundError:
+            team_state = save_team_state(load_artifact(HISTORY_ARTIFACT))
+
+        # Forma xG/xGA dopo l'ultima partita giocata (solo le partite nuove vengono aggiunte)
+        form_engine, _ = update_form_state(load_raw('match_stats'))
+    
+        # Valore tipico storico (mediana), già calcolato nello stato squadre
+        # Serve come denominatore per il Lineup_Ratio
+        typical_values = {team: st['Typical_Value'] for team, st in team_state.items()}
     
-    # Calcolo valore tipico storico (Mediana ultima stagione)
-    # Serve come denominatore per il Lineup_Ratio
-    vals = pd.concat([
-        df_hist[['Home_Team', 'Home_Value']].rename(columns={'Home_Team': 'Team', 'Home_Value': 'Value'}),
-        df_hist[['Away_Team', 'Away_Value']].rename(columns={'Away_Team': 'Team', 'Away_Value': 'Value'})
-    ])
-    typical_values = vals.groupby('Team')['Value'].median().to_dict()
+        # Indice dei nomi Kaggle costruito una volta sola per tutte le partite
+        name_matcher = NameMatcher(df_p['name'].unique())
     
-    model = joblib.load(MODEL_PATH)
-    print("✅ Ready.")
+        model = load_model(MODEL_PATH)
+        print("✅ Ready.")
 
-except Exception as e:
-    print(f"❌ Errore file: {e}")
-    exit()
+    except Exception as e:
+        print(f"❌ Errore file: {e}")
+        exit()
 
 # ==============================================================================
 # 4. LOOP PARTITE CON INPUT MANUALE
 # ==============================================================================
 print("\n" + "="*50)
+# Tutte le pagine di formazioni scaricate (o prese dalla cache) una volta sola
+print(f"🌍 Cerco formazioni su Fantacalcio.it...")
+with stage('lineup_index'):
+    lineup_index = load_lineup_index()
+
 for home, away in MATCHES_TONIGHT:
     print(f"⚽ {home.upper()} vs {away.upper()}")
     
     # 1. TENTATIVO AUTOMATICO
-    lineups = get_probable_lineups(home, away)
+    lineups = get_probable_lineups(home, away, lineup_index)
     
     # 2. INPUT MANUALE SE FALLISCE
     # Gestione CASA
@@ -138,34 +137,39 @@ for home, away in MATCHES_TONIGHT:
 
     # 3. CALCOLO VALORI
     # Se la lista è ancora vuota, usa il valore storico (Fallback)
-    val_home = calculate_lineup_value(lineups[home], df_v, df_p) if lineups[home] else typical_values.get(home, 100_000_000)
-    val_away = calculate_lineup_value(lineups[away], df_v, df_p) if lineups[away] else typical_values.get(away, 100_000_000)
+    val_home = calculate_lineup_value(lineups[home], val_index, df_p, name_matcher) if lineups[home] else typical_values.get(home, 100_000_000)
+    val_away = calculate_lineup_value(lineups[away], val_index, df_p, name_matcher) if lineups[away] else typical_values.get(away, 100_000_000)
     
-    # 4. RECUPERO FORMA
-    last_h = df_hist[(df_hist['Home_Team']==home) | (df_hist['Away_Team']==home)].iloc[-1]
-    last_a = df_hist[(df_hist['Home_Team']==away) | (df_hist['Away_Team']==away)].iloc[-1]
-    
-    # Logica per prendere stats corrette (Attack/Defense)
-    h_att = last_h['Home_Attack_Form'] if last_h['Home_Team'] == home else last_h['Away_Attack_Form']
-    h_def = last_h['Home_Defense_Form'] if last_h['Home_Team'] == home else last_h['Away_Defense_Form']
-    a_att = last_a['Home_Attack_Form'] if last_a['Home_Team'] == away else last_a['Away_Attack_Form']
-    a_def = last_a['Home_Defense_Form'] if last_a['Home_Team'] == away else last_a['Away_Defense_Form']
+    # 4. RECUPERO FORMA (lookup diretto nello stato squadre)
+    last_h = team_state[home]
+    last_a = team_state[away]
+
+    h_att, h_def = last_h['Attack_Form'], last_h['Defense_Form']
+    a_att, a_def = last_a['Attack_Form'], last_a['Defense_Form']
+
+    # Se possibile, forma aggiornata con l'ultimo risultato (la riga storica è pre-partita)
+    live_h, live_a = form_engine.relative_form(home), form_engine.relative_form(away)
+    if live_h is not None:
+        h_att, h_def = live_h['xG'], live_h['xGA']
+    if live_a is not None:
+        a_att, a_def = live_a['xG'], live_a['xGA']
 
     # 5. PREDIZIONE
-    input_row = pd.DataFrame([{
-        'Value_Ratio_vs_Opponent': val_home / (val_away + 1),
-        'Home_Value': val_home,
-        'Away_Value': val_away,
-        'Home_Lineup_Ratio': val_home / typical_values.get(home, val_home),
-        'Away_Lineup_Ratio': val_away / typical_values.get(away, val_away),
-        'Home_Attack_Form': h_att,
-        'Home_Defense_Form': h_def,
-        'Away_Attack_Form': a_att,
-        'Away_Defense_Form': a_def,
-        'Home_Attack_vs_Def': h_att - a_def,
-        'Away_Attack_vs_Def': a_att - h_def
-    }])
+    with stage('predict', rows_in=1, home=home, away=away):
+        input_row = pd.DataFrame([{
+            'Value_Ratio_vs_Opponent': val_home / (val_away + 1),
+            'Home_Value': val_home,
+            'Away_Value': val_away,
+            'Home_Lineup_Ratio': val_home / typical_values.get(home, val_home),
+            'Away_Lineup_Ratio': val_away / typical_values.get(away, val_away),
+            'Home_Attack_Form': h_att,
+            'Home_Defense_Form': h_def,
+            'Away_Attack_Form': a_att,
+            'Away_Defense_Form': a_def,
+            'Home_Attack_vs_Def': h_att - a_def,
+            'Away_Attack_vs_Def': a_att - h_def
+        }])
     
-    probs = model.predict_proba(input_row)[0]
+        probs = model.predict_proba(input_row)[0]
     
     print(f"\n   📊 1: {probs[0]:.0%} | X: {probs[1]:.0%} | 2: {probs[2]:.0%}")
\ No newline at end of file
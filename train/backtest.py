@@ -0,0 +1,293 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+# I moduli condivisi (training_data, storage, ...) stanno nella cartella principale
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from training_data import load_training_data, split_xy, TRAIN_ARTIFACT, ODDS_COLUMNS, DEFAULT_PARAMS
+from search_xgboost import booster_params, log_loss, best_trial, DB_PATH
+from instrument import stage, record_metric
+
+warnings.filterwarnings('ignore')
+
+# ==============================================================================
+# BACKTEST WALK-FORWARD (settimana per settimana)
+# ==============================================================================
+# Il notebook valuta un solo taglio 80/20 e calcola il ROI a mano. Qui si
+# cammina in avanti nel tempo, una settimana di partite alla volta:
+#   1. modello addestrato SOLO sulle partite prima del lunedì della settimana;
+#   2. probabilità 1/X/2 delle partite della settimana;
+#   3. log loss, Brier, accuracy e ROI (puntata fissa e Kelly frazionario)
+#      contro le quote Odds_1/X/2.
+# Ogni --refit-every settimane il modello si riaddestra da zero; nelle
+# settimane in mezzo si riparte dal modello precedente aggiungendo
+# --warm-rounds alberi sui dati nuovi (warm start). I blocchi che partono da
+# zero sono indipendenti e girano in --n-jobs processi.
+# Ogni modello finisce in train/backtest_cache/ con una chiave = hash di
+# parametri e dati di training: rilanciando (anche con dati nuovi) si
+# riaddestrano solo le settimane che sono cambiate.
+#
+# Uso (dalla cartella principale):
+#   python train/backtest.py --n-jobs 4 --nthread 1
+#   python train/backtest.py --refit-every 4 --warm-rounds 20 --output data/backtest.parquet
+
+CACHE_DIR = 'train/backtest_cache'
+CLASS_COLUMNS = ['Prob_1', 'Prob_X', 'Prob_2']
+
+
+# ==============================================================================
+# FINESTRE
+# ==============================================================================
+def week_steps(dates, start):
+    """
+    Passi del backtest: (fine del train, inizio e fine del test) come posizioni
+    nelle righe ordinate per data. Una settimana = da lunedì a domenica.
+    """
+    dates = pd.to_datetime(dates).reset_index(drop=True)
+    week = (dates - pd.to_timedelta(dates.dt.weekday, unit='D')).dt.normalize()
+    bounds = np.flatnonzero(np.r_[True, week.to_numpy()[1:] != week.to_numpy()[:-1]])
+    ends = np.r_[bounds[1:], len(dates)]
+    return [(b, b, e) for b, e in zip(bounds, ends) if week.iloc[b] >= start]
+
+
+def make_blocks(steps, refit_every):
+    """Gruppi di settimane consecutive: il primo passo riaddestra, gli altri fanno warm start."""
+    return [steps[i:i + refit_every] for i in range(0, len(steps), refit_every)]
+
+
+def default_start(dates):
+    """Inizio del backtest: la seconda stagione (la prima serve solo per il training)."""
+    dates = pd.to_datetime(dates)
+    season = dates.dt.year - (dates.dt.month < 8).astype(int)
+    return pd.Timestamp(year=int(season.min()) + 1, month=8, day=1)
+
+
+# ==============================================================================
+# MODELLI (con cache su disco)
+# ==============================================================================
+def model_key(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else json.dumps(part, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def rows_signature(X, y):
+    return np.ascontiguousarray(X).tobytes() + np.ascontiguousarray(y).tobytes()
+
+
+def cached_train(key, params, dtrain_fn, rounds, nthread, base=None):
+    """Booster dalla cache se c'è, altrimenti addestrato (eventualmente continuando `base`) e salvato."""
+    path = os.path.join(CACHE_DIR, f'{key}.ubj')
+    if os.path.exists(path):
+        booster = xgb.Booster()
+        booster.load_model(path)
+        return booster, True
+    booster = xgb.train(booster_params(params, nthread), dtrain_fn(), num_boost_round=rounds, xgb_model=base)
+    tmp_path = path + '.tmp.ubj'
+    booster.save_model(tmp_path)
+    os.replace(tmp_path, path)
+    return booster, False
+
+
+_worker = {}
+
+
+def _init_worker(X, y, params, warm_rounds, nthread):
+    _worker.update(X=X, y=y, params=params, warm_rounds=warm_rounds, nthread=nthread)
+
+
+def run_block(block):
+    """
+    Un blocco di settimane: modello da zero sul primo passo, poi warm start.
+    Ritorna [(inizio test, fine test, probabilità, da cache?)] per ogni passo.
+    """
+    X, y, params, nthread = _worker['X'], _worker['y'], _worker['params'], _worker['nthread']
+    out, key, booster = [], None, None
+    for train_end, test_start, test_end in block:
+        X_train, y_train = X[:train_end], y[:train_end]
+        dtrain_fn = lambda: xgb.QuantileDMatrix(X_train, y_train, nthread=nthread)
+        if booster is None:
+            key = model_key(params, rows_signature(X_train, y_train))
+            booster, cached = cached_train(key, params, dtrain_fn, params['n_estimators'], nthread)
+        else:
+            # Warm start: stessi alberi di prima + warm_rounds alberi sui dati fino a oggi
+            key = model_key(key, _worker['warm_rounds'], rows_signature(X_train, y_train))
+            booster, cached = cached_train(key, params, dtrain_fn, _worker['warm_rounds'], nthread, base=booster)
+        proba = booster.inplace_predict(X[test_start:test_end]).reshape(test_end - test_start, -1)
+        out.append((test_start, test_end, proba, cached))
+    return out
+
+
+def run_backtest(X, y, blocks, params, warm_rounds, n_jobs, nthread):
+    """Probabilità di tutte le righe di test (NaN fuori dal backtest) e quanti modelli venivano dalla cache."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    args = (X, y, params, warm_rounds, nthread)
+    if n_jobs > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=args) as pool:
+            results = list(pool.map(run_block, blocks))
+    else:
+        _init_worker(*args)
+        results = [run_block(b) for b in blocks]
+
+    proba = np.full((len(X), 3), np.nan)
+    n_cached = 0
+    for block in results:
+        for test_start, test_end, p, cached in block:
+            proba[test_start:test_end] = p
+            n_cached += cached
+    return proba, n_cached
+
+
+# ==============================================================================
+# METRICHE E SCOMMESSE
+# ==============================================================================
+def brier_score(y, proba):
+    """Brier multiclasse: somma sulle classi di (p - esito)^2, media sulle partite."""
+    onehot = np.eye(proba.shape[1])[y]
+    return float(np.mean(np.sum((proba - onehot) ** 2, axis=1)))
+
+
+def betting_returns(proba, y, odds, weeks, min_edge=0.0, kelly_fraction=0.25, max_stake=0.05, max_exposure=0.5):
+    """
+    Una puntata per partita sull'esito con valore atteso p * quota - 1 più alto,
+    solo se supera min_edge (quote mancanti o <= 1, es. fake_odds, mai giocate).
+      flat  -> 1 unità a puntata: ROI = profitto / puntate
+      kelly -> kelly_fraction * (p*quota - 1) / (quota - 1) del bankroll (max max_stake),
+               bankroll aggiornato a fine settimana (le partite della settimana si giocano insieme);
+               se le puntate della settimana superano max_exposure del bankroll vengono
+               ridotte in proporzione (con tanti campionati il bankroll non va mai sotto zero)
+    """
+    odds = np.where(np.isfinite(odds) & (odds > 1), odds, np.nan)
+    ev = proba * odds - 1
+    ev_filled = np.where(np.isnan(ev), -np.inf, ev)
+    pick = np.argmax(ev_filled, axis=1)
+    rows = np.arange(len(y))
+    edge, price = ev_filled[rows, pick], odds[rows, pick]
+    bet = edge > min_edge
+    won = pick == y
+    net = np.where(won, price - 1, -1.0)  # guadagno per unità puntata
+
+    flat_profit = float(np.sum(net[bet]))
+    n_bets = int(bet.sum())
+
+    fraction = np.where(bet, np.clip(kelly_fraction * edge / (price - 1), 0, max_stake), 0.0)
+    bankroll, staked = 1.0, 0.0
+    for w in pd.unique(weeks):
+        in_week = (weeks == w) & bet
+        week_fraction = fraction[in_week]
+        total = week_fraction.sum()
+        if total > max_exposure:
+            week_fraction = week_fraction * (max_exposure / total)
+        stakes = bankroll * week_fraction
+        staked += float(stakes.sum())
+        bankroll += float(np.sum(stakes * net[in_week]))
+    return {
+        'bets': n_bets,
+        'flat_roi': flat_profit / n_bets if n_bets else np.nan,
+        'kelly_roi': (bankroll - 1.0) / staked if staked else np.nan,
+        'kelly_bankroll': bankroll,
+    }
+
+
+def summarize(df, **bet_kwargs):
+    """Metriche di un insieme di partite del backtest (righe con probabilità)."""
+    proba = df[CLASS_COLUMNS].to_numpy()
+    y = df['Target'].to_numpy(np.int64)
+    return {
+        'matches': len(df),
+        'log_loss': log_loss(y, proba),
+        'brier': brier_score(y, proba),
+        'accuracy': float((np.argmax(proba, axis=1) == y).mean()),
+        **betting_returns(proba, y, df[ODDS_COLUMNS].to_numpy(np.float64), df['week'].to_numpy(), **bet_kwargs),
+    }
+
+
+def write_table(df, path):
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtest walk-forward settimana per settimana')
+    parser.add_argument('--artifact', default=TRAIN_ARTIFACT, help='Dataset di training (storage.py)')
+    parser.add_argument('--start', default=None, help='Prima settimana di test (default: inizio della 2a stagione)')
+    parser.add_argument('--params', default=None,
+                        help='Iperparametri JSON (default: migliori di search_xgboost.py, se ci sono)')
+    parser.add_argument('--refit-every', type=int, default=1, help='Settimane tra due riaddestramenti da zero')
+    parser.add_argument('--warm-rounds', type=int, default=20, help='Alberi aggiunti nelle settimane di warm start')
+    parser.add_argument('--n-jobs', type=int, default=1, help='Blocchi in parallelo (processi)')
+    parser.add_argument('--nthread', type=int, default=None, help='Thread xgboost per processo (default: core / n-jobs)')
+    parser.add_argument('--min-edge', type=float, default=0.0, help='Valore atteso minimo per puntare')
+    parser.add_argument('--kelly-fraction', type=float, default=0.25, help='Frazione di Kelly')
+    parser.add_argument('--max-stake', type=float, default=0.05, help='Puntata massima (quota del bankroll)')
+    parser.add_argument('--max-exposure', type=float, default=0.5,
+                        help='Somma massima delle puntate di una settimana (quota del bankroll, <= 1)')
+    parser.add_argument('--output', default=None, help='Probabilità per partita (.csv o .parquet)')
+    args = parser.parse_args()
+    if not 0 < args.max_exposure <= 1:
+        parser.error('--max-exposure deve essere tra 0 e 1')
+
+    nthread = args.nthread or max(1, (os.cpu_count() or 1) // args.n_jobs)
+    print("--- 📈 BACKTEST WALK-FORWARD ---")
+
+    with stage('load'):
+        df = load_training_data(args.artifact)
+        X_df, y_s = split_xy(df)
+        X, y = X_df.to_numpy(np.float64), y_s.to_numpy(np.int64)
+
+    if args.params:
+        params = json.loads(args.params)
+        source = '--params'
+    else:
+        trial = best_trial(DB_PATH) if os.path.exists(DB_PATH) else None
+        params, source = (trial['params'], f"studio {trial['study']}") if trial else (DEFAULT_PARAMS, 'default')
+    params = {**DEFAULT_PARAMS, **params}
+    print(f"Parametri ({source}): {params}")
+
+    start = pd.Timestamp(args.start) if args.start else default_start(df['date'])
+    steps = week_steps(df['date'], start)
+    if not steps:
+        sys.exit(f"❌ Nessuna settimana di test dal {start.date()}")
+    blocks = make_blocks(steps, max(1, args.refit_every))
+    print(f"{len(steps)} settimane dal {start.date()}, {len(blocks)} riaddestramenti da zero, "
+          f"{args.n_jobs} processi x {nthread} thread")
+
+    with stage('backtest', rows_in=len(df), steps=len(steps), blocks=len(blocks), n_jobs=args.n_jobs):
+        t0 = time.perf_counter()
+        proba, n_cached = run_backtest(X, y, blocks, params, args.warm_rounds, args.n_jobs, nthread)
+        record_metric('models_from_cache', n_cached)
+    print(f"⏱️  {len(steps)} modelli in {time.perf_counter() - t0:.1f}s ({n_cached} dalla cache {CACHE_DIR}/)")
+
+    results = df[['date', 'Home_Team', 'Away_Team', 'Target'] + ODDS_COLUMNS].copy()
+    results[CLASS_COLUMNS] = proba
+    results['week'] = (results['date'] - pd.to_timedelta(results['date'].dt.weekday, unit='D')).dt.normalize()
+    results['Season_Year'] = results['date'].dt.year - (results['date'].dt.month < 8).astype(int)
+    results = results.dropna(subset=CLASS_COLUMNS)
+
+    bet_kwargs = {'min_edge': args.min_edge, 'kelly_fraction': args.kelly_fraction, 'max_stake': args.max_stake,
+                  'max_exposure': args.max_exposure}
+    rows = {season: summarize(part, **bet_kwargs) for season, part in results.groupby('Season_Year')}
+    rows['TOTALE'] = total = summarize(results, **bet_kwargs)
+    for name in ['log_loss', 'brier', 'accuracy', 'flat_roi', 'kelly_roi']:
+        record_metric(name, total[name])
+
+    table = pd.DataFrame.from_dict(rows, orient='index')
+    print("\n📊 RISULTATI PER STAGIONE:")
+    print(table.to_string(float_format=lambda v: f"{v:.4f}"))
+
+    if args.output:
+        write_table(results, args.output)
+        print(f"📁 Probabilità salvate in {args.output}")
@@ -0,0 +1,376 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import datetime
+import threading
+import warnings
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+import numpy as np
+import pandas as pd
+
+# I moduli condivisi (team_state, fuzzy_matcher, ...) stanno nella cartella principale
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fuzzy_matcher import NameMatcher
+from valuation_index import load_valuation_index
+from team_state import load_team_state, save_team_state, fixture_features, MODEL_FEATURES, TEAM_STATE_PATH
+from form_engine import FormEngine, STATE_PATH as FORM_STATE_PATH
+from storage import load_artifact
+from model_artifact import load_model, default_model_path
+
+warnings.filterwarnings('ignore')
+
+# ==============================================================================
+# SERVER DI PREVISIONE LOCALE (modello e dati sempre in memoria)
+# ==============================================================================
+# auto_predict_live.py ricarica ad ogni avvio players.csv, le valutazioni, lo
+# storico e il pickle del modello: quasi tutto il tempo è caricamento.
+# Questo server carica tutto UNA volta e risponde in HTTP (localhost o socket Unix):
+#   POST /predict  {"home_team": "Inter", "away_team": "Milan",
+#                   "home_lineup": [...], "away_lineup": [...]}     (formazioni opzionali)
+#                  oppure {"fixtures": [ {...}, {...} ]}
+#   GET  /stats    latenze per richiesta (p50/p95/p99), dimensione media dei batch, cache
+#   GET  /health
+# Le richieste che arrivano insieme vengono raggruppate (micro-batch) in UNA
+# chiamata a predict_proba; le richieste identiche escono dalla cache; se il
+# file del modello, team_state.json o form_state.npz cambiano su disco vengono
+# ricaricati (e la cache svuotata).
+#
+# Uso: python train/prediction_server.py [--port 8765 | --unix /tmp/serie_a.sock]
+
+MODEL_PATH = default_model_path()  # .ubj nativo se esportato, altrimenti .pkl
+FILE_PLAYERS = 'data/players.csv'
+FILE_VALUATIONS = 'data/player_valuations.csv'
+HISTORY_ARTIFACT = 'dataset_train_final_3'
+
+MAX_BATCH = 64          # richieste massime per chiamata al modello
+MAX_WAIT = 0.005        # secondi di attesa per riempire un batch
+CACHE_SIZE = 10000      # risposte ricordate
+RELOAD_INTERVAL = 1.0   # ogni quanto controllare se modello e stato squadre sono cambiati
+LATENCY_WINDOW = 10000  # latenze tenute per le statistiche
+
+
+# ==============================================================================
+# 1. MODELLO CON RICARICAMENTO A CALDO
+# ==============================================================================
+class ModelHolder:
+    def __init__(self, path, on_reload=None):
+        self.path = path
+        self.on_reload = on_reload
+        self.model = load_model(path)
+        self.mtime = os.stat(path).st_mtime_ns
+        self.version = 1
+        self._stop = threading.Event()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def _watch(self):
+        while not self._stop.wait(RELOAD_INTERVAL):
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self.mtime:
+                    continue
+                model = load_model(self.path)
+            except Exception as e:
+                # File a metà scrittura o rovinato: teniamo il modello vecchio e riproviamo
+                print(f"⚠️ Ricaricamento modello fallito ({e}), tengo quello attuale.")
+                continue
+            self.model, self.mtime = model, mtime
+            self.version += 1
+            print(f"🔄 Modello ricaricato (versione {self.version}).")
+            if self.on_reload:
+                self.on_reload()
+
+    def stop(self):
+        self._stop.set()
+
+
+# ==============================================================================
+# 2. DATI CALDI E CALCOLO FEATURE
+# ==============================================================================
+class Predictor:
+    def __init__(self, model_path=MODEL_PATH, on_reload=None):
+        print("📂 Carico dati (una volta sola)...")
+        df_players = pd.read_csv(FILE_PLAYERS, usecols=['player_id', 'name'])
+        self.name_to_id = df_players.drop_duplicates('name').set_index('name')['player_id']
+        self.matcher = NameMatcher(df_players['name'].unique())
+        self.val_index = load_valuation_index(FILE_VALUATIONS)
+        self.on_reload = on_reload
+        # (team_state, form_engine) in una sola tupla: predict li legge sempre insieme
+        self.state = self._load_state()
+        self.state_mtimes = self._state_mtimes()
+        self.state_version = 1
+        self.models = ModelHolder(model_path, on_reload)
+        threading.Thread(target=self._watch_state, daemon=True).start()
+        print("✅ Ready.")
+
+    @staticmethod
+    def _load_state():
+        try:
+            team_state = load_team_state()
+        except FileNotFoundError:
+            team_state = save_team_state(load_artifact(HISTORY_ARTIFACT))
+        form_engine = FormEngine.load(FORM_STATE_PATH) if os.path.exists(FORM_STATE_PATH) else None
+        return team_state, form_engine
+
+    @staticmethod
+    def _state_mtimes():
+        return tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else None for p in [TEAM_STATE_PATH, FORM_STATE_PATH])
+
+    def _watch_state(self):
+        """Come ModelHolder: la pipeline riscrive team_state.json / form_state.npz -> si ricaricano."""
+        while not self.models._stop.wait(RELOAD_INTERVAL):
+            try:
+                mtimes = self._state_mtimes()
+                if mtimes == self.state_mtimes:
+                    continue
+                state = self._load_state()
+            except Exception as e:
+                print(f"⚠️ Ricaricamento stato squadre fallito ({e}), tengo quello attuale.")
+                continue
+            self.state, self.state_mtimes = state, mtimes
+            self.state_version += 1
+            print(f"🔄 Stato squadre ricaricato (versione {self.state_version}).")
+            if self.on_reload:
+                self.on_reload()
+
+    def lineup_values(self, lineups):
+        """Valore di mercato di oggi per ogni formazione (liste di nomi), tutte insieme."""
+        names = [n for lineup in lineups for n in lineup]
+        if not names:
+            return np.zeros(len(lineups))
+        today = pd.Timestamp(datetime.date.today())
+        matches = self.matcher.match(names, min_score=81, exhaustive=True)
+        p_ids = [self.name_to_id[m] if m is not None else None for m, _ in matches]
+        values = np.nan_to_num(self.val_index.values_asof(pd.Series(p_ids, dtype='float64'), today))
+        bounds = np.cumsum([0] + [len(lineup) for lineup in lineups])
+        return np.array([values[a:b].sum() for a, b in zip(bounds[:-1], bounds[1:])])
+
+    def predict(self, requests):
+        """Probabilità 1/X/2 per una lista di richieste (dict), con UNA chiamata al modello."""
+        team_state, form_engine = self.state
+        home = [r['home_team'] for r in requests]
+        away = [r['away_team'] for r in requests]
+        unknown = [t for t in home + away if t not in team_state]
+        if unknown:
+            raise KeyError(f"Squadre sconosciute: {sorted(set(unknown))}")
+
+        X = fixture_features(home, away, team_state, form_engine)
+
+        # Con la formazione: valore calcolato sui titolari (come auto_predict_live.py)
+        for side in ['home', 'away']:
+            rows = [i for i, r in enumerate(requests) if r.get(f'{side}_lineup')]
+            if not rows:
+                continue
+            col = 'Home' if side == 'home' else 'Away'
+            values = self.lineup_values([requests[i][f'{side}_lineup'] for i in rows])
+            teams = [requests[i][f'{side}_team'] for i in rows]
+            typical = np.array([team_state[t]['Typical_Value'] for t in teams])
+            X.loc[rows, f'{col}_Value'] = values
+            X.loc[rows, f'{col}_Lineup_Ratio'] = values / typical
+        X['Value_Ratio_vs_Opponent'] = X['Home_Value'] / (X['Away_Value'] + 1)
+
+        return self.models.model.predict_proba(X[MODEL_FEATURES])
+
+
+# ==============================================================================
+# 3. MICRO-BATCH, CACHE E STATISTICHE
+# ==============================================================================
+class MicroBatcher:
+    """Raccoglie le richieste concorrenti e le passa al modello in blocco."""
+
+    def __init__(self, score_fn, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, request):
+        fut = Future()
+        self.queue.put((request, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            self.batch_sizes.append(len(batch))
+            try:
+                probs = self.score_fn([req for req, _ in batch])
+                for (_, fut), p in zip(batch, probs):
+                    fut.set_result([float(x) for x in p])
+            except Exception:
+                # Un errore nel batch (es. squadra sconosciuta): riproviamo una per una
+                for req, fut in batch:
+                    try:
+                        fut.set_result([float(x) for x in self.score_fn([req])[0]])
+                    except Exception as e:
+                        fut.set_exception(e)
+
+
+class PredictionService:
+    def __init__(self, model_path=MODEL_PATH):
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.hits = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.predictor = Predictor(model_path, on_reload=self.clear_cache)
+        self.batcher = MicroBatcher(self.predictor.predict)
+
+    def clear_cache(self):
+        with self.cache_lock:
+            self.cache.clear()
+
+    @staticmethod
+    def cache_key(request):
+        return json.dumps([request['home_team'], request['away_team'],
+                           request.get('home_lineup') or [], request.get('away_lineup') or []])
+
+    def predict_one(self, request):
+        """Future con [p1, pX, p2]. Richieste identiche (anche contemporanee) condividono il risultato."""
+        key = self.cache_key(request)
+        with self.cache_lock:
+            fut = self.cache.get(key)
+            if fut is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return fut, True
+            fut = self.batcher.submit(request)
+            self.cache[key] = fut
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+        def drop_failed(f, key=key):
+            if f.exception() is not None:
+                with self.cache_lock:
+                    if self.cache.get(key) is f:
+                        del self.cache[key]
+        fut.add_done_callback(drop_failed)
+        return fut, False
+
+    def stats(self):
+        lat = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        sizes = list(self.batcher.batch_sizes) or [0]
+        return {
+            'requests': len(self.latencies),
+            'latency_ms': {'mean': float(lat.mean()), 'p50': float(np.percentile(lat, 50)),
+                           'p95': float(np.percentile(lat, 95)), 'p99': float(np.percentile(lat, 99)),
+                           'max': float(lat.max())},
+            'batches': len(self.batcher.batch_sizes),
+            'mean_batch_size': float(np.mean(sizes)),
+            'cache_hits': self.hits,
+            'cache_size': len(self.cache),
+            'model_version': self.predictor.models.version,
+            'state_version': self.predictor.state_version,
+        }
+
+
+# ==============================================================================
+# 4. HTTP
+# ==============================================================================
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Header e corpo partono in due write: senza questo Nagle + ACK ritardato aggiungono ~40ms
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass  # niente log per ogni richiesta
+
+        def address_string(self):
+            # Sul socket Unix client_address è una stringa vuota
+            return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+        def _send(self, code, payload, latency=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if latency is not None:
+                self.send_header('X-Latency-ms', f'{latency * 1000:.3f}')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok'})
+            elif self.path == '/stats':
+                self._send(200, service.stats())
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            t0 = time.perf_counter()
+            if self.path != '/predict':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                fixtures = payload['fixtures'] if 'fixtures' in payload else [payload]
+                submitted = [service.predict_one(f) for f in fixtures]
+                results = []
+                for f, (fut, cached) in zip(fixtures, submitted):
+                    p1, px, p2 = fut.result()
+                    results.append({'home_team': f['home_team'], 'away_team': f['away_team'],
+                                    'prob_1': p1, 'prob_x': px, 'prob_2': p2, 'cached': cached})
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {'error': e.args[0] if e.args else str(e)})
+                return
+
+            latency = time.perf_counter() - t0
+            service.latencies.append(latency)
+            out = {'predictions': results} if 'fixtures' in payload else results[0]
+            out['latency_ms'] = latency * 1000
+            self._send(200, out, latency)
+
+    return Handler
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, port=8765, unix_path=None):
+    handler = make_handler(service)
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        return UnixHTTPServer(unix_path, handler)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Server locale di previsione Serie A')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='Percorso del socket Unix (al posto della porta)')
+    parser.add_argument('--model', default=MODEL_PATH)
+    args = parser.parse_args()
+
+    print("--- 🤖 SERVER DI PREVISIONE ---")
+    service = PredictionService(args.model)
+    server = make_server(service, args.port, args.unix)
+    where = args.unix or f"http://127.0.0.1:{args.port}"
+    print(f"🚀 In ascolto su {where} (POST /predict, GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Server fermato.")
+    finally:
+        server.server_close()
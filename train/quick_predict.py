@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import numpy as np
+
+# I moduli condivisi stanno nella cartella principale
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tree_model import TreeEnsemble, TREES_PATH
+
+# ==============================================================================
+# PREVISIONE LAMPO (solo numpy: niente pandas, xgboost o sklearn)
+# ==============================================================================
+# Per una manciata di partite: legge lo stato squadre (data/team_state.json) e
+# gli alberi compilati (train/modello_serie_a.trees.npz, vedi tree_model.py)
+# e stampa le probabilità 1/X/2. Usa forma e valore dello stato squadre salvato
+# dalla pipeline (come score_fixtures.py --no-live-form); per la forma
+# aggiornata all'ultima partita e le formazioni usare gli altri script.
+#
+# Uso: python train/quick_predict.py Atalanta Roma Inter Milan ...   (coppie casa ospite)
+
+TEAM_STATE_PATH = 'data/team_state.json'
+
+
+def fixture_rows(pairs, team_state, features):
+    """Righe di feature (stesse formule di team_state.fixture_features) nell'ordine del modello."""
+    rows = []
+    for home, away in pairs:
+        h, a = team_state[home], team_state[away]
+        row = {
+            'Value_Ratio_vs_Opponent': h['Value'] / (a['Value'] + 1),
+            'Home_Value': h['Value'],
+            'Away_Value': a['Value'],
+            'Home_Lineup_Ratio': h['Lineup_Ratio'],
+            'Away_Lineup_Ratio': a['Lineup_Ratio'],
+            'Home_Attack_Form': h['Attack_Form'],
+            'Home_Defense_Form': h['Defense_Form'],
+            'Away_Attack_Form': a['Attack_Form'],
+            'Away_Defense_Form': a['Defense_Form'],
+            'Home_Attack_vs_Def': h['Attack_Form'] - a['Defense_Form'],
+            'Away_Attack_vs_Def': a['Attack_Form'] - h['Defense_Form'],
+        }
+        rows.append([row[f] for f in features])
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(features))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if not args or len(args) % 2:
+        print("Uso: python train/quick_predict.py Casa1 Ospite1 [Casa2 Ospite2 ...]")
+        sys.exit(1)
+
+    with open(TEAM_STATE_PATH) as f:
+        team_state = json.load(f)
+    model = TreeEnsemble.load(TREES_PATH)
+
+    pairs = list(zip(args[0::2], args[1::2]))
+    for home, away in pairs:
+        if home not in team_state or away not in team_state:
+            print(f"⚠️ Dati mancanti per {home} o {away}. Salto la partita.")
+    pairs = [(h, a) for h, a in pairs if h in team_state and a in team_state]
+
+    probs = model.predict_proba(fixture_rows(pairs, team_state, model.features))
+    for (home, away), p in zip(pairs, probs):
+        print(f"⚽ {home} vs {away}: 1 [{p[0]:.0%}] - X [{p[1]:.0%}] - 2 [{p[2]:.0%}]")
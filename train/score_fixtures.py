@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+
+# I moduli condivisi (team_state, form_engine, ...) stanno nella cartella principale
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from team_state import load_team_state, save_team_state, fixture_features, MODEL_FEATURES
+from form_engine import FormEngine, STATE_PATH as FORM_STATE_PATH
+from storage import load_artifact
+from model_artifact import load_model, default_model_path
+from instrument import stage, record_metric, record_rows, share
+
+warnings.filterwarnings('ignore')
+
+# ==============================================================================
+# PREVISIONI IN BLOCCO: UN FILE DI PARTITE -> UN FILE DI PROBABILITÀ
+# ==============================================================================
+# Invece di una chiamata al modello per partita (predict_tonight.py), qui:
+#   1. leggiamo un file di partite (CSV o Parquet) con colonne Home_Team, Away_Team
+#      (anche home_team/away_team; le altre colonne, es. league/date, restano)
+#   2. costruiamo TUTTA la matrice delle feature in modo vettoriale
+#   3. chiamiamo predict_proba UNA volta sola
+#   4. scriviamo Prob_1/Prob_X/Prob_2 in CSV o Parquet (in base all'estensione)
+#
+# Uso: python train/score_fixtures.py partite.csv --output previsioni.parquet
+
+MODEL_PATH = default_model_path()
+HISTORY_ARTIFACT = 'dataset_train_final_3'
+
+
+def read_table(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def write_table(df, path):
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def score_fixtures(fixtures, model, team_state, form_engine=None):
+    """Aggiunge alle partite le probabilità 1/X/2 (NaN se una squadra non è nello stato)."""
+    fixtures = fixtures.rename(columns={'home_team': 'Home_Team', 'away_team': 'Away_Team'})
+    if 'Home_Team' not in fixtures.columns or 'Away_Team' not in fixtures.columns:
+        raise KeyError("Il file partite deve avere le colonne 'Home_Team' e 'Away_Team'")
+
+    X = fixture_features(fixtures['Home_Team'], fixtures['Away_Team'], team_state, form_engine)
+    known = fixtures['Home_Team'].astype(str).isin(team_state).to_numpy() & \
+        fixtures['Away_Team'].astype(str).isin(team_state).to_numpy()
+
+    record_metric('teams_known_share', share(int(known.sum()), len(known)))
+    probs = np.full((len(fixtures), 3), np.nan)
+    if known.any():
+        # Una sola chiamata al modello per tutte le partite
+        probs[known] = model.predict_proba(X[known][MODEL_FEATURES])
+
+    out = fixtures.reset_index(drop=True).copy()
+    out['Prob_1'], out['Prob_X'], out['Prob_2'] = probs[:, 0], probs[:, 1], probs[:, 2]
+    return out, X
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Previsioni 1X2 per un file di partite')
+    parser.add_argument('fixtures', help='CSV/Parquet con Home_Team e Away_Team')
+    parser.add_argument('--output', default='data/previsioni.csv', help='File di uscita (.csv o .parquet)')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--no-live-form', action='store_true',
+                        help="Usa la forma dello stato squadre invece di quella aggiornata all'ultima partita")
+    parser.add_argument('--with-features', action='store_true', help='Scrive anche le feature usate')
+    args = parser.parse_args()
+
+    print("--- 🔮 PREVISIONI IN BLOCCO ---")
+    t0 = time.perf_counter()
+
+    with stage('load'):
+        fixtures = read_table(args.fixtures)
+        model = load_model(args.model)
+        try:
+            team_state = load_team_state()
+        except FileNotFoundError:
+            team_state = save_team_state(load_artifact(HISTORY_ARTIFACT))
+
+        # Forma aggiornata all'ultima partita, se lo stato è già stato creato
+        # (da predict_tonight.py / auto_predict_live.py)
+        form_engine = None
+        if not args.no_live_form and os.path.exists(FORM_STATE_PATH):
+            form_engine = FormEngine.load(FORM_STATE_PATH)
+
+    t1 = time.perf_counter()
+    with stage('score', rows_in=len(fixtures)):
+        scored, X = score_fixtures(fixtures, model, team_state, form_engine)
+        record_rows(rows_out=int(scored['Prob_1'].notna().sum()))
+    t2 = time.perf_counter()
+
+    if args.with_features:
+        scored = pd.concat([scored, X], axis=1)
+    write_table(scored, args.output)
+
+    missing = int(scored['Prob_1'].isna().sum())
+    print(f"✅ {len(scored) - missing} partite previste in {t2 - t1:.3f}s (caricamento {t1 - t0:.2f}s)")
+    if missing:
+        unknown = set(scored.loc[scored['Prob_1'].isna(), 'Home_Team'].astype(str)) | \
+            set(scored.loc[scored['Prob_1'].isna(), 'Away_Team'].astype(str))
+        print(f"⚠️ {missing} partite senza previsione: squadre sconosciute {sorted(unknown - set(team_state))[:10]}")
+    print(f"📁 Salvato in: {args.output}")
@@ -0,0 +1,341 @@
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import argparse
+import warnings
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import TimeSeriesSplit, ParameterSampler
+
+# I moduli condivisi (training_data, model_artifact, ...) stanno nella cartella principale
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from training_data import load_training_data, split_xy, train_test_split_by_time, TRAIN_ARTIFACT
+from model_artifact import export_native, NATIVE_MODEL_PATH, PICKLE_MODEL_PATH
+from instrument import stage, record_metric
+
+warnings.filterwarnings('ignore')
+
+# ==============================================================================
+# RICERCA IPERPARAMETRI DA RIGA DI COMANDO (riprendibile, in parallelo)
+# ==============================================================================
+# Il notebook train_xgboost.ipynb fa una RandomizedSearchCV su TimeSeriesSplit:
+# per ogni candidato e ogni fold XGBClassifier ricostruisce le matrici, e se
+# il kernel si ferma si riparte da zero. Qui:
+#   1. le matrici quantizzate (QuantileDMatrix) di ogni fold si costruiscono
+#      UNA volta (per processo) e servono per tutti i candidati;
+#   2. successive halving sul numero di alberi: tutti i candidati con pochi
+#      alberi, poi solo il miglior 1/eta con più alberi, fino al loro
+#      n_estimators (opzionale anche l'early stopping sul fold di validazione);
+#   3. i candidati girano in --n-jobs processi, ognuno con --nthread thread
+#      xgboost (n_jobs x nthread <= core, per non pestarsi i piedi);
+#   4. ogni valutazione finita (candidato, numero di alberi) finisce subito in
+#      train/search_trials.sqlite: rilanciando lo stesso comando si riprende
+#      da dove si era fermato.
+# Candidati, fold e punteggio (log loss medio sui fold) sono gli stessi della
+# RandomizedSearchCV del notebook (stesso ParameterSampler e stesso seed).
+#
+# Uso (dalla cartella principale):
+#   python train/search_xgboost.py --trials 50 --n-jobs 2 --nthread 4
+#   python train/search_xgboost.py --save      (modello finale su tutti i dati)
+
+SEED = 42
+DB_PATH = 'train/search_trials.sqlite'
+
+# Stessa griglia del notebook
+PARAM_DIST = {
+    'n_estimators': [100, 250, 300, 350],
+    'learning_rate': [0.01, 0.05, 0.005],
+    'max_depth': [3, 4, 5, 6],
+    'min_child_weight': [1, 3, 5],
+    'gamma': [0.005, 0.01, 0.02],
+    'subsample': [0.7, 0.8, 0.9],
+    'colsample_bytree': [0.7, 0.8, 0.9],
+    'reg_alpha': [4, 5, 6],
+    'reg_lambda': [4, 5, 6, 7],
+}
+BASE_PARAMS = {'objective': 'multi:softprob', 'num_class': 3, 'eval_metric': 'mlogloss', 'tree_method': 'hist'}
+
+
+# ==============================================================================
+# FOLD E VALUTAZIONE
+# ==============================================================================
+def build_folds(X, y, n_splits, max_bin, nthread):
+    """Matrici quantizzate di train/validazione di ogni fold temporale (costruite una volta)."""
+    folds = []
+    for train_idx, valid_idx in TimeSeriesSplit(n_splits=n_splits).split(X):
+        dtrain = xgb.QuantileDMatrix(X[train_idx], y[train_idx], max_bin=max_bin, nthread=nthread)
+        # Stessi bin del train (come fa XGBClassifier sul set di validazione)
+        dvalid = xgb.QuantileDMatrix(X[valid_idx], y[valid_idx], ref=dtrain, nthread=nthread)
+        folds.append((dtrain, dvalid, y[valid_idx]))
+    return folds
+
+
+def log_loss(y, proba):
+    """Log loss multiclasse (come sklearn.metrics.log_loss)."""
+    p = proba[np.arange(len(y)), y]
+    return float(-np.mean(np.log(np.clip(p, 1e-15, 1.0))))
+
+
+def booster_params(params, nthread):
+    """Parametri di XGBClassifier -> parametri di xgb.train (n_estimators a parte)."""
+    params = {k: v for k, v in params.items() if k != 'n_estimators'}
+    return {**BASE_PARAMS, **params, 'seed': SEED, 'nthread': nthread}
+
+
+def evaluate(folds, params, rounds, nthread, early_stopping=0):
+    """Log loss di ogni fold con `rounds` alberi (o meno, con early stopping). -> (punteggi, alberi usati)"""
+    scores, used = [], []
+    for dtrain, dvalid, y_valid in folds:
+        kwargs = {}
+        if early_stopping:
+            kwargs = {'evals': [(dvalid, 'valid')], 'early_stopping_rounds': early_stopping, 'verbose_eval': False}
+        booster = xgb.train(booster_params(params, nthread), dtrain, num_boost_round=rounds, **kwargs)
+        n_trees = booster.best_iteration + 1 if early_stopping else rounds
+        scores.append(log_loss(y_valid, booster.predict(dvalid, iteration_range=(0, n_trees))))
+        used.append(n_trees)
+    return scores, used
+
+
+# Stato dei processi (o del processo principale con --n-jobs 1): i fold si
+# costruiscono una volta e restano per tutti i candidati
+_worker = {}
+
+
+def _init_worker(X, y, n_splits, max_bin, nthread, early_stopping):
+    _worker['folds'] = build_folds(X, y, n_splits, max_bin, nthread)
+    _worker['nthread'] = nthread
+    _worker['early_stopping'] = early_stopping
+
+
+def _run_trial(task):
+    trial, params, rounds = task
+    t0 = time.perf_counter()
+    scores, used = evaluate(_worker['folds'], params, rounds, _worker['nthread'], _worker['early_stopping'])
+    return trial, rounds, scores, used, time.perf_counter() - t0
+
+
+# ==============================================================================
+# ARCHIVIO DEI TENTATIVI (SQLite)
+# ==============================================================================
+class TrialStore:
+    """Valutazioni finite per studio: una riga per (candidato, numero di alberi)."""
+
+    def __init__(self, path=DB_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS studies (
+                study TEXT PRIMARY KEY, config TEXT NOT NULL, created TEXT NOT NULL,
+                best_trial INTEGER, best_logloss REAL);
+            CREATE TABLE IF NOT EXISTS trials (
+                study TEXT NOT NULL, trial INTEGER NOT NULL, rounds INTEGER NOT NULL,
+                params TEXT NOT NULL, logloss REAL NOT NULL, fold_logloss TEXT NOT NULL,
+                trees_used TEXT NOT NULL, seconds REAL NOT NULL, finished TEXT NOT NULL,
+                PRIMARY KEY (study, trial, rounds));
+        """)
+
+    def open_study(self, study, config):
+        self.conn.execute("INSERT OR IGNORE INTO studies (study, config, created) VALUES (?, ?, ?)",
+                          (study, json.dumps(config, sort_keys=True), datetime.datetime.now().isoformat(timespec='seconds')))
+        self.conn.commit()
+
+    def finish(self, study, trial, logloss):
+        """Segna il vincitore dello studio (letto da best_trial, es. in backtest.py)."""
+        self.conn.execute("UPDATE studies SET best_trial = ?, best_logloss = ? WHERE study = ?", (trial, logloss, study))
+        self.conn.commit()
+
+    def results(self, study):
+        """{(candidato, alberi): log loss medio} delle valutazioni già finite."""
+        rows = self.conn.execute("SELECT trial, rounds, logloss FROM trials WHERE study = ?", (study,))
+        return {(trial, rounds): logloss for trial, rounds, logloss in rows}
+
+    def save(self, study, trial, rounds, params, scores, used, seconds):
+        # Una transazione per valutazione: un'interruzione perde al massimo quella in corso
+        self.conn.execute("INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                          (study, trial, rounds, json.dumps(params), float(np.mean(scores)), json.dumps(scores),
+                           json.dumps(used), seconds, datetime.datetime.now().isoformat(timespec='seconds')))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def best_trial(path=DB_PATH, study=None):
+    """
+    Vincitore di uno studio finito (l'ultimo, se study è None):
+    dict con study, trial, params, logloss. None se non ce ne sono.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        query = "SELECT study, best_trial, best_logloss FROM studies WHERE best_trial IS NOT NULL"
+        if study is not None:
+            row = conn.execute(query + " AND study = ?", (study,)).fetchone()
+        else:
+            row = conn.execute(query + " ORDER BY created DESC, rowid DESC LIMIT 1").fetchone()
+        if row is None:
+            return None
+        study, trial, logloss = row
+        params = conn.execute("SELECT params FROM trials WHERE study = ? AND trial = ? ORDER BY rounds DESC LIMIT 1",
+                              (study, trial)).fetchone()[0]
+        return {'study': study, 'trial': trial, 'params': json.loads(params), 'logloss': logloss}
+    finally:
+        conn.close()
+
+
+def study_id(name, config):
+    """Nome dello studio + impronta della configurazione (dati, griglia, fold, halving)."""
+    digest = hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:10]
+    return f"{name}-{digest}"
+
+
+def data_signature(X, y):
+    h = hashlib.sha1(np.ascontiguousarray(X).tobytes())
+    h.update(np.ascontiguousarray(y).tobytes())
+    return h.hexdigest()[:12]
+
+
+# ==============================================================================
+# SUCCESSIVE HALVING
+# ==============================================================================
+def rung_budgets(max_rounds, min_rounds, eta):
+    """Alberi per gradino, crescenti: max_rounds, max_rounds/eta, ... fino a min_rounds."""
+    budgets = [max_rounds]
+    while eta > 1 and math.ceil(budgets[-1] / eta) >= min_rounds:
+        budgets.append(math.ceil(budgets[-1] / eta))
+    return budgets[::-1]
+
+
+def run_search(candidates, budgets, eta, store, study, n_jobs, worker_args):
+    """
+    Valuta i candidati gradino per gradino; dopo ogni gradino restano i migliori
+    len/eta. Le valutazioni già in archivio non si rifanno (ripresa e candidati
+    con n_estimators sotto il budget, che non cambiano da un gradino all'altro).
+    Ritorna {candidato: log loss} dell'ultimo gradino.
+    """
+    done = store.results(study)
+    pool = None
+    if n_jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker, initargs=worker_args)
+    try:
+        alive = list(range(len(candidates)))
+        for r, budget in enumerate(budgets):
+            rounds = {t: min(budget, candidates[t]['n_estimators']) for t in alive}
+            todo = [(t, candidates[t], rounds[t]) for t in alive if (t, rounds[t]) not in done]
+            print(f"   Gradino {r + 1}/{len(budgets)}: {len(alive)} candidati, fino a {budget} alberi "
+                  f"({len(alive) - len(todo)} già valutati)")
+
+            if pool is None:
+                if todo and not _worker:
+                    _init_worker(*worker_args)
+                finished = map(_run_trial, todo)
+            else:
+                finished = (f.result() for f in as_completed([pool.submit(_run_trial, task) for task in todo]))
+            for trial, n_rounds, scores, used, seconds in finished:
+                store.save(study, trial, n_rounds, candidates[trial], scores, used, seconds)
+                done[(trial, n_rounds)] = float(np.mean(scores))
+
+            scores = {t: done[(t, rounds[t])] for t in alive}
+            if r < len(budgets) - 1:
+                keep = max(1, math.ceil(len(alive) / eta))
+                alive = sorted(alive, key=lambda t: (scores[t], t))[:keep]
+        return scores
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def fit_classifier(params, X, y, nthread):
+    """XGBClassifier come nel notebook (stessi parametri fissi e seed)."""
+    model = xgb.XGBClassifier(**params, objective='multi:softprob', eval_metric='mlogloss',
+                              random_state=SEED, n_jobs=nthread)
+    return model.fit(X, y)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ricerca iperparametri XGBoost (successive halving, riprendibile)')
+    parser.add_argument('--trials', type=int, default=50, help='Candidati estratti dalla griglia (n_iter)')
+    parser.add_argument('--folds', type=int, default=5, help='Fold di TimeSeriesSplit')
+    parser.add_argument('--eta', type=float, default=3, help='Ad ogni gradino resta 1/eta dei candidati (1 = niente halving)')
+    parser.add_argument('--min-rounds', type=int, default=30, help='Alberi del primo gradino (almeno)')
+    parser.add_argument('--early-stopping', type=int, default=0,
+                        help='Ferma un fold dopo N alberi senza miglioramenti (0 = mai, come il notebook)')
+    parser.add_argument('--n-jobs', type=int, default=1, help='Candidati valutati in parallelo (processi)')
+    parser.add_argument('--nthread', type=int, default=None, help='Thread xgboost per candidato (default: core / n-jobs)')
+    parser.add_argument('--max-bin', type=int, default=256, help='Bin delle matrici quantizzate')
+    parser.add_argument('--db', default=DB_PATH, help='Archivio SQLite dei tentativi')
+    parser.add_argument('--study', default='default', help='Nome dello studio (la configurazione si aggiunge da sola)')
+    parser.add_argument('--artifact', default=TRAIN_ARTIFACT, help='Dataset di training (storage.py)')
+    parser.add_argument('--save', action='store_true',
+                        help='Addestra il modello finale su tutti i dati e lo salva (.pkl + .ubj)')
+    args = parser.parse_args()
+
+    nthread = args.nthread or max(1, (os.cpu_count() or 1) // args.n_jobs)
+    print("--- 🔎 RICERCA IPERPARAMETRI XGBOOST ---")
+
+    with stage('load'):
+        df = load_training_data(args.artifact)
+        X_df, y_s = split_xy(df)
+        split_index = train_test_split_by_time(len(df))
+        X, y = X_df.to_numpy(np.float64), y_s.to_numpy(np.int64)
+        X_train, y_train = X[:split_index], y[:split_index]
+    print(f"Dataset: {len(df)} partite, train {split_index} (fino al {df['date'].iloc[split_index].date()}), "
+          f"test {len(df) - split_index}")
+
+    candidates = list(ParameterSampler(PARAM_DIST, n_iter=args.trials, random_state=SEED))
+    # Interi numpy -> int Python (per JSON e per xgboost)
+    candidates = [{k: v.item() if hasattr(v, 'item') else v for k, v in c.items()} for c in candidates]
+    budgets = rung_budgets(max(c['n_estimators'] for c in candidates), args.min_rounds, args.eta)
+
+    config = {'data': data_signature(X_train, y_train), 'features': list(X_df.columns), 'space': PARAM_DIST,
+              'trials': args.trials, 'seed': SEED, 'folds': args.folds, 'eta': args.eta, 'budgets': budgets,
+              'max_bin': args.max_bin, 'early_stopping': args.early_stopping}
+    study = study_id(args.study, config)
+    store = TrialStore(args.db)
+    store.open_study(study, config)
+    print(f"Studio {study} in {args.db}: {args.trials} candidati, gradini {budgets}, "
+          f"{args.n_jobs} processi x {nthread} thread")
+
+    worker_args = (X_train, y_train, args.folds, args.max_bin, nthread, args.early_stopping)
+    with stage('search', rows_in=len(X_train), trials=args.trials, n_jobs=args.n_jobs, nthread=nthread):
+        t0 = time.perf_counter()
+        scores = run_search(candidates, budgets, args.eta, store, study, args.n_jobs, worker_args)
+        ranking = sorted(scores, key=lambda t: (scores[t], t))
+        best = ranking[0]
+        record_metric('best_cv_logloss', scores[best])
+    store.finish(study, best, scores[best])
+    store.close()
+    print(f"⏱️  Ricerca in {time.perf_counter() - t0:.1f}s")
+
+    print("\n🏆 CLASSIFICA (log loss medio sui fold):")
+    for t in ranking[:10]:
+        print(f"   #{t:<3} {scores[t]:.4f}  {candidates[t]}")
+
+    best_params = candidates[best]
+    print("\n✅ MIGLIORI PARAMETRI TROVATI:")
+    print(best_params)
+    print(f"Miglior Log Loss (CV): {scores[best]:.4f}")
+
+    # Prova sul test set (dati mai visti), come nel notebook
+    with stage('test', rows_in=len(X) - split_index):
+        model = fit_classifier(best_params, X_df.iloc[:split_index], y_s.iloc[:split_index], nthread)
+        proba = model.predict_proba(X_df.iloc[split_index:])
+        test_logloss = log_loss(y[split_index:], proba)
+        test_accuracy = float((np.argmax(proba, axis=1) == y[split_index:]).mean())
+        record_metric('test_logloss', test_logloss)
+    print(f"\nLog Loss test: {test_logloss:.4f} | Accuracy test: {test_accuracy:.2%}")
+
+    if args.save:
+        import joblib
+        print("\n--- ADDESTRAMENTO FINALE SU TUTTO IL DATASET ---")
+        with stage('final', rows_in=len(X)):
+            final_model = fit_classifier(best_params, X_df, y_s, nthread)
+            joblib.dump(final_model, PICKLE_MODEL_PATH)
+            export_native(final_model, NATIVE_MODEL_PATH)
+        print(f"💾 Modello salvato: {PICKLE_MODEL_PATH} e {NATIVE_MODEL_PATH} (+ manifest)")
@@ -0,0 +1,231 @@
+import os
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+
+# I moduli condivisi (team_state, raw_store, ...) stanno nella cartella principale
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from team_state import load_team_state, save_team_state
+from team_registry import team_key
+from form_engine import FormEngine, STATE_PATH as FORM_STATE_PATH
+from raw_store import load_raw
+from storage import load_artifact
+from model_artifact import load_model, default_model_path
+from instrument import stage, record_metric, record_rows
+from score_fixtures import score_fixtures, write_table, HISTORY_ARTIFACT
+
+warnings.filterwarnings('ignore')
+
+# ==============================================================================
+# SIMULAZIONE MONTE CARLO DEL RESTO DELLA STAGIONE
+# ==============================================================================
+# predict_tonight.py dà le probabilità di UNA partita; qui vogliamo scudetto,
+# posti europei e retrocessione. Passi:
+#   1. dal calendario (fbref_schedule.csv) la classifica attuale (partite con
+#      risultato) e le partite che restano (risultato vuoto);
+#   2. UNA chiamata al modello per tutte le partite rimaste (score_fixtures);
+#   3. N stagioni simulate a blocchi di --chunk: una matrice di uniformi
+#      (simulazioni x partite) -> 1/X/2, punti e differenza reti si sommano
+#      per squadra con due prodotti matrice (partite x squadre), niente cicli
+#      sulle partite;
+#   4. classifica di ogni simulazione con un solo argsort per riga e conteggio
+#      delle posizioni finali con bincount.
+# La memoria dipende da --chunk, non da --sims: 100k stagioni in pochi secondi.
+#
+# Differenza reti (approssimazione per gli arrivi a pari punti): nelle
+# vittorie il margine è 1 + Poisson(mu), con mu preso dai margini delle
+# partite già giocate; il pareggio vale 0. A parità di punti e differenza
+# reti decide il sorteggio.
+#
+# Uso: python train/simulate_season.py --league "ITA-Serie A" --sims 100000
+
+MODEL_PATH = default_model_path()
+DEFAULT_LEAGUE = 'ITA-Serie A'
+# Margine medio oltre il primo gol nelle vittorie, se non ci sono partite giocate
+DEFAULT_EXTRA_MARGIN = 0.6
+
+
+def parse_scores(score):
+    """'2–1' (trattino lungo di FBref o normale) -> gol casa, gol ospite (NaN se non giocata)."""
+    goals = score.astype('string').str.replace('–', '-', regex=False).str.extract(r'^\s*(\d+)\s*-\s*(\d+)')
+    return pd.to_numeric(goals[0]).to_numpy(np.float64), pd.to_numeric(goals[1]).to_numpy(np.float64)
+
+
+def season_fixtures(schedule, league, season=None):
+    """Partite di una stagione del campionato (l'ultima se season=None) con i gol."""
+    schedule = schedule[schedule['league'] == league]
+    if schedule.empty:
+        raise ValueError(f"Nessuna partita per il campionato '{league}' nel calendario")
+    seasons = schedule['season'].astype(str)
+    season = str(season) if season is not None else seasons.max()
+    fixtures = schedule[seasons == season].reset_index(drop=True)
+    fixtures['home_goals'], fixtures['away_goals'] = parse_scores(fixtures['score'])
+    return fixtures, season
+
+
+def current_table(played, teams):
+    """Punti, differenza reti e gol fatti attuali (array allineati a teams)."""
+    index = {t: i for i, t in enumerate(teams)}
+    home = played['home_team'].map(index).to_numpy()
+    away = played['away_team'].map(index).to_numpy()
+    hg, ag = played['home_goals'].to_numpy(), played['away_goals'].to_numpy()
+    n = len(teams)
+    points = np.bincount(home, 3 * (hg > ag) + (hg == ag), n) + np.bincount(away, 3 * (ag > hg) + (hg == ag), n)
+    gd = np.bincount(home, hg - ag, n) + np.bincount(away, ag - hg, n)
+    gf = np.bincount(home, hg, n) + np.bincount(away, ag, n)
+    return points, gd, gf
+
+
+def fixture_probabilities(remaining, model, team_state, form_engine, base_rates):
+    """Probabilità 1/X/2 delle partite rimaste; le squadre sconosciute al modello usano le frequenze del campionato."""
+    # I nomi del calendario -> nomi dello stato squadre (stessa chiave del registro)
+    state_names = {team_key(t): t for t in team_state}
+    fixtures = pd.DataFrame({
+        'Home_Team': [state_names.get(team_key(t), t) for t in remaining['home_team']],
+        'Away_Team': [state_names.get(team_key(t), t) for t in remaining['away_team']],
+    })
+    scored, _ = score_fixtures(fixtures, model, team_state, form_engine)
+    probs = scored[['Prob_1', 'Prob_X', 'Prob_2']].to_numpy(np.float64)
+    unknown = np.isnan(probs).any(axis=1)
+    probs[unknown] = base_rates
+    return probs, unknown
+
+
+def simulate_positions(probs, home, away, base_points, base_gd, n_sims, chunk, extra_margin, seed):
+    """
+    Conteggio delle posizioni finali (squadre x posizioni) e punti medi su
+    n_sims stagioni. home/away: indice squadra di ogni partita rimasta.
+    """
+    n_teams, n_fix = len(base_points), len(probs)
+    # Matrici partite x squadre: +1 per la squadra di casa, per l'ospite
+    home_m = np.zeros((n_fix, n_teams), dtype=np.float32)
+    away_m = np.zeros((n_fix, n_teams), dtype=np.float32)
+    home_m[np.arange(n_fix), home] = 1
+    away_m[np.arange(n_fix), away] = 1
+    side_m = home_m - away_m
+
+    cut_home = probs[:, 0].astype(np.float32)
+    cut_draw = (probs[:, 0] + probs[:, 1]).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(n_teams * n_teams, dtype=np.int64)
+    points_sum = np.zeros(n_teams)
+
+    for start in range(0, n_sims, chunk):
+        c = min(chunk, n_sims - start)
+        u = rng.random((c, n_fix), dtype=np.float32)
+        home_win = u < cut_home
+        draw = ~home_win & (u < cut_draw)
+        away_win = ~home_win & ~draw
+
+        home_pts = 3 * home_win + draw
+        away_pts = 3 * away_win + draw
+        points = base_points + home_pts.astype(np.float32) @ home_m + away_pts.astype(np.float32) @ away_m
+
+        # Margine (punto di vista della squadra di casa): 0 nei pareggi
+        margin = (1 + rng.poisson(extra_margin, (c, n_fix))).astype(np.float32)
+        margin *= home_win.astype(np.float32) - away_win
+        gd = base_gd + margin @ side_m
+
+        # Punti, poi differenza reti (|gd| < 500), poi sorteggio
+        key = points * 1000.0 + gd + rng.random((c, n_teams))
+        order = np.argsort(-key, axis=1)
+        # order[s, p] = squadra in posizione p -> conteggio (squadra, posizione)
+        counts += np.bincount((order * n_teams + np.arange(n_teams)).ravel(), minlength=n_teams * n_teams)
+        points_sum += points.sum(axis=0)
+
+    return counts.reshape(n_teams, n_teams), points_sum / n_sims
+
+
+def position_table(teams, counts, mean_points, base_points, n_sims, champions, europe, relegation):
+    """Una riga per squadra: punti attuali/attesi, probabilità di titolo/Europa/retrocessione e di ogni posizione."""
+    n = len(teams)
+    dist = counts / n_sims
+    table = pd.DataFrame({
+        'team': teams,
+        'points_now': base_points.astype(int),
+        'points_expected': mean_points.round(2),
+        'avg_position': (dist @ np.arange(1, n + 1)).round(2),
+        'P_title': dist[:, 0],
+        'P_champions': dist[:, :champions].sum(axis=1),
+        'P_europe': dist[:, :europe].sum(axis=1),
+        'P_relegation': dist[:, n - relegation:].sum(axis=1) if relegation else 0.0,
+    })
+    positions = pd.DataFrame(dist, columns=[f'P_pos_{p}' for p in range(1, n + 1)])
+    table = pd.concat([table, positions], axis=1)
+    return table.sort_values(['avg_position', 'team']).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Probabilità di classifica finale con simulazioni Monte Carlo')
+    parser.add_argument('--league', default=DEFAULT_LEAGUE, help='Campionato come nel calendario FBref')
+    parser.add_argument('--season', default=None, help="Stagione come nel calendario (default: l'ultima)")
+    parser.add_argument('--sims', type=int, default=100_000, help='Stagioni simulate')
+    parser.add_argument('--chunk', type=int, default=10_000, help='Stagioni per blocco (limita la memoria)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--champions', type=int, default=4, help='Posti Champions League')
+    parser.add_argument('--europe', type=int, default=6, help='Posti europei in totale')
+    parser.add_argument('--relegation', type=int, default=3, help='Posti retrocessione')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--no-live-form', action='store_true',
+                        help="Usa la forma dello stato squadre invece di quella aggiornata all'ultima partita")
+    parser.add_argument('--output', default='data/simulazione_stagione.csv', help='File di uscita (.csv o .parquet)')
+    args = parser.parse_args()
+
+    print("--- 🎲 SIMULAZIONE STAGIONE ---")
+    with stage('load'):
+        fixtures, season = season_fixtures(load_raw('schedule'), args.league, args.season)
+        model = load_model(args.model)
+        try:
+            team_state = load_team_state()
+        except FileNotFoundError:
+            team_state = save_team_state(load_artifact(HISTORY_ARTIFACT))
+        form_engine = None
+        if not args.no_live_form and os.path.exists(FORM_STATE_PATH):
+            form_engine = FormEngine.load(FORM_STATE_PATH)
+
+    teams = sorted(set(fixtures['home_team']) | set(fixtures['away_team']))
+    index = {t: i for i, t in enumerate(teams)}
+    is_played = ~np.isnan(fixtures['home_goals'].to_numpy())
+    played, remaining = fixtures[is_played], fixtures[~is_played].reset_index(drop=True)
+    base_points, base_gd, _ = current_table(played, teams)
+    print(f"{args.league} {season}: {len(teams)} squadre, {len(played)} partite giocate, {len(remaining)} da giocare")
+
+    # Frequenze 1/X/2 e margine medio delle vittorie nelle partite già giocate
+    hg, ag = played['home_goals'].to_numpy(), played['away_goals'].to_numpy()
+    if len(played):
+        base_rates = np.array([(hg > ag).mean(), (hg == ag).mean(), (hg < ag).mean()])
+        margins = np.abs(hg - ag)[hg != ag]
+        extra_margin = float(margins.mean() - 1) if len(margins) else DEFAULT_EXTRA_MARGIN
+    else:
+        base_rates, extra_margin = np.array([0.45, 0.27, 0.28]), DEFAULT_EXTRA_MARGIN
+
+    with stage('score', rows_in=len(remaining)):
+        if len(remaining):
+            probs, unknown = fixture_probabilities(remaining, model, team_state, form_engine, base_rates)
+        else:
+            probs, unknown = np.zeros((0, 3)), np.zeros(0, dtype=bool)
+        record_metric('fixtures_unknown', int(unknown.sum()))
+    if unknown.any():
+        print(f"⚠️ {int(unknown.sum())} partite con squadre sconosciute al modello: uso le frequenze 1/X/2 del campionato")
+
+    t0 = time.perf_counter()
+    with stage('simulate', rows_in=args.sims * len(remaining)):
+        home = remaining['home_team'].map(index).to_numpy()
+        away = remaining['away_team'].map(index).to_numpy()
+        counts, mean_points = simulate_positions(probs, home, away, base_points.astype(np.float32),
+                                                 base_gd.astype(np.float32), args.sims, args.chunk,
+                                                 max(extra_margin, 0.0), args.seed)
+        record_rows(rows_out=len(teams))
+    elapsed = time.perf_counter() - t0
+
+    table = position_table(teams, counts, mean_points, base_points, args.sims,
+                           args.champions, args.europe, args.relegation)
+    write_table(table, args.output)
+
+    print(f"✅ {args.sims} stagioni simulate in {elapsed:.2f}s")
+    summary = table[['team', 'points_now', 'points_expected', 'P_title', 'P_champions', 'P_relegation']]
+    print(summary.to_string(index=False, float_format=lambda x: f'{x:.3f}'))
+    print(f"📁 Salvato in: {args.output}")
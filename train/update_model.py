@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import warnings
+import pandas as pd
+import xgboost as xgb
+
+# I moduli condivisi (training_data, model_artifact, ...) stanno nella cartella principale
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from training_data import load_training_data, split_xy, train_test_split_by_time, TRAIN_ARTIFACT
+from model_artifact import export_native, manifest_path, NATIVE_MODEL_PATH, PICKLE_MODEL_PATH
+from search_xgboost import booster_params, log_loss, fit_classifier, PARAM_DIST
+from instrument import stage, record_metric
+
+warnings.filterwarnings('ignore')
+
+# ==============================================================================
+# AGGIORNAMENTO DEL MODELLO DOPO OGNI GIORNATA (warm start)
+# ==============================================================================
+# Dopo ogni giornata si rilanciava l'ultima cella del notebook:
+# final_model.fit(X, y) su TUTTA la storia. Qui:
+#   - si prendono solo le partite dopo 'trained_until' del manifest;
+#   - si continua il booster esistente (xgb_model=) con --extra-trees alberi
+#     addestrati su quelle partite: pochi secondi invece di un training completo;
+#   - si riaddestra da zero (come il notebook, con gli iperparametri del modello
+#     in produzione: --params, poi il manifest, poi il .pkl di XGBClassifier)
+#     quando gli alberi aggiunti superano --max-added-trees o quando la log loss del modello
+#     sulle partite nuove (misurata PRIMA di usarle) peggiora di più di
+#     --max-drift rispetto a quella di riferimento dell'ultimo training completo.
+# Ogni versione (completa o aggiornamento) porta nel manifest numero di
+# versione, padre (sha256), data dell'ultima partita vista e parametri; una
+# copia va in train/model_versions/ e una riga in train/model_lineage.jsonl.
+#
+# Uso (dalla cartella principale, dopo pipeline.py):
+#   python train/update_model.py              (aggiorna o riaddestra se serve)
+#   python train/update_model.py --full       (riaddestramento completo)
+#   python train/update_model.py --dry-run    (dice solo cosa farebbe)
+
+VERSIONS_DIR = 'train/model_versions'
+LINEAGE_PATH = 'train/model_lineage.jsonl'
+
+
+def load_manifest(path=NATIVE_MODEL_PATH):
+    if not os.path.exists(manifest_path(path)):
+        return None
+    with open(manifest_path(path)) as f:
+        return json.load(f)
+
+
+def deployed_params(path=PICKLE_MODEL_PATH):
+    """Iperparametri del modello in produzione: il .pkl di XGBClassifier li conserva, il .ubj no."""
+    if not os.path.exists(path):
+        return None
+    import joblib
+    params = joblib.load(path).get_params()
+    params = {k: params[k] for k in PARAM_DIST if params.get(k) is not None}
+    return params if 'n_estimators' in params else None
+
+
+def refit_params(manifest, cli_params=None):
+    """
+    Iperparametri del training completo e loro origine: --params, poi il
+    manifest, poi il .pkl in produzione. (None, None) se non si trovano:
+    meglio fermarsi che sostituire il modello tarato con parametri di ripiego.
+    """
+    if cli_params:
+        return json.loads(cli_params), '--params'
+    if manifest and manifest.get('params'):
+        return manifest['params'], 'manifest'
+    params = deployed_params()
+    if params:
+        return params, PICKLE_MODEL_PATH
+    return None, None
+
+
+def refit_reasons(manifest, booster, new_logloss, n_new, args):
+    """Motivi per riaddestrare da zero (lista vuota = basta il warm start)."""
+    reasons = []
+    if args.full:
+        reasons.append('richiesto (--full)')
+    if manifest is None or booster is None or 'trained_until' not in manifest:
+        reasons.append('modello senza storia (manifest senza trained_until)')
+        return reasons
+    # Alberi aggiunti col warm start dall'ultimo training completo
+    added = booster.num_boosted_rounds() + args.extra_trees - manifest.get('refit_trees', 0)
+    if added > args.max_added_trees:
+        reasons.append(f'alberi aggiunti {added} > {args.max_added_trees}')
+    # Drift: log loss media sulle partite viste dopo l'ultimo training completo
+    rows = manifest.get('since_refit_rows', 0) + n_new
+    if rows >= args.drift_min_rows and manifest.get('reference_logloss') is not None:
+        mean = (manifest.get('since_refit_logloss_sum', 0.0) + new_logloss * n_new) / rows
+        if mean - manifest['reference_logloss'] > args.max_drift:
+            reasons.append(f"drift: log loss {mean:.4f} vs riferimento {manifest['reference_logloss']:.4f}")
+    return reasons
+
+
+def full_refit(df, params, nthread):
+    """Come l'ultima cella del notebook, più la log loss di riferimento (80% più vecchio -> 20% recente)."""
+    X, y = split_xy(df)
+    cut = train_test_split_by_time(len(df))
+    holdout = fit_classifier(params, X.iloc[:cut], y.iloc[:cut], nthread)
+    reference = log_loss(y.to_numpy()[cut:], holdout.predict_proba(X.iloc[cut:]))
+    return fit_classifier(params, X, y, nthread), reference
+
+
+def warm_update(booster, X_new, y_new, params, extra_trees, nthread):
+    """Il booster esistente + extra_trees alberi sulle sole partite nuove (come XGBClassifier)."""
+    dnew = xgb.DMatrix(X_new, label=y_new, nthread=nthread)
+    booster = xgb.train(booster_params(params, nthread), dnew, num_boost_round=extra_trees, xgb_model=booster)
+    # Di nuovo un XGBClassifier (classi e feature dal modello), per il .pkl e export_native
+    model = xgb.XGBClassifier()
+    model.load_model(booster.save_raw('ubj'))
+    return model
+
+
+def save_version(model, lineage):
+    """Modello corrente (.pkl + .ubj + manifest), copia in model_versions/ e riga in model_lineage.jsonl."""
+    import joblib
+    joblib.dump(model, PICKLE_MODEL_PATH)
+    manifest = export_native(model, NATIVE_MODEL_PATH, lineage=lineage)
+
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    base = os.path.join(VERSIONS_DIR, f"v{lineage['version']:04d}")
+    shutil.copy(NATIVE_MODEL_PATH, base + '.ubj')
+    shutil.copy(manifest_path(NATIVE_MODEL_PATH), base + '.manifest.json')
+
+    entry = {k: manifest[k] for k in ['version', 'kind', 'created', 'sha256', 'parent', 'trained_until',
+                                      'rows_trained', 'num_trees', 'reason'] if k in manifest}
+    entry['new_rows'] = lineage.get('new_rows')
+    entry['new_logloss'] = lineage.get('new_logloss')
+    with open(LINEAGE_PATH, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Aggiorna il modello con le partite nuove (warm start) o lo riaddestra')
+    parser.add_argument('--artifact', default=TRAIN_ARTIFACT, help='Dataset di training (storage.py)')
+    parser.add_argument('--extra-trees', type=int, default=10, help='Alberi aggiunti per aggiornamento')
+    parser.add_argument('--max-added-trees', type=int, default=100,
+                        help="Alberi aggiunti dall'ultimo training completo oltre i quali si riaddestra da zero")
+    parser.add_argument('--max-drift', type=float, default=0.05,
+                        help='Peggioramento massimo della log loss rispetto al riferimento')
+    parser.add_argument('--drift-min-rows', type=int, default=50, help='Partite minime per giudicare il drift')
+    parser.add_argument('--params', default=None,
+                        help='Iperparametri JSON per il training completo (default: quelli del modello in produzione)')
+    parser.add_argument('--nthread', type=int, default=None, help='Thread xgboost (default: tutti i core)')
+    parser.add_argument('--full', action='store_true', help='Riaddestra da zero in ogni caso')
+    parser.add_argument('--dry-run', action='store_true', help='Mostra cosa farebbe senza salvare')
+    args = parser.parse_args()
+
+    nthread = args.nthread or os.cpu_count() or 1
+    print("--- 🔄 AGGIORNAMENTO MODELLO ---")
+
+    with stage('load'):
+        df = load_training_data(args.artifact)
+        manifest = load_manifest()
+        booster = None
+        if manifest is not None:
+            booster = xgb.Booster()
+            booster.load_model(NATIVE_MODEL_PATH)
+
+    trained_until = pd.Timestamp(manifest['trained_until']) if manifest and 'trained_until' in manifest else None
+    new = df if trained_until is None else df[df['date'] > trained_until]
+    last_date = str(df['date'].max().date())
+    version = (manifest or {}).get('version', 0) + 1
+    print(f"Modello: versione {version - 1}, addestrato fino al {trained_until.date() if trained_until is not None else '?'}"
+          f" | partite nuove: {len(new)} (fino al {last_date})")
+
+    if len(new) == 0 and not args.full:
+        print("✅ Nessuna partita nuova: il modello è già aggiornato.")
+        sys.exit(0)
+
+    # Log loss del modello attuale sulle partite nuove, prima di usarle (misura del drift)
+    new_logloss = None
+    if booster is not None and len(new):
+        X_new, y_new = split_xy(new)
+        proba = booster.inplace_predict(X_new).reshape(len(new), -1)
+        new_logloss = log_loss(y_new.to_numpy(), proba)
+        record_metric('new_rows_logloss', new_logloss)
+        print(f"Log loss sulle partite nuove (prima dell'aggiornamento): {new_logloss:.4f}")
+
+    reasons = refit_reasons(manifest, booster, new_logloss, len(new), args)
+    kind = 'refit' if reasons else 'update'
+    print(f"➡️  {'Riaddestramento completo: ' + '; '.join(reasons) if reasons else f'Warm start: +{args.extra_trees} alberi'}")
+    if reasons:
+        params, source = refit_params(manifest, args.params)
+        if params is None:
+            print(f"❌ Errore: nessun iperparametro nel manifest né in {PICKLE_MODEL_PATH}: passa --params '{{...}}'")
+            sys.exit(1)
+        print(f"Parametri ({source}): {params}")
+    else:
+        params = manifest['params']
+    if args.dry_run:
+        sys.exit(0)
+
+    with stage(kind, rows_in=len(df) if reasons else len(new)):
+        if reasons:
+            model, reference = full_refit(df, params, nthread)
+            lineage = {'reference_logloss': reference, 'refit_version': version,
+                       'refit_trees': model.get_booster().num_boosted_rounds(),
+                       'since_refit_rows': 0, 'since_refit_logloss_sum': 0.0, 'rows_trained': len(df)}
+        else:
+            model = warm_update(booster, X_new, y_new, params, args.extra_trees, nthread)
+            lineage = {k: manifest.get(k) for k in ['reference_logloss', 'refit_version', 'refit_trees']}
+            lineage.update(since_refit_rows=manifest.get('since_refit_rows', 0) + len(new),
+                           since_refit_logloss_sum=manifest.get('since_refit_logloss_sum', 0.0) + new_logloss * len(new),
+                           rows_trained=manifest.get('rows_trained', 0) + len(new))
+        lineage.update(version=version, kind=kind, reason='; '.join(reasons) or None,
+                       parent=(manifest or {}).get('sha256'), trained_until=last_date, params=params,
+                       new_rows=len(new), new_logloss=new_logloss)
+        manifest = save_version(model, lineage)
+
+    print(f"💾 Versione {version} ({kind}): {manifest['num_trees']} alberi, addestrata fino al {last_date}")
+    print(f"📜 Storia delle versioni: {LINEAGE_PATH} (copie in {VERSIONS_DIR}/)")
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from storage import load_artifact
+from team_state import MODEL_FEATURES
+
+# ==============================================================================
+# DATASET DI TRAINING (stessa preparazione del notebook train_xgboost.ipynb)
+# ==============================================================================
+# Il notebook prepara i dati a mano nella prima cella; gli script di training
+# (train/search_xgboost.py, ...) devono vedere ESATTAMENTE le stesse righe:
+#   - ordine per data (niente futuro nel passato);
+#   - via la 1a partita stagionale di ogni squadra (non ha storico di forma);
+#   - duelli attacco vs difesa.
+# Le feature sono quelle che gli script di previsione sanno costruire
+# (team_state.MODEL_FEATURES), nello stesso ordine.
+
+TRAIN_ARTIFACT = 'dataset_train_final_3'
+TARGET = 'Target'  # 0 = vittoria casa, 1 = pareggio, 2 = vittoria ospite
+ODDS_COLUMNS = ['Odds_1', 'Odds_X', 'Odds_2']
+# Quota del test set nel notebook (il 20% più recente)
+TEST_SHARE = 0.2
+# Iperparametri XGBClassifier di ripiego (train/backtest.py senza ricerche salvate né --params)
+DEFAULT_PARAMS = {'n_estimators': 250, 'learning_rate': 0.01, 'max_depth': 4, 'min_child_weight': 3,
+                  'gamma': 0.01, 'subsample': 0.8, 'colsample_bytree': 0.8, 'reg_alpha': 5, 'reg_lambda': 5}
+
+
+def prepare_training_frame(df):
+    """Dataset finale -> righe e colonne usate per il training (come la prima cella del notebook)."""
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    # Ordiniamo per data (FONDAMENTALE per non barare usando il futuro)
+    df = df.sort_values('date').reset_index(drop=True)
+
+    # Stagione da agosto e n-esima partita di ogni squadra nella stagione
+    season = df['date'].dt.year - (df['date'].dt.month < 8).astype(int)
+    match_home = df.groupby([season, df['Home_Team'].astype(str)]).cumcount() + 1
+    match_away = df.groupby([season, df['Away_Team'].astype(str)]).cumcount() + 1
+    # Teniamo le partite dove ENTRAMBE le squadre hanno giocato almeno una partita prima
+    df = df[(match_home > 1) & (match_away > 1)].reset_index(drop=True)
+
+    # Duello 1: Attacco Casa vs Difesa Ospite / Duello 2: Attacco Ospite vs Difesa Casa
+    df['Home_Attack_vs_Def'] = df['Home_Attack_Form'] - df['Away_Defense_Form']
+    df['Away_Attack_vs_Def'] = df['Away_Attack_Form'] - df['Home_Defense_Form']
+    return df
+
+
+def load_training_data(name=TRAIN_ARTIFACT):
+    """Carica il dataset finale della pipeline già preparato per il training."""
+    return prepare_training_frame(load_artifact(name))
+
+
+def split_xy(df, features=MODEL_FEATURES):
+    """Feature (float64, nell'ordine del modello) e target."""
+    X = df[list(features)].astype(np.float64)
+    y = df[TARGET].astype(np.int64)
+    return X, y
+
+
+def train_test_split_by_time(n_rows, test_share=TEST_SHARE):
+    """Indice di taglio: prima il train (le partite più vecchie), poi il test."""
+    return int(n_rows * (1 - test_share))
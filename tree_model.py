@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import numpy as np
+
+# ==============================================================================
+# VALUTATORE DEGLI ALBERI IN NUMPY PURO (senza xgboost a runtime)
+# ==============================================================================
+# Per prevedere poche partite bastava "camminare" 300 alberi di profondità 3,
+# ma import xgboost (che si porta dietro sklearn) costa da solo ~2 secondi.
+# Qui il booster viene compilato UNA volta (dal suo dump JSON) in array piatti:
+#   feature / threshold / left / right / default_left -> un elemento per nodo
+#   value      -> valore delle foglie
+#   roots      -> nodo radice di ogni albero
+#   tree_class -> classe (1/X/2) a cui contribuisce ogni albero
+#   intercept  -> margine iniziale per classe (base_score)
+# salvati in train/modello_serie_a.trees.npz. La previsione percorre tutti gli
+# alberi per tutte le righe insieme (un passo per livello di profondità) e
+# applica la softmax. Le foglie puntano a se stesse, così nessun controllo
+# "sono in una foglia?" serve nel ciclo. Solo numpy: avvio in poche decine di ms.
+#
+# Uso: python tree_model.py [train/modello_serie_a.pkl] [train/modello_serie_a.trees.npz]
+
+TREES_PATH = 'train/modello_serie_a.trees.npz'
+CHUNK_ROWS = 10000  # righe per blocco (la matrice dei nodi è righe x alberi)
+
+
+class TreeEnsemble:
+    def __init__(self, feature, threshold, left, right, default_left, value, roots,
+                 tree_class, intercept, depth, features, classes, class_names):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.tree_class = tree_class
+        self.intercept = intercept
+        self.depth = int(depth)
+        self.features = list(features)
+        self.feature_names_in_ = np.array(self.features, dtype=object)
+        self.classes_ = np.asarray(classes)
+        self.class_names = list(class_names)
+        # Somma delle foglie per classe come prodotto matriciale (alberi x classi)
+        self.class_matrix = np.zeros((len(roots), len(intercept)))
+        self.class_matrix[np.arange(len(roots)), tree_class] = 1.0
+        # Figli in un'unica tabella: child[2 * nodo + va_a_sinistra] (una lettura invece di due)
+        self.child = np.stack([right, left], axis=1).ravel().astype(np.intp)
+        self.root_nodes = roots.astype(np.intp)
+
+    # --------------------------------------------------------------------------
+    # PREVISIONE
+    # --------------------------------------------------------------------------
+    def _margin(self, X):
+        n, n_features = X.shape
+        flat = X.ravel()
+        row_start = (np.arange(n, dtype=np.intp) * n_features)[:, None]
+        node = np.broadcast_to(self.root_nodes, (n, len(self.root_nodes)))
+        for _ in range(self.depth):
+            x = flat[row_start + self.feature[node]]
+            # Come xgboost: a sinistra se x < soglia, i valori mancanti seguono default_left
+            go_left = (x < self.threshold[node]) | (np.isnan(x) & self.default_left[node])
+            node = self.child[2 * node + go_left]
+        return self.intercept + self.value[node] @ self.class_matrix
+
+    def predict_margin(self, X):
+        # xgboost confronta le feature in float32
+        X = np.ascontiguousarray(X[self.features] if hasattr(X, 'columns') else X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        return np.concatenate([self._margin(X[i:i + CHUNK_ROWS]) for i in range(0, len(X), CHUNK_ROWS)]) \
+            if len(X) else np.zeros((0, len(self.intercept)))
+
+    def predict_proba(self, X):
+        """Probabilità (n, n_classi) come XGBClassifier.predict_proba (multi:softprob)."""
+        margin = self.predict_margin(X)
+        e = np.exp(margin - margin.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_margin(X), axis=1)]
+
+    # --------------------------------------------------------------------------
+    # SALVATAGGIO
+    # --------------------------------------------------------------------------
+    def save(self, path=TREES_PATH):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, feature=self.feature, threshold=self.threshold, left=self.left,
+                 right=self.right, default_left=self.default_left, value=self.value,
+                 roots=self.roots, tree_class=self.tree_class, intercept=self.intercept,
+                 depth=self.depth, features=np.array(self.features, dtype=str),
+                 classes=self.classes_, class_names=np.array(self.class_names, dtype=str))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=TREES_PATH):
+        with np.load(path) as data:
+            return cls(**{k: data[k] for k in data.files})
+
+
+# ==============================================================================
+# COMPILAZIONE DAL BOOSTER (serve xgboost, solo qui)
+# ==============================================================================
+def compile_booster(booster, features, classes=(0, 1, 2), class_names=('1', 'X', '2')):
+    """Dump JSON del booster -> TreeEnsemble, verificato contro xgboost."""
+    model = json.loads(booster.save_raw(raw_format='json'))['learner']
+    objective = model['objective']['name']
+    if objective not in ('multi:softprob', 'multi:softmax'):
+        raise ValueError(f"Obiettivo non supportato: {objective}")
+    gbm = model['gradient_booster']
+    if gbm['name'] != 'gbtree':
+        raise ValueError(f"Booster non supportato: {gbm['name']}")
+    trees = gbm['model']['trees']
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    depth, offset = 0, 0
+    for tree in trees:
+        if any(tree['split_type']):
+            raise ValueError("Split categoriali non supportati")
+        lc = np.array(tree['left_children'], dtype=np.int64)
+        rc = np.array(tree['right_children'], dtype=np.int64)
+        nodes = np.arange(len(lc))
+        leaf = lc == -1
+        # Le foglie puntano a se stesse: dopo `depth` passi ogni riga è in una foglia
+        left.append(np.where(leaf, nodes, lc) + offset)
+        right.append(np.where(leaf, nodes, rc) + offset)
+        feature.append(np.where(leaf, 0, tree['split_indices']))
+        # Nel JSON di xgboost il valore delle foglie sta in split_conditions
+        cond = np.array(tree['split_conditions'], dtype=np.float32)
+        threshold.append(cond)
+        value.append(np.where(leaf, cond, 0).astype(np.float64))
+        default_left.append(np.array(tree['default_left'], dtype=bool))
+        roots.append(offset)
+
+        # Profondità: livello di ogni nodo a partire dalla radice (i figli hanno id maggiori)
+        level = np.zeros(len(lc), dtype=np.int64)
+        for i in nodes[~leaf]:
+            level[lc[i]] = level[rc[i]] = level[i] + 1
+        depth = max(depth, int(level.max()))
+        offset += len(lc)
+
+    n_class = int(model['learner_model_param']['num_class'])
+    ensemble = TreeEnsemble(
+        feature=np.concatenate(feature).astype(np.int32), threshold=np.concatenate(threshold),
+        left=np.concatenate(left).astype(np.int32), right=np.concatenate(right).astype(np.int32),
+        default_left=np.concatenate(default_left), value=np.concatenate(value),
+        roots=np.array(roots, dtype=np.int32), tree_class=np.array(gbm['model']['tree_info'], dtype=np.int32),
+        intercept=np.zeros(n_class), depth=depth, features=features,
+        classes=np.asarray(classes), class_names=class_names)
+
+    # Margine iniziale: il formato di base_score cambia tra versioni di xgboost,
+    # quindi lo ricaviamo dal booster stesso (margine xgboost - somma delle foglie)
+    rng = np.random.default_rng(0)
+    probe = rng.normal(size=(200, len(features))).astype(np.float32)
+    probe[rng.random(probe.shape) < 0.1] = np.nan
+    ref_margin = booster.inplace_predict(probe, predict_type='margin').reshape(len(probe), -1)
+    ensemble.intercept = np.median(ref_margin - ensemble.predict_margin(probe), axis=0)
+
+    ref = booster.inplace_predict(probe).reshape(len(probe), -1)
+    err = np.abs(ensemble.predict_proba(probe) - ref).max()
+    if err > 1e-6:
+        raise ValueError(f"Alberi compilati diversi da xgboost (errore massimo {err:.2e})")
+    return ensemble
+
+
+def compile_model(model_path=None, output=TREES_PATH):
+    """Compila il modello (.pkl o .ubj, vedi model_artifact.load_model) e salva gli array."""
+    from model_artifact import load_model
+    model = load_model(model_path)
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model.booster
+    features = list(model.feature_names_in_)
+    class_names = getattr(model, 'class_names', ['1', 'X', '2'])
+    ensemble = compile_booster(booster, features, model.classes_, class_names)
+    ensemble.save(output)
+    return ensemble
+
+
+if __name__ == '__main__':
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'train/modello_serie_a.pkl'
+    target = sys.argv[2] if len(sys.argv) > 2 else TREES_PATH
+    print(f"--- 🌳 COMPILAZIONE ALBERI ({source} -> {target}) ---")
+    ensemble = compile_model(source, target)
+    print(f"✅ {len(ensemble.roots)} alberi, {len(ensemble.feature)} nodi, profondità {ensemble.depth}")
+    print(f"📁 Salvato in: {target}")
@@ -0,0 +1,141 @@
+import os
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# INDICE VALORI DI MERCATO "AS-OF" (player_valuations.csv)
+# ==============================================================================
+# Invece di ordinare tutto player_valuations.csv e fare pd.merge_asof ad ogni
+# esecuzione, costruiamo UNA volta un indice compatto:
+#   player_ids -> ID giocatore ordinati (uno per giocatore)
+#   offsets    -> dove inizia/finisce la storia di ogni giocatore
+#   days       -> date delle valutazioni (giorni dal 1970), ordinate per giocatore
+#   values     -> market_value_in_eur corrispondente
+# e lo salviamo in binario (.npz) accanto al CSV.
+# "Quanto valeva il giocatore P alla data D?" = ultima valutazione con data <= D,
+# trovata con una ricerca binaria (O(log n)), anche per migliaia di righe insieme.
+
+INDEX_PATH = 'data/player_valuations_index.npz'
+
+
+def _source_signature(csv_path):
+    """Dimensione e data di modifica del CSV: se cambiano, l'indice va ricostruito."""
+    st = os.stat(csv_path)
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def _to_days(dates):
+    """Date (stringhe, datetime o datetime64) -> giorni interi dal 1970."""
+    dates = pd.to_datetime(np.asarray(dates).ravel())
+    return np.asarray(dates.values.astype('datetime64[D]').astype(np.int64))
+
+
+class ValuationIndex:
+    def __init__(self, player_ids, offsets, days, values):
+        self.player_ids = player_ids
+        self.offsets = offsets
+        self.days = days
+        self.values = values
+
+        # Chiave composta (giocatore, giorno) crescente: una sola ricerca binaria
+        # globale risponde a tutte le domande "as-of" insieme
+        self.day0 = int(days.min()) if len(days) else 0
+        self.stride = int(days.max()) - self.day0 + 2 if len(days) else 2
+        seg = np.repeat(np.arange(len(player_ids), dtype=np.int64), np.diff(offsets))
+        self.keys = seg * self.stride + (days - self.day0)
+
+    @classmethod
+    def from_frame(cls, df_vals):
+        """Costruisce l'indice da un DataFrame con player_id, date, market_value_in_eur."""
+        df = df_vals[['player_id', 'date', 'market_value_in_eur']].dropna(subset=['player_id', 'date'])
+        pids = df['player_id'].to_numpy(dtype=np.int64)
+        days = _to_days(df['date'])
+        values = df['market_value_in_eur'].to_numpy(dtype=np.float64)
+        return cls._from_arrays(pids, days, values)
+
+    @classmethod
+    def _from_arrays(cls, pids, days, values):
+        # Ordine stabile per (giocatore, data): a parità di data vince l'ultima riga
+        order = np.lexsort((days, pids))
+        pids, days, values = pids[order], days[order], values[order]
+
+        player_ids, starts = np.unique(pids, return_index=True)
+        offsets = np.append(starts, len(pids)).astype(np.int64)
+        return cls(player_ids, offsets, days, values)
+
+    @classmethod
+    def from_csv(cls, csv_path, chunksize=1_000_000):
+        """
+        Come from_frame ma leggendo il CSV a blocchi: di ogni blocco teniamo solo
+        tre array numerici (ID, giorno, valore), mai le date come stringhe.
+        """
+        pids, days, values = [], [], []
+        for chunk in pd.read_csv(csv_path, usecols=['player_id', 'date', 'market_value_in_eur'],
+                                 dtype={'player_id': 'float64', 'market_value_in_eur': 'float64'},
+                                 chunksize=chunksize):
+            chunk = chunk.dropna(subset=['player_id', 'date'])
+            pids.append(chunk['player_id'].to_numpy(dtype=np.int64))
+            days.append(_to_days(chunk['date']))
+            values.append(chunk['market_value_in_eur'].to_numpy(dtype=np.float64))
+        if not pids:
+            return cls.from_frame(pd.DataFrame(columns=['player_id', 'date', 'market_value_in_eur']))
+        return cls._from_arrays(np.concatenate(pids), np.concatenate(days), np.concatenate(values))
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        data = np.load(path)
+        return cls(data['player_ids'], data['offsets'], data['days'], data['values'])
+
+    def save(self, path=INDEX_PATH, signature=None):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, player_ids=self.player_ids, offsets=self.offsets,
+                 days=self.days, values=self.values,
+                 signature=signature if signature is not None else np.zeros(2, dtype=np.int64))
+        os.replace(tmp_path, path)
+
+    def values_asof(self, player_ids, dates):
+        """
+        Valore di ogni giocatore alla rispettiva data (ultima valutazione <= data).
+        NaN se il giocatore non ha valutazioni prima di quella data.
+        """
+        pids = np.asarray(player_ids, dtype=np.float64).ravel()
+        q_days = _to_days(dates)
+        if q_days.size == 1 and pids.size > 1:
+            q_days = np.repeat(q_days, pids.size)
+        out = np.full(pids.size, np.nan)
+        if not len(self.player_ids):
+            return out
+
+        known = ~np.isnan(pids)
+        pid_int = np.where(known, pids, -1).astype(np.int64)
+        rank = np.clip(np.searchsorted(self.player_ids, pid_int), 0, len(self.player_ids) - 1)
+        found = known & (self.player_ids[rank] == pid_int)
+
+        offs = np.clip(q_days - self.day0, -1, self.stride - 1)
+        pos = np.searchsorted(self.keys, rank * self.stride + offs, side='right') - 1
+        valid = found & (pos >= self.offsets[rank])
+        out[valid] = self.values[pos[valid]]
+        return out
+
+    def value_asof(self, player_id, date):
+        """Versione per un singolo giocatore."""
+        return float(self.values_asof([player_id], [date])[0])
+
+
+def load_valuation_index(csv_path='data/player_valuations.csv', path=INDEX_PATH):
+    """
+    Carica l'indice binario; se manca o se il CSV è cambiato lo ricostruisce
+    (una volta sola) e lo salva.
+    """
+    signature = _source_signature(csv_path)
+    if os.path.exists(path):
+        with np.load(path) as data:
+            stale = not np.array_equal(data['signature'], signature)
+        if not stale:
+            return ValuationIndex.load(path)
+
+    print("   🛠️  Costruisco indice valori (player_valuations)...")
+    # A blocchi: il CSV intero (date come stringhe) non passa mai in memoria
+    index = ValuationIndex.from_csv(csv_path)
+    index.save(path, signature)
+    return index